@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the data generator.
+
+Runs against in-memory stand-ins, no Event Hub or SQL needed.
+
+Usage:
+    python bench.py sender --events 200000 --latency-ms 20
+    python bench.py generate --events 50000
+    python bench.py encode --events 50000
+    python bench.py sessions --capacity 1000000 --rate 20000 --seconds 120
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from sender import BatchSender, MemorySink
+
+
+def bench_sender(args):
+    """Throughput of BatchSender against a MemorySink with simulated latency"""
+    payload = json.dumps({"event_id": "x" * 36, "url": "/product/123", "timestamp": time.time()})
+    sinks = {}
+
+    def sink_factory(name):
+        sinks[name] = MemorySink(latency=args.latency_ms / 1000, failure_rate=args.failure_rate)
+        return sinks[name]
+
+    async def run():
+        sender = BatchSender(
+            sink_factory,
+            ["bench"],
+            max_events=args.max_events,
+            linger=args.linger_ms / 1000,
+            max_in_flight=args.in_flight,
+            retry_base=0.01,
+            retry_max=1.0,
+        )
+        # Includes close(), which drains the retry queue
+        start = time.perf_counter()
+        async with sender:
+            for _ in range(args.events):
+                await sender.send("bench", payload)
+        return time.perf_counter() - start, sender.stats["bench"]
+
+    elapsed, stats = asyncio.run(run())
+    sink = sinks["bench"]
+    print(f"sender: {sink.events:,} events in {sink.batches:,} batches, "
+          f"{elapsed:.2f}s -> {sink.events / elapsed:,.0f} events/s")
+    if args.failure_rate:
+        print(f"        {stats['errors']:,} failed sends, {stats['retries']:,} retries, "
+              f"{stats['pending']:,} events undelivered")
+
+
+def bench_generate(args):
+    """Per-event generation cost: build_event vs ColumnarGenerator"""
+    import common
+    import producers
+    from columnar import ColumnarGenerator
+
+    generator = ColumnarGenerator(*common.load_pools())
+    for name in ("orders", "clickstream"):
+        now = time.time()
+        start = time.perf_counter()
+        for _ in range(args.events):
+            producers.build_event(name, now)
+        scalar = (time.perf_counter() - start) / args.events
+
+        start = time.perf_counter()
+        done = 0
+        while done < args.events:
+            n = min(args.batch, args.events - done)
+            generator.batch(name, n, now)
+            done += n
+        columnar = (time.perf_counter() - start) / args.events
+
+        print(f"generate [{name}]: build_event {scalar * 1e6:.1f} µs/event, "
+              f"columnar {columnar * 1e6:.1f} µs/event ({scalar / columnar:.1f}x)")
+
+
+def bench_encode(args):
+    """Serialization cost, size per event and Event Hub ingress, per format"""
+    import common
+    import encoding
+    from columnar import ColumnarGenerator
+
+    formats = {"json": lambda hub, e: json.dumps(e).encode("utf-8")}
+    try:
+        import orjson
+        formats["orjson"] = lambda hub, e: orjson.dumps(e)
+    except ImportError:
+        pass
+    for fmt, module in (("avro", "fastavro"), ("msgpack", "msgpack")):
+        try:
+            __import__(module)
+            formats[fmt] = lambda hub, e, fmt=fmt: encoding.encode(hub, e, fmt)
+        except ImportError:
+            print(f"encode: {fmt} skipped ({module} not installed)")
+
+    generator = ColumnarGenerator(*common.load_pools())
+    for name in ("orders", "clickstream"):
+        events = generator.batch(name, args.events, time.time())
+        for label, encode in formats.items():
+            start = time.perf_counter()
+            size = sum(len(encode(name, e)) for e in events) / len(events)
+            elapsed = time.perf_counter() - start
+            # One throughput unit = 1 MB/s ingress (or 1000 events/s)
+            ingress = size * 10_000 / (1024 * 1024)
+            print(f"encode [{name}] {label:<8} {elapsed / len(events) * 1e6:6.2f} µs/event, "
+                  f"{size:7.1f} bytes/event, {ingress:5.2f} MB/s at 10k events/s")
+
+
+def bench_sessions(args):
+    """Session simulator: state bytes per session, events/s, funnel, simulated clock"""
+    import common
+    from columnar import ColumnarGenerator
+    from sessions import SessionSimulator
+
+    generator = ColumnarGenerator(*common.load_pools(), seed=42)
+    sim = SessionSimulator(generator, capacity=args.capacity, think_time=args.think_time)
+    print(f"sessions: {sim.bytes_per_session:.0f} bytes/session, "
+          f"{sim.bytes_per_session * args.capacity / 1024 / 1024:,.0f} MB for {args.capacity:,} slots")
+
+    now, tick = time.time(), 0.1
+    per_tick = int(args.rate * tick)
+    events = orders = 0
+    types = {}
+    start = time.perf_counter()
+    for _ in range(int(args.seconds / tick)):
+        now += tick
+        for event in sim.clickstream(per_tick, now):
+            types[event["event_type"]] = types.get(event["event_type"], 0) + 1
+        events += per_tick
+        orders += len(sim.take_orders())
+    elapsed = time.perf_counter() - start
+
+    print(f"sessions: {events:,} events over {args.seconds:.0f} simulated s in {elapsed:.2f}s "
+          f"-> {events / elapsed:,.0f} events/s")
+    print(f"          live {sim.live:,}, started {sim.stats['started']:,}, orders {orders:,}, "
+          f"abandoned {sim.stats['abandoned']:,}")
+    print("          " + ", ".join(f"{name} {n:,}" for name, n in types.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Data generator micro-benchmarks")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("sender", help="BatchSender throughput against MemorySink")
+    p.add_argument("--events", type=int, default=200_000)
+    p.add_argument("--latency-ms", type=float, default=20.0, help="Simulated send latency")
+    p.add_argument("--max-events", type=int, default=500)
+    p.add_argument("--linger-ms", type=float, default=50.0)
+    p.add_argument("--in-flight", type=int, default=4)
+    p.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of sends that fail")
+    p.set_defaults(func=bench_sender)
+
+    p = sub.add_parser("generate", help="build_event vs ColumnarGenerator cost per event")
+    p.add_argument("--events", type=int, default=50_000)
+    p.add_argument("--batch", type=int, default=5_000)
+    p.set_defaults(func=bench_generate)
+
+    p = sub.add_parser("encode", help="Serialization cost and size per encoder")
+    p.add_argument("--events", type=int, default=50_000)
+    p.set_defaults(func=bench_encode)
+
+    p = sub.add_parser("sessions", help="Session simulator memory and throughput")
+    p.add_argument("--capacity", type=int, default=1_000_000)
+    p.add_argument("--rate", type=float, default=20_000, help="Clickstream events per simulated second")
+    p.add_argument("--seconds", type=float, default=120)
+    p.add_argument("--think-time", type=float, default=30.0)
+    p.set_defaults(func=bench_sessions)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Boot timing
+===========
+
+Startup phases of a producer process (imports, pools, vendors, first event
+delivered), measured from the process start time in /proc so the interpreter
+start-up and the imports are included. Import this module first so the
+fallback clock (module import time) starts before the heavy imports.
+
+    boot.mark("pools")               # end of a phase
+    boot.watch_first_event(sender)   # prints the report on the first delivery
+
+LazyFaker defers the Faker import (~100 ms) to its first use, which never
+comes when the pools are loaded from a snapshot.
+"""
+
+import asyncio
+import os
+import time
+
+_IMPORTED = time.monotonic()
+
+
+def _process_start():
+    """Monotonic time at which this process started (Linux), else import time"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22, counted after the ")" closing the command name
+            ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        started = ticks / os.sysconf("SC_CLK_TCK")
+        uptime = time.clock_gettime(time.CLOCK_BOOTTIME)
+        start = time.monotonic() - (uptime - started)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return _IMPORTED
+    # Clock-tick resolution, or an odd /proc (sandboxes): keep the import time
+    return start if 0 <= _IMPORTED - start < 60 else _IMPORTED
+
+
+STARTED = _process_start()
+# (phase, seconds since process start at the end of the phase)
+phases = []
+
+
+def elapsed():
+    return time.monotonic() - STARTED
+
+
+def mark(phase):
+    """Record the end of a startup phase"""
+    phases.append((phase, elapsed()))
+
+
+def report():
+    """One line: duration of every phase and the total"""
+    parts, previous = [], 0.0
+    for phase, at in phases:
+        parts.append(f"{phase} {(at - previous) * 1000:.0f} ms")
+        previous = at
+    total = phases[-1][1] if phases else elapsed()
+    return f"⏱️  Startup {total * 1000:.0f} ms ({', '.join(parts)})"
+
+
+def watch_first_event(sender):
+    """Mark "first event" and print the report once the sender delivers its first batch"""
+    async def wait():
+        await sender.first_delivery.wait()
+        mark("first event")
+        print(report())
+
+    return asyncio.create_task(wait())
+
+
+class LazyFaker:
+    """Faker instance created on first attribute access"""
+
+    def __init__(self):
+        self._fake = None
+
+    def __getattr__(self, name):
+        if self._fake is None:
+            from faker import Faker
+            self._fake = Faker()
+        return getattr(self._fake, name)
@@ -0,0 +1,223 @@
+"""
+Columnar event synthesis
+========================
+
+Generates thousands of orders/clickstream events at once from NumPy arrays
+instead of calling Faker, uuid4 and random per event:
+
+- user agents and IPs are drawn once into pools, then picked by index
+- UUIDs are built from one bulk buffer of random bytes
+- item counts, products, quantities and event types are vectorized draws
+
+Records have the same shape as producers.build_event and are ready to
+serialize. Order items are shared, pre-built dicts: treat records as
+read-only.
+"""
+
+import numpy as np
+
+CATEGORIES = ["Electronics", "Home", "Clothing", "Books", "Beauty"]
+CLICK_EVENT_TYPES = ["view_page", "add_to_cart", "checkout_start"]
+MAX_ITEMS = 5
+
+HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+# Column of each hex digit in the 36-char "8-4-4-4-12" UUID layout
+UUID_HEX_COLUMNS = np.array([c for c in range(36) if c not in (8, 13, 18, 23)])
+
+
+def random_uuid_bytes(rng, n):
+    """(n, 16) uint8 array of version 4 UUIDs"""
+    raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    return raw
+
+
+def format_uuids(raw):
+    """UUID strings of an (n, 16) uint8 array"""
+    n = len(raw)
+    digits = np.empty((n, 32), dtype=np.uint8)
+    digits[:, 0::2] = HEX_DIGITS[raw >> 4]
+    digits[:, 1::2] = HEX_DIGITS[raw & 0x0F]
+    text = np.full((n, 36), ord("-"), dtype=np.uint8)
+    text[:, UUID_HEX_COLUMNS] = digits
+    s = text.tobytes().decode("ascii")
+    return [s[i:i + 36] for i in range(0, 36 * n, 36)]
+
+
+def bulk_uuids(rng, n):
+    """n random (version 4) UUID strings from a single random buffer"""
+    return format_uuids(random_uuid_bytes(rng, n))
+
+
+def warm(pool, indices):
+    """Let a columnar pool (pools.py) materialize a batch of picks at once"""
+    if hasattr(pool, "warm"):
+        pool.warm(indices)
+
+
+def ip_pool(rng, size):
+    """Pre-formatted IPv4 strings"""
+    octets = rng.integers(1, 255, size=(size, 4))
+    return [f"{a}.{b}.{c}.{d}" for a, b, c, d in octets.tolist()]
+
+
+class ColumnarGenerator:
+    """Batch generator over fixed customer/product pools"""
+
+    def __init__(self, customers, products, ua_pool_size=1000, ip_pool_size=65536, seed=None):
+        from faker import Faker
+        self.rng = np.random.default_rng(seed)
+        fake = Faker()
+        if seed is not None:
+            fake.seed_instance(seed)
+
+        self.customers = customers
+        self.products = products
+        if hasattr(products, "prices"):
+            # pools.ProductPool: prices, item dicts and URLs are computed lazily
+            self.prices, self.items, self.product_urls = products.prices, products.items, products.urls
+        else:
+            self.prices = np.array([p["price"] for p in products])
+            # One item dict per (product, quantity 1..3), indexed product * 3 + qty - 1
+            self.items = [{**p, "quantity": q} for p in products for q in (1, 2, 3)]
+            self.product_urls = [f"/product/{p['product_id']}" for p in products]
+        self.user_agents = [fake.user_agent() for _ in range(ua_pool_size)]
+        self.ips = ip_pool(self.rng, ip_pool_size)
+        self.view_urls_fixed = ["/", "/login"]
+        self.category_urls = [f"/category/{c}" for c in CATEGORIES]
+
+    def batch(self, name, n, now):
+        if name == "orders":
+            return self.orders(n, now)
+        if name == "clickstream":
+            return self.clickstream(n, now)
+        raise ValueError(f"Unknown stream: {name}")
+
+    def marketplace_orders(self, n, now, vendors, vendor_idx=None, picks=None):
+        """Orders of the marketplace stream: items carry unit_price and vendor_id
+
+        `vendor_idx` (n,) and `picks` (n, MAX_ITEMS) fix each order's vendor and
+        products, e.g. to a vendor's stocked products (stock.py); drawn otherwise.
+        """
+        rng = self.rng
+        num_items = rng.integers(1, 4, size=n)
+        if picks is None:
+            picks = self._pick_products(n)
+        qty = rng.integers(1, 4, size=(n, MAX_ITEMS))
+        mask = np.arange(MAX_ITEMS) < num_items[:, None]
+        totals = np.round((self.prices[picks] * qty * mask).sum(axis=1), 2)
+        customer_idx = rng.integers(0, len(self.customers), size=n)
+        if vendor_idx is None:
+            vendor_idx = rng.integers(0, len(vendors), size=n)
+        ids = bulk_uuids(rng, 2 * n)
+        warm(self.products, picks[mask])
+        warm(self.customers, customer_idx)
+
+        products = self.products
+        picks_l, qty_l, num_l = picks.tolist(), qty.tolist(), num_items.tolist()
+        totals_l, cust_l, vendor_l = totals.tolist(), customer_idx.tolist(), vendor_idx.tolist()
+        events = []
+        for i in range(n):
+            vendor_id = vendors[vendor_l[i]]["vendor_id"]
+            items = []
+            for k in range(num_l[i]):
+                product = products[picks_l[i][k]]
+                items.append({**product, "quantity": qty_l[i][k], "unit_price": product["price"],
+                              "vendor_id": vendor_id})
+            events.append({
+                "event_id": ids[2 * i],
+                "order_id": ids[2 * i + 1],
+                "customer": self.customers[cust_l[i]],
+                "items": items,
+                "total_amount": totals_l[i],
+                "currency": "USD",
+                "status": "PLACED",
+                "timestamp": now,
+                "source": "marketplace",
+            })
+        return events
+
+    def _pick_products(self, n):
+        """(n, MAX_ITEMS) product indices, unique within each row"""
+        picks = self.rng.integers(0, len(self.products), size=(n, MAX_ITEMS))
+        ordered = np.sort(picks, axis=1)
+        dup_rows = np.nonzero((ordered[:, 1:] == ordered[:, :-1]).any(axis=1))[0]
+        # Duplicates are rare with large pools: redraw those rows only
+        for row in dup_rows:
+            picks[row] = self.rng.choice(len(self.products), size=MAX_ITEMS, replace=False)
+        return picks
+
+    def orders(self, n, now):
+        rng = self.rng
+        num_items = rng.integers(1, MAX_ITEMS + 1, size=n)
+        picks = self._pick_products(n)
+        qty = rng.integers(1, 4, size=(n, MAX_ITEMS))
+        mask = np.arange(MAX_ITEMS) < num_items[:, None]
+        totals = np.round((self.prices[picks] * qty * mask).sum(axis=1), 2)
+        customer_idx = rng.integers(0, len(self.customers), size=n)
+        item_idx = picks * 3 + qty - 1
+        ids = bulk_uuids(rng, 2 * n)
+        warm(self.products, picks[mask])
+        warm(self.customers, customer_idx)
+
+        table = self.items
+        customers = self.customers
+        item_l, num_l = item_idx.tolist(), num_items.tolist()
+        totals_l, cust_l = totals.tolist(), customer_idx.tolist()
+        events = []
+        for i in range(n):
+            items = [table[j] for j in item_l[i][:num_l[i]]]
+            events.append({
+                "event_id": ids[2 * i],
+                "order_id": ids[2 * i + 1],
+                "customer": customers[cust_l[i]],
+                "items": items,
+                "total_amount": totals_l[i],
+                "currency": "USD",
+                "status": "PLACED",
+                "timestamp": now,
+            })
+        return events
+
+    def clickstream(self, n, now):
+        rng = self.rng
+        event_type = rng.integers(0, 3, size=n)
+        view_kind = rng.integers(0, 4, size=n)
+        category = rng.integers(0, len(CATEGORIES), size=n)
+        product = rng.integers(0, len(self.products), size=n)
+        has_user = (event_type == 2) | (rng.random(n) > 0.3)
+        ua = rng.integers(0, len(self.user_agents), size=n)
+        ip = rng.integers(0, len(self.ips), size=n)
+        ids = bulk_uuids(rng, 3 * n)
+        warm(self.products, product[(event_type == 0) & (view_kind == 3)])
+
+        types_l, kind_l = event_type.tolist(), view_kind.tolist()
+        cat_l, prod_l, user_l = category.tolist(), product.tolist(), has_user.tolist()
+        ua_l, ip_l = ua.tolist(), ip.tolist()
+        events = []
+        for i in range(n):
+            t = types_l[i]
+            if t == 1:
+                url = "/cart"
+            elif t == 2:
+                url = "/checkout"
+            else:
+                kind = kind_l[i]
+                if kind < 2:
+                    url = self.view_urls_fixed[kind]
+                elif kind == 2:
+                    url = self.category_urls[cat_l[i]]
+                else:
+                    url = self.product_urls[prod_l[i]]
+            events.append({
+                "event_id": ids[3 * i],
+                "session_id": ids[3 * i + 1],
+                "user_id": ids[3 * i + 2] if user_l[i] else None,
+                "url": url,
+                "event_type": CLICK_EVENT_TYPES[t],
+                "user_agent": self.user_agents[ua_l[i]],
+                "ip_address": self.ips[ip_l[i]],
+                "timestamp": now,
+            })
+        return events
@@ -0,0 +1,142 @@
+"""
+Producer common
+===============
+
+Configuration, customer/product pools and Event Hub sender shared by the
+producer entrypoints (producers.py, streams.py, fleet.py) and the tools built
+on them (bench.py, corpus.py, stock.py). Pools are built, or reloaded from
+their snapshot, on the first load_pools() call, never at import.
+"""
+
+import boot  # first: startup clock
+import os
+
+import encoding
+import eventlog
+import partitioning
+import snapshot
+from sender import BatchSender, EventHubSink
+from spill import SpillFile
+
+# Initialize Faker (imported on first use: not needed when the pools come from a snapshot)
+fake = boot.LazyFaker()
+
+# On lit la connexion depuis une variable d'environnement
+CONNECTION_STR = os.getenv("EVENTHUB_CONNECTION_STR")
+
+# Batching: flush on size or linger time, several sends in flight per hub
+BATCH_MAX_EVENTS = int(os.getenv("BATCH_MAX_EVENTS", 500))
+BATCH_LINGER_MS  = int(os.getenv("BATCH_LINGER_MS", 50))
+MAX_IN_FLIGHT    = int(os.getenv("MAX_IN_FLIGHT", 4))
+
+# Failed batches: spilled to disk, retried with jittered backoff; send() blocks
+# once SPILL_MAX_PENDING batches are waiting. SPILL_DIR="" disables the file.
+SPILL_DIR         = os.getenv("SPILL_DIR", "spill")
+SPILL_MAX_PENDING = int(os.getenv("SPILL_MAX_PENDING", 1000))
+RETRY_BASE_MS     = int(os.getenv("RETRY_BASE_MS", 100))
+RETRY_MAX_MS      = int(os.getenv("RETRY_MAX_MS", 30000))
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", 10))
+
+RATE_REPORT_INTERVAL = float(os.getenv("RATE_REPORT_INTERVAL", 10))
+# Pool sizes; POOL_STORAGE=columnar keeps millions of entities in NumPy arrays.
+# Marketplace orders draw from the first MARKETPLACE_PRODUCTS_POOL_SIZE products.
+CUSTOMERS_POOL_SIZE  = int(os.getenv("CUSTOMERS_POOL_SIZE", 100))
+PRODUCTS_POOL_SIZE   = int(os.getenv("PRODUCTS_POOL_SIZE", 1000))
+MARKETPLACE_PRODUCTS_POOL_SIZE = int(os.getenv("MARKETPLACE_PRODUCTS_POOL_SIZE", 500))
+POOL_STORAGE         = os.getenv("POOL_STORAGE", "dicts")
+# Pools are generated once and reloaded from this directory on restart; "" disables.
+# A relative path is relative to this file, not to the current directory
+POOL_SNAPSHOT_DIR    = os.getenv("POOL_SNAPSHOT_DIR", "snapshots")
+# Stateful sessions for clickstream; orders then come from converting sessions
+SESSION_SIMULATION   = os.getenv("SESSION_SIMULATION", "0") == "1"
+SESSION_CAPACITY     = int(os.getenv("SESSION_CAPACITY", 1_000_000))
+SESSION_THINK_TIME   = float(os.getenv("SESSION_THINK_TIME", 30))
+
+log = eventlog.logger
+counters = eventlog.EventCounters()
+
+def build_customers_pool(count):
+    """Customers drawn from `fake` only, so fake.seed_instance() makes them reproducible"""
+    return [
+        {
+            "id": fake.uuid4(),
+            "name": fake.name(),
+            "email": fake.email(),
+            "address": fake.street_address(),
+            "city": fake.city(),
+            "country": fake.country()
+        }
+        for _ in range(count)
+    ]
+
+def build_products_pool(count):
+    """Products drawn from `fake` only, so fake.seed_instance() makes them reproducible"""
+    return [
+        {
+            "product_id": fake.uuid4(),
+            "name": fake.catch_phrase(),
+            "category": fake.random.choice(["Electronics", "Home", "Clothing", "Books", "Beauty"]),
+            "description": fake.sentence(),
+            "price": round(fake.random.uniform(5, 300), 2)
+        }
+        for _ in range(count)
+    ]
+
+def build_pools(customers, products):
+    """Lists of dicts, or columnar pools (pools.py) for production-scale cardinality"""
+    if POOL_STORAGE == "columnar":
+        from pools import CustomerPool, ProductPool
+        return {"customers": CustomerPool(customers), "products": ProductPool(products)}
+    return {"customers": build_customers_pool(customers), "products": build_products_pool(products)}
+
+def snapshot_path(name):
+    """Snapshot file of pool set `name` ("" when snapshots are disabled)"""
+    if not POOL_SNAPSHOT_DIR:
+        return ""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), POOL_SNAPSHOT_DIR, f"{name}.pool")
+
+boot.mark("imports")
+
+# Global pools of customers and products, built by load_pools()
+CUSTOMERS_POOL = PRODUCTS_POOL = None
+
+def load_pools(name="producers", products=PRODUCTS_POOL_SIZE):
+    """Build the pools, or reload them from snapshot `name`, on first call"""
+    global CUSTOMERS_POOL, PRODUCTS_POOL
+    if CUSTOMERS_POOL is None:
+        pools = snapshot.load_or_build(
+            snapshot_path(name),
+            {"storage": POOL_STORAGE, "customers": CUSTOMERS_POOL_SIZE, "products": products},
+            lambda: build_pools(CUSTOMERS_POOL_SIZE, products),
+        )
+        CUSTOMERS_POOL, PRODUCTS_POOL = pools["customers"], pools["products"]
+        boot.mark("pools")
+    return CUSTOMERS_POOL, PRODUCTS_POOL
+
+def make_sender(hubs, partitions=None, spill_name="producers"):
+    """Batched async sender with one Event Hub client per hub"""
+    if not CONNECTION_STR:
+        raise RuntimeError("EVENTHUB_CONNECTION_STR n'est pas définie dans les variables d'environnement")
+    return BatchSender(
+        lambda name: EventHubSink(CONNECTION_STR, name),
+        hubs,
+        max_events=BATCH_MAX_EVENTS,
+        linger=BATCH_LINGER_MS / 1000,
+        max_in_flight=MAX_IN_FLIGHT,
+        partitions=partitions,
+        spill=SpillFile(os.path.join(SPILL_DIR, f"{spill_name}.spill")) if SPILL_DIR else None,
+        max_pending=SPILL_MAX_PENDING,
+        retry_base=RETRY_BASE_MS / 1000,
+        retry_max=RETRY_MAX_MS / 1000,
+        drain_timeout=SHUTDOWN_DRAIN_TIMEOUT,
+    )
+
+async def safe_send(sender, hub, event, stream=None):
+    """Encode once, route by partition key, count under `stream` (default: the hub)"""
+    try:
+        # Serialized once: the same bytes are sent and (if sampled) logged
+        body = encoding.encode(hub, event)
+        await sender.send(hub, body, partitioning.partition_key(hub, event))
+        counters.sent(stream or hub, body)
+    except Exception as e:
+        log.error("[%s] Error sending event: %s", stream or hub, e)
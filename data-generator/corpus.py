@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Event corpus
+============
+
+Writes a seeded corpus of orders / marketplace orders / clickstream events to
+a length-prefixed binary file, and replays it from a memory map at a target
+rate or as fast as possible. The same seed and arguments always produce the
+same file, so regression benchmarks run on identical input.
+
+File layout:
+    b"DWHCORP1" | u32 header length | JSON header | records...
+    record = u32 payload length | u8 stream index | payload
+
+Usage:
+    python corpus.py write corpus.bin --orders 1000000 --clickstream 5000000 --seed 42
+    python corpus.py info corpus.bin
+    python corpus.py replay corpus.bin --rate 20000
+    python corpus.py replay corpus.bin --dry-run
+"""
+
+import argparse
+import asyncio
+import json
+import mmap
+import os
+import struct
+import time
+
+import encoding
+import common
+from columnar import ColumnarGenerator
+from rate import RateScheduler
+from sender import BatchSender, EventHubSink, MemorySink
+
+MAGIC = b"DWHCORP1"
+RECORD = struct.Struct("<IB")
+HEADER_LEN = struct.Struct("<I")
+
+# Stream name -> Event Hub it is replayed to
+STREAM_HUBS = {"orders": "orders", "clickstream": "clickstream", "marketplace": "orders"}
+
+# 2025-01-01T00:00:00Z: fixed default so timestamps are reproducible too
+DEFAULT_START = 1735689600.0
+
+
+def write_corpus(path, counts, seed=42, wire_format="json", start=DEFAULT_START,
+                 events_per_second=1000.0, customers=100, products=1000, vendors=20, chunk=10_000):
+    """Generate `counts` events per stream, interleaved in proportion, into `path`"""
+    common.fake.seed_instance(seed)
+    customers_pool = common.build_customers_pool(customers)
+    products_pool = common.build_products_pool(products)
+    vendors_pool = [{"vendor_id": "SHOPNOW"}] + [{"vendor_id": f"V{i:03d}"} for i in range(1, vendors)]
+    generator = ColumnarGenerator(customers_pool, products_pool, seed=seed)
+
+    streams = [name for name in STREAM_HUBS if counts.get(name)]
+    total = sum(counts[name] for name in streams)
+    header = {
+        "seed": seed,
+        "format": wire_format,
+        "start": start,
+        "events_per_second": events_per_second,
+        "streams": streams,
+        "hubs": [STREAM_HUBS[name] for name in streams],
+        "counts": {name: counts[name] for name in streams},
+        "pools": {"customers": customers, "products": products, "vendors": vendors},
+    }
+
+    remaining = {name: counts[name] for name in streams}
+    written = 0
+    with open(path, "wb") as f:
+        raw_header = json.dumps(header).encode("utf-8")
+        f.write(MAGIC)
+        f.write(HEADER_LEN.pack(len(raw_header)))
+        f.write(raw_header)
+
+        while written < total:
+            now = start + written / events_per_second
+            buf = bytearray()
+            for index, name in enumerate(streams):
+                n = min(remaining[name], max(1, round(chunk * counts[name] / total)))
+                if n <= 0:
+                    continue
+                if name == "marketplace":
+                    events = generator.marketplace_orders(n, now, vendors_pool)
+                else:
+                    events = generator.batch(name, n, now)
+                hub = STREAM_HUBS[name]
+                for event in events:
+                    body = encoding.encode(hub, event, wire_format)
+                    buf += RECORD.pack(len(body), index)
+                    buf += body
+                remaining[name] -= n
+                written += n
+            f.write(buf)
+    return header
+
+
+class Corpus:
+    """Memory-mapped corpus file"""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self.map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an event corpus")
+        (header_len,) = HEADER_LEN.unpack_from(self.map, len(MAGIC))
+        offset = len(MAGIC) + HEADER_LEN.size
+        self.header = json.loads(self.map[offset:offset + header_len])
+        self.data_offset = offset + header_len
+        self.hubs = self.header["hubs"]
+
+    def __len__(self):
+        return sum(self.header["counts"].values())
+
+    def records(self):
+        """Yield (hub, payload bytes) in file order"""
+        data, hubs, size = self.map, self.hubs, len(self.map)
+        offset = self.data_offset
+        unpack = RECORD.unpack_from
+        while offset < size:
+            length, index = unpack(data, offset)
+            offset += RECORD.size
+            yield hubs[index], data[offset:offset + length]
+            offset += length
+
+    def close(self):
+        self.map.close()
+        self._file.close()
+
+
+async def replay(corpus, sender, rate=None, loop=False, report_every=10.0):
+    """Send every record of the corpus, at `rate` events/s or as fast as possible"""
+    def records():
+        while True:
+            yield from corpus.records()
+            if not loop:
+                return
+
+    source = records()
+    sent = 0
+    start = time.monotonic()
+
+    if rate:
+        scheduler = RateScheduler({"corpus": rate}, report_every=report_every)
+        done = asyncio.Event()
+
+        async def emit(name, n):
+            nonlocal sent
+            for _ in range(n):
+                record = next(source, None)
+                if record is None:
+                    done.set()
+                    return
+                await sender.send(*record)
+                sent += 1
+
+        run = asyncio.create_task(scheduler.run(emit))
+        await done.wait()
+        run.cancel()
+        try:
+            await run
+        except asyncio.CancelledError:
+            pass
+    else:
+        last_report = start
+        for hub, body in source:
+            await sender.send(hub, body)
+            sent += 1
+            if sent % 10_000 == 0:
+                await asyncio.sleep(0)
+                if report_every and time.monotonic() - last_report >= report_every:
+                    print(f"[corpus] {sent:,} events, {sent / (time.monotonic() - start):,.0f}/s")
+                    last_report = time.monotonic()
+
+    await sender.flush()
+    return sent, time.monotonic() - start
+
+
+def cmd_write(args):
+    counts = {"orders": args.orders, "clickstream": args.clickstream, "marketplace": args.marketplace}
+    print(f"📝 Writing corpus to {args.path} (seed {args.seed}, format {args.format})")
+    start = time.perf_counter()
+    header = write_corpus(
+        args.path, counts, seed=args.seed, wire_format=args.format, start=args.start,
+        events_per_second=args.events_per_second, customers=args.customers,
+        products=args.products, vendors=args.vendors,
+    )
+    elapsed = time.perf_counter() - start
+    total = sum(header["counts"].values())
+    size = os.path.getsize(args.path)
+    print(f"✅ {total:,} events, {size / 1024 / 1024:,.1f} MB in {elapsed:.1f}s "
+          f"({total / elapsed:,.0f} events/s)")
+
+
+def cmd_info(args):
+    corpus = Corpus(args.path)
+    print(json.dumps(corpus.header, indent=2))
+    corpus.close()
+
+
+def cmd_replay(args):
+    corpus = Corpus(args.path)
+    hubs = sorted(set(corpus.hubs))
+    if args.dry_run:
+        sink_factory = lambda name: MemorySink()
+    else:
+        if not common.CONNECTION_STR:
+            raise RuntimeError("EVENTHUB_CONNECTION_STR not set (use --dry-run to replay in memory)")
+        sink_factory = lambda name: EventHubSink(common.CONNECTION_STR, name)
+
+    async def run():
+        sender = BatchSender(
+            sink_factory, hubs,
+            max_events=common.BATCH_MAX_EVENTS,
+            linger=common.BATCH_LINGER_MS / 1000,
+            max_in_flight=common.MAX_IN_FLIGHT,
+        )
+        async with sender:
+            return await replay(corpus, sender, rate=args.rate, loop=args.loop,
+                                report_every=common.RATE_REPORT_INTERVAL)
+
+    target = f"{args.rate:,.0f} events/s" if args.rate else "max speed"
+    print(f"▶️  Replaying {len(corpus):,} events from {args.path} at {target}")
+    sent, elapsed = asyncio.run(run())
+    print(f"✅ Replayed {sent:,} events in {elapsed:.1f}s ({sent / elapsed:,.0f} events/s)")
+    corpus.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seeded event corpus: write and replay")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("write", help="Generate a corpus file")
+    p.add_argument("path")
+    p.add_argument("--orders", type=int, default=0)
+    p.add_argument("--clickstream", type=int, default=0)
+    p.add_argument("--marketplace", type=int, default=0, help="Marketplace orders (replayed to orders hub)")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--format", choices=["json", "avro", "msgpack"], default="json")
+    p.add_argument("--start", type=float, default=DEFAULT_START, help="Epoch of the first event")
+    p.add_argument("--events-per-second", type=float, default=1000.0, help="Timestamp spacing")
+    p.add_argument("--customers", type=int, default=100)
+    p.add_argument("--products", type=int, default=1000)
+    p.add_argument("--vendors", type=int, default=20)
+    p.set_defaults(func=cmd_write)
+
+    p = sub.add_parser("info", help="Print the corpus header")
+    p.add_argument("path")
+    p.set_defaults(func=cmd_info)
+
+    p = sub.add_parser("replay", help="Stream a corpus to Event Hubs")
+    p.add_argument("path")
+    p.add_argument("--rate", type=float, default=0, help="Events/s (default: as fast as possible)")
+    p.add_argument("--loop", action="store_true", help="Start over at the end of the file")
+    p.add_argument("--dry-run", action="store_true", help="Send to an in-memory sink")
+    p.set_defaults(func=cmd_replay)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Event encoding
+==============
+
+Every event is serialized exactly once; the resulting bytes are reused for
+the Event Hub send and for any logging.
+
+WIRE_FORMAT selects the payload format:
+    json     - default, what Stream Analytics reads
+    avro     - Avro single-object encoding (0xC3 0x01 + CRC-64 schema
+               fingerprint + datum), schemas in schemas/<hub>.v<N>.avsc
+    msgpack  - MessagePack, schemaless
+
+JSON_ENCODER selects the JSON library:
+    orjson  - fast, optional dependency (default when installed)
+    json    - standard library
+
+decode() turns any of these payloads back into a dict; downstream Python
+consumers can use it together with the schemas directory. The binary formats
+need the optional fastavro / msgpack packages.
+"""
+
+import io
+import json
+import os
+from pathlib import Path
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_ENCODER = os.getenv("JSON_ENCODER", "orjson" if orjson else "json")
+WIRE_FORMAT = os.getenv("WIRE_FORMAT", "json")
+SCHEMAS_DIR = Path(os.getenv("SCHEMAS_DIR", Path(__file__).parent / "schemas"))
+
+# Avro single-object encoding marker
+AVRO_MARKER = b"\xc3\x01"
+
+if JSON_ENCODER == "orjson" and orjson is None:
+    raise RuntimeError("JSON_ENCODER=orjson but orjson is not installed (pip install orjson)")
+
+if WIRE_FORMAT not in ("json", "avro", "msgpack"):
+    raise RuntimeError(f"Unknown WIRE_FORMAT: {WIRE_FORMAT}")
+
+
+def _json_stdlib(event):
+    return json.dumps(event, separators=(",", ":")).encode("utf-8")
+
+
+def _json_orjson(event):
+    return orjson.dumps(event)
+
+
+dumps = _json_orjson if JSON_ENCODER == "orjson" else _json_stdlib
+
+
+# ============================================================================
+# Avro schemas
+# ============================================================================
+
+_schemas = {}       # hub -> (parsed schema, fingerprint) of the latest version
+_fingerprints = {}  # fingerprint -> parsed schema, every version
+
+
+def _load_schemas():
+    """Parse every schemas/<hub>.v<N>.avsc; the highest N is used to write"""
+    import fastavro
+
+    latest = {}
+    for path in sorted(SCHEMAS_DIR.glob("*.v*.avsc")):
+        hub, version = path.stem.rsplit(".v", 1)
+        parsed = fastavro.parse_schema(json.loads(path.read_text()))
+        canonical = fastavro.schema.to_parsing_canonical_form(parsed)
+        fp = bytes.fromhex(fastavro.schema.fingerprint(canonical, "CRC-64-AVRO"))
+        _fingerprints[fp] = parsed
+        if hub not in latest or int(version) > latest[hub][0]:
+            latest[hub] = (int(version), parsed, fp)
+    for hub, (_, parsed, fp) in latest.items():
+        _schemas[hub] = (parsed, fp)
+
+
+def schema_for(hub):
+    if not _schemas:
+        _load_schemas()
+    if hub not in _schemas:
+        raise KeyError(f"No Avro schema for hub '{hub}' in {SCHEMAS_DIR}")
+    return _schemas[hub]
+
+
+def avro_dumps(hub, event):
+    from fastavro import schemaless_writer
+
+    parsed, fp = schema_for(hub)
+    buf = io.BytesIO()
+    buf.write(AVRO_MARKER)
+    buf.write(fp)
+    schemaless_writer(buf, parsed, event)
+    return buf.getvalue()
+
+
+def msgpack_dumps(event):
+    import msgpack
+
+    return msgpack.packb(event)
+
+
+def encode(hub, event, wire_format=None):
+    """Serialize an event for `hub` in the configured wire format"""
+    wire_format = wire_format or WIRE_FORMAT
+    if wire_format == "avro":
+        return avro_dumps(hub, event)
+    if wire_format == "msgpack":
+        return msgpack_dumps(event)
+    return dumps(event)
+
+
+def decode(body):
+    """Decode a JSON, Avro single-object or MessagePack payload"""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    if body[:2] == AVRO_MARKER:
+        from fastavro import schemaless_reader
+
+        if not _fingerprints:
+            _load_schemas()
+        parsed = _fingerprints.get(body[2:10])
+        if parsed is None:
+            raise ValueError(f"Unknown Avro schema fingerprint {body[2:10].hex()}")
+        return schemaless_reader(io.BytesIO(body[10:]), parsed)
+    if body[:1] in (b"{", b"["):
+        return orjson.loads(body) if orjson else json.loads(body)
+    import msgpack
+
+    return msgpack.unpackb(body)
@@ -0,0 +1,105 @@
+"""
+Event logging
+=============
+
+Producer logs go through a QueueHandler and are written to stdout by a
+background QueueListener thread, so a slow stdout (supervisord) never blocks
+the send loop.
+
+By default only periodic per-hub counters are logged. Full payloads are
+logged for a sample of events (LOG_SAMPLE_RATE, 0.0 - 1.0), reusing the
+bytes that were sent.
+"""
+
+import asyncio
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+
+import encoding
+from sender import partition_skew
+
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 0))
+LOG_COUNTERS_INTERVAL = float(os.getenv("LOG_COUNTERS_INTERVAL", 30))
+
+logger = logging.getLogger("producers")
+
+_listener = None
+_listener_pid = None
+
+
+def setup():
+    """Attach the queue handler; safe to call again in a forked child"""
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        return logger
+
+    # A forked child inherits the handler but not the listener thread
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    records = queue.SimpleQueue()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    _listener = logging.handlers.QueueListener(records, stream)
+    _listener.start()
+    _listener_pid = os.getpid()
+    atexit.register(_listener.stop)
+
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+class EventCounters:
+    """Per-hub sent counters, logged every `interval` seconds"""
+
+    def __init__(self, interval=LOG_COUNTERS_INTERVAL, sample_rate=LOG_SAMPLE_RATE):
+        self.interval = interval
+        self.sample_rate = sample_rate
+        self.counts = {}
+        self._last_counts = {}
+        self._last_report = time.monotonic()
+
+    def sent(self, name, body):
+        self.counts[name] = self.counts.get(name, 0) + 1
+        if self.sample_rate and random.random() < self.sample_rate:
+            text = body.decode("utf-8") if body[:1] == b"{" else encoding.decode(body)
+            logger.info("[%s] Sent: %s", name, text)
+        if self.interval and time.monotonic() - self._last_report >= self.interval:
+            self.report()
+
+    def report(self):
+        now = time.monotonic()
+        elapsed = max(now - self._last_report, 1e-9)
+        for name, total in self.counts.items():
+            sent = total - self._last_counts.get(name, 0)
+            logger.info("[%s] %d events sent (%.1f/s), total %d", name, sent, sent / elapsed, total)
+        self._last_counts = dict(self.counts)
+        self._last_report = now
+
+
+async def _partition_report_loop(sender, interval):
+    while True:
+        await asyncio.sleep(interval)
+        for name, stats in sender.stats.items():
+            if stats["retries"] or stats["pending"]:
+                logger.info("[%s] retry queue %d events, %d retries, %d events spilled",
+                            name, stats["pending"], stats["retries"], stats["spilled"])
+            skew = partition_skew(stats)
+            if skew is None:
+                continue
+            counts = " ".join(f"{pid}:{n}" for pid, n in stats["partitions"].items())
+            logger.info("[%s] partition skew %.2f (max/mean), events per partition %s", name, skew, counts)
+
+
+def start_partition_report(sender, interval=LOG_COUNTERS_INTERVAL):
+    """Log per-partition event counts, skew and retry queue every `interval` seconds"""
+    if interval:
+        return asyncio.create_task(_partition_report_loop(sender, interval))
@@ -0,0 +1,171 @@
+"""
+Fault injection
+===============
+
+Malformed events mixed into the normal streams, to load-test the Stream
+Analytics quarantine path at volume. FAULT_MIX sets each fault as a ratio of
+the normal events of its hub:
+
+    FAULT_MIX="non_json=0.01,null_order_id=0.005,empty_items=0.005,bad_quantity=0.005,null_user_id=0.01"
+
+    fault           hub          payload                          expected destination
+    non_json        orders       "NOT_JSON fault=non_json ..."    dropped (deserialization error)
+    null_order_id   orders       order with order_id = null       quarantine-orders
+    empty_items     orders       order with items = []            quarantine-orders
+    bad_quantity    orders       items with quantity 0 or < 0     quarantine-orders (base job only)
+    null_user_id    clickstream  event with user_id = null        quarantine-clickstream
+
+Only the base Stream Analytics job quarantines quantities <= 0; the
+marketplace job writes them to fact_order, where nothing identifies them
+afterwards. bad_quantity is therefore skipped unless
+FAULT_QUANTITY_QUARANTINE=1 says the base job is the one running.
+
+Ratios are applied with a running remainder rather than drawn at random, so
+over a run exactly round(ratio * normal events) faults are injected. Each
+faulty event is a copy of a normal one (with new ids) tagged with "fault" (its kind) and
+"fault_run" (FAULT_RUN_ID, random by default); Stream Analytics writes the
+quarantined events with all their fields, so the blobs can be counted per
+run and per kind (scripts/tests/test_quarantine_volume.py) and compared
+with the injected counts: the producer_faults_injected_total metric and
+faults_<run>.json, written at shutdown.
+
+Faulty events are always JSON (what Stream Analytics reads), whatever
+WIRE_FORMAT is, and carry no partition key.
+"""
+
+import json
+import os
+import uuid
+
+import encoding
+import eventlog
+
+log = eventlog.logger
+
+# fault -> hub it is sent to
+FAULTS = {
+    "non_json": "orders",
+    "null_order_id": "orders",
+    "empty_items": "orders",
+    "bad_quantity": "orders",
+    "null_user_id": "clickstream",
+}
+QUARANTINED = {"null_order_id": "quarantine-orders", "empty_items": "quarantine-orders",
+               "bad_quantity": "quarantine-orders", "null_user_id": "quarantine-clickstream"}
+
+FAULT_MIX = os.getenv("FAULT_MIX", "")
+FAULT_RUN_ID = os.getenv("FAULT_RUN_ID", "")
+FAULT_STATS_DIR = os.getenv("FAULT_STATS_DIR", ".")
+# Set when the base job (enable_marketplace=false), which quarantines quantity <= 0, is running
+FAULT_QUANTITY_QUARANTINE = os.getenv("FAULT_QUANTITY_QUARANTINE", "0") == "1"
+
+
+def parse_mix(text):
+    """Ratios per fault from "non_json=0.01,null_user_id=0.02" (missing faults = 0)"""
+    mix = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        fault, _, ratio = part.partition("=")
+        fault = fault.strip()
+        if fault not in FAULTS:
+            raise RuntimeError(f"Unknown fault '{fault}' (expected {', '.join(FAULTS)})")
+        mix[fault] = float(ratio)
+        if mix[fault] < 0:
+            raise RuntimeError(f"FAULT_MIX: negative ratio for {fault}")
+    return mix
+
+
+class FaultInjector:
+    """Faulty copies of normal events, in the configured ratio per hub"""
+
+    def __init__(self, mix, run_id=None):
+        self.mix = mix
+        self.run_id = run_id or os.urandom(3).hex()
+        self.counts = {fault: 0 for fault in mix}
+        self._remainder = {fault: 0.0 for fault in mix}
+        self._by_hub = {}
+        for fault in mix:
+            self._by_hub.setdefault(FAULTS[fault], []).append(fault)
+
+    @property
+    def hubs(self):
+        return tuple(self._by_hub)
+
+    def inject(self, hub, events):
+        """(fault, body) pairs to send next to the normal `events` of `hub`"""
+        faults = self._by_hub.get(hub)
+        if not faults or not events:
+            return []
+        bodies = []
+        for fault in faults:
+            due = self._remainder[fault] + self.mix[fault] * len(events)
+            n = int(due)
+            self._remainder[fault] = due - n
+            for k in range(n):
+                bodies.append((fault, self._body(fault, events[k % len(events)])))
+            self.counts[fault] += n
+        return bodies
+
+    def _body(self, fault, event):
+        seq = self.counts[fault]
+        if fault == "non_json":
+            return f"NOT_JSON fault=non_json fault_run={self.run_id} seq={seq}".encode("utf-8")
+        # Fresh ids: a fault that is not quarantined must not duplicate the original event
+        event = {**event, "event_id": str(uuid.uuid4()), "fault": fault, "fault_run": self.run_id}
+        if "order_id" in event:
+            event["order_id"] = str(uuid.uuid4())
+        if fault == "null_order_id":
+            event["order_id"] = None
+        elif fault == "empty_items":
+            event["items"] = []
+        elif fault == "bad_quantity":
+            # 0, -1, -2, ... so both zero and negative quantities are covered
+            event["items"] = [{**item, "quantity": -((seq + i) % 3)} for i, item in enumerate(event["items"])]
+        elif fault == "null_user_id":
+            event["user_id"] = None
+        return encoding.dumps(event)
+
+    def expected(self):
+        """Injected counts and where each fault should end up"""
+        destinations = {}
+        for fault, n in self.counts.items():
+            target = QUARANTINED.get(fault, "dropped")
+            destinations[target] = destinations.get(target, 0) + n
+        return {"run_id": self.run_id, "injected": dict(self.counts), "destinations": destinations}
+
+    def report(self):
+        log.info("[faults] run %s injected %s", self.run_id,
+                 ", ".join(f"{fault} {n}" for fault, n in self.counts.items()))
+
+    def write_stats(self, directory=FAULT_STATS_DIR):
+        self.report()
+        path = os.path.join(directory, f"faults_{self.run_id}.json")
+        with open(path, "w") as f:
+            json.dump(self.expected(), f, indent=2)
+        print(f"📝 Injected fault counts written to {path}")
+        return path
+
+
+def make_injector():
+    """FaultInjector from FAULT_MIX / FAULT_RUN_ID, or None when no fault is configured"""
+    mix = {fault: ratio for fault, ratio in parse_mix(FAULT_MIX).items() if ratio > 0}
+    if "bad_quantity" in mix and not FAULT_QUANTITY_QUARANTINE:
+        del mix["bad_quantity"]
+        print("⚠️  bad_quantity skipped: the marketplace job would write it to fact_order "
+              "(set FAULT_QUANTITY_QUARANTINE=1 with the base job)")
+    if not mix:
+        return None
+    injector = FaultInjector(mix, FAULT_RUN_ID or None)
+    print(f"💥 Fault injection run {injector.run_id}: "
+          + ", ".join(f"{fault} {ratio:g} x {FAULTS[fault]}" for fault, ratio in mix.items()))
+    return injector
+
+
+async def send_faults(sender, injector, hub, events):
+    """Send the faults due for the normal `events` of `hub`"""
+    for fault, body in injector.inject(hub, events):
+        try:
+            await sender.send(hub, body)
+        except Exception as e:
+            log.error("[faults] Error sending %s event: %s", fault, e)
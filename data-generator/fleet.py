@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Producer fleet
+==============
+
+Forks N worker processes, each running the orders/clickstream generators of
+producers.py in target-rate mode. Every worker owns a disjoint shard of the
+customer and product pools, its own range of each hub's partitions
+(sender.partition_range), and 1/N of the target rate. Workers push their
+rate reports to the parent, which prints totals. With CONTROL_PORT set, the
+parent serves the traffic control endpoint and forwards every command to the
+workers. With FAULT_MIX set, every worker injects faults under the same run
+id and the parent writes the fleet's total counts on shutdown.
+
+Usage:
+    PRODUCER_WORKERS=4 CLICKSTREAM_RATE=20000 python fleet.py
+"""
+
+import asyncio
+import multiprocessing as mp
+import os
+import queue
+import random
+import signal
+import sys
+import time
+
+import common
+import eventlog
+import faults
+import metrics
+import producers
+import traffic
+from sender import cancel_on_sigterm
+
+WORKERS = int(os.getenv("PRODUCER_WORKERS", os.cpu_count() or 1))
+METRICS_PORT = metrics.METRICS_PORT
+
+
+def shard(pool, index, count):
+    """Disjoint slice of a pool for worker `index` out of `count`"""
+    return pool[index::count]
+
+
+def worker(index, count, results, commands, injector):
+    """Worker process: sharded pools and partitions, 1/count of the target rate"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    eventlog.setup()
+
+    # Forked children inherit the parent's RNG state: reseed both generators
+    random.seed()
+    common.fake.seed_instance(None)
+
+    customers, products = common.load_pools()
+    common.CUSTOMERS_POOL = shard(customers, index, count)
+    common.PRODUCTS_POOL = shard(products, index, count)
+    controller = traffic.make_controller(producers.target_rates(), share=1 / count)
+
+    async def run():
+        # SIGTERM from the parent: flush and drain before exiting
+        cancel_on_sigterm()
+        try:
+            async with common.make_sender(producers.EVENT_HUBS, partitions=(index, count),
+                                          spill_name=f"fleet-{index}") as sender:
+                eventlog.start_partition_report(sender)
+                # One endpoint per worker: METRICS_PORT + 1 + index
+                metrics.register_sender(sender, worker=index)
+                metrics.register_event_counters(common.counters, worker=index)
+                if injector:
+                    metrics.register_faults(injector, worker=index)
+                metrics.start_server(METRICS_PORT + 1 + index if METRICS_PORT else 0)
+
+                def on_report(rows):
+                    results.put((index, rows, sender.stats))
+
+                await producers.run_target_rate(sender, on_report=on_report, controller=controller,
+                                                commands=commands, injector=injector)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if injector:
+                # Final counts: the parent writes the run's totals
+                results.put((index, None, dict(injector.counts)))
+
+    asyncio.run(run())
+
+
+def print_totals(latest, count):
+    """Aggregate the latest report of every worker, per hub"""
+    hubs = {}
+    for rows, stats in latest.values():
+        for name, row in rows.items():
+            total = hubs.setdefault(name, {"requested": 0.0, "achieved": 0.0, "total": 0, "errors": 0, "pending": 0})
+            total["requested"] += row["requested"]
+            total["achieved"] += row["achieved"]
+            total["total"] += row["total"]
+            total["errors"] += stats.get(name, {}).get("errors", 0)
+            total["pending"] += stats.get(name, {}).get("pending", 0)
+
+    print(f"📈 Fleet: {len(latest)}/{count} workers reporting")
+    for name, total in hubs.items():
+        ratio = total["achieved"] / total["requested"] * 100 if total["requested"] else 0
+        print(f"   [{name}] {total['achieved']:,.1f}/s of {total['requested']:,.1f}/s "
+              f"({ratio:.0f}%), total {total['total']:,}, send errors {total['errors']}, "
+              f"awaiting retry {total['pending']:,}")
+
+
+def wait_for_workers(workers, results, finished, timeout):
+    """Read `results` until every worker has exited, then join them, all within `timeout`
+
+    A worker exits only once its queued reports are written to the pipe, so
+    the queue is read while waiting. Final fault counts go into `finished`
+    (per worker); workers still alive at the deadline are killed.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        alive = any(proc.is_alive() for proc in workers)
+        if alive and time.monotonic() >= deadline:
+            break
+        try:
+            index, rows, stats = results.get(timeout=0.1)
+        except queue.Empty:
+            if alive:
+                continue
+            # Every worker has exited: what they queued is already in the pipe
+            break
+        if rows is None:
+            finished[index] = stats
+    for proc in workers:
+        proc.join(max(0.0, deadline - time.monotonic()))
+        if proc.is_alive():
+            print(f"⚠️  Worker {proc.pid} still running after {timeout:.0f}s, killing it")
+            proc.kill()
+            proc.join()
+
+
+def main():
+    if not (producers.TARGET_RATES or traffic.TRAFFIC_PROFILE):
+        raise RuntimeError("Fleet mode needs ORDERS_RATE and/or CLICKSTREAM_RATE, or TRAFFIC_PROFILE")
+
+    count = max(1, WORKERS)
+    # Loaded before forking: workers share the (memory-mapped) pools
+    common.load_pools()
+    ctx = mp.get_context("fork")
+    results = ctx.Queue()
+
+    # Parent-side controller: validates commands and answers GET /traffic
+    controller = traffic.make_controller(producers.target_rates())
+    commands = [ctx.Queue() for _ in range(count)]
+    # One run id for the whole fleet; each worker counts its own faults
+    injector = faults.make_injector()
+
+    def apply(command):
+        controller.apply(command)
+        for q in commands:
+            q.put(command)
+
+    print(f"🚀 Starting producer fleet with {count} workers")
+    if controller.profile:
+        print(f"🎚️  Traffic profile: {controller.profile}")
+    for name, rate in controller.rates().items():
+        print(f"   [{name}] target {rate:,.2f} events/s ({rate / count:,.2f}/worker)")
+
+    workers = [ctx.Process(target=worker, args=(i, count, results, commands[i], injector), daemon=True)
+               for i in range(count)]
+    for proc in workers:
+        proc.start()
+    traffic.start_control_server(apply, controller.state)
+
+    # Only flagged here: the main loop may be inside results.get(), holding the queue's lock
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+
+    latest = {}
+    # Final fault counts per worker: rows None (a worker can stop first, e.g. SIGTERM to the group)
+    finished = {}
+    last_print = time.monotonic()
+    while not stopping:
+        try:
+            index, rows, stats = results.get(timeout=1)
+            if rows is None:
+                finished[index] = stats
+            else:
+                latest[index] = (rows, stats)
+        except queue.Empty:
+            pass
+
+        dead = [i for i, proc in enumerate(workers) if not proc.is_alive()]
+        if dead and not stopping:
+            # Let supervisord restart the whole fleet with fresh shards
+            print(f"❌ Workers {dead} exited, stopping fleet")
+            for proc in workers:
+                proc.terminate()
+            sys.exit(1)
+
+        if time.monotonic() - last_print >= common.RATE_REPORT_INTERVAL and latest:
+            print_totals(latest, count)
+            last_print = time.monotonic()
+
+    for proc in workers:
+        proc.terminate()
+    # Workers flush and drain their retry queue on SIGTERM; one deadline for
+    # the whole fleet, within supervisord's stopwaitsecs
+    wait_for_workers(workers, results, finished, common.SHUTDOWN_DRAIN_TIMEOUT + 5)
+    if injector:
+        for counts in finished.values():
+            for fault, n in counts.items():
+                injector.counts[fault] += n
+        injector.write_stats()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Producer metrics
+================
+
+Prometheus text-format endpoint served by a ThreadingHTTPServer on a daemon
+thread, so a scrape never runs on the event loop. Values are read from the
+live objects at scrape time (sender stats and histograms, event counters,
+vendor cache); the send loop only increments plain counters.
+
+METRICS_PORT enables the endpoint (0 = disabled):
+    curl localhost:9100/metrics
+"""
+
+import bisect
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+
+# Seconds per Event Hub send
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Events per batch, and bytes per batch (Event Hubs max is 1 MB)
+BATCH_EVENTS_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000)
+BATCH_BYTES_BUCKETS = (1024, 16384, 65536, 262144, 524288, 786432, 1048576)
+
+
+class Histogram:
+    """Cumulative-bucket histogram; observe() is a bisect and three increments"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, labels):
+        """(suffix, labels, value) rows in the Prometheus histogram layout"""
+        rows = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (math.inf,), list(self.counts)):
+            cumulative += n
+            le = "+Inf" if bound == math.inf else repr(bound)
+            rows.append(("_bucket", {**labels, "le": le}, cumulative))
+        rows.append(("_sum", labels, self.sum))
+        rows.append(("_count", labels, cumulative))
+        return rows
+
+
+# Collectors: callables returning [(name, type, help, [(suffix, labels, value)])]
+_collectors = []
+
+
+def register(collect):
+    _collectors.append(collect)
+    return collect
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def render():
+    """Every registered metric in the Prometheus text format"""
+    lines = []
+    for collect in list(_collectors):
+        for name, kind, help_text, samples in collect():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def register_sender(sender, **labels):
+    """Per-hub counters, histograms and queue depths of a BatchSender"""
+    counters = [
+        ("events", "producer_events_sent_total", "Events delivered to Event Hubs"),
+        ("batches", "producer_batches_sent_total", "Batches delivered to Event Hubs"),
+        ("bytes", "producer_bytes_sent_total", "Payload bytes delivered to Event Hubs"),
+        ("errors", "producer_send_errors_total", "Failed batch sends"),
+        ("retries", "producer_send_retries_total", "Batch send retries"),
+        ("spilled", "producer_spilled_events_total", "Events written to the spill file"),
+        ("dropped", "producer_dropped_events_total", "Events given up (unsent at shutdown, larger than a batch)"),
+    ]
+
+    def collect():
+        hubs = list(sender.hubs.items())
+        families = []
+        for key, name, help_text in counters:
+            families.append((name, "counter", help_text,
+                             [("", {**labels, "hub": hub_name}, hub.stats[key]) for hub_name, hub in hubs]))
+        families.append(("producer_partition_events_total", "counter", "Events delivered per partition", [
+            ("", {**labels, "hub": hub_name, "partition": pid}, n)
+            for hub_name, hub in hubs for pid, n in list(hub.stats["partitions"].items())
+        ]))
+        families.append(("producer_retry_queue_events", "gauge", "Events waiting for a retry", [
+            ("", {**labels, "hub": hub_name}, hub.stats["pending"]) for hub_name, hub in hubs
+        ]))
+        families.append(("producer_open_batch_events", "gauge", "Events in batches not yet flushed", [
+            ("", {**labels, "hub": hub_name}, sum(len(b) for b in list(hub.batches.values())))
+            for hub_name, hub in hubs
+        ]))
+        families.append(("producer_sends_in_flight", "gauge", "Batch sends currently running", [
+            ("", {**labels, "hub": hub_name}, len(hub.tasks)) for hub_name, hub in hubs
+        ]))
+        families.append(("producer_send_latency_seconds", "histogram", "Event Hub send latency", [
+            row for hub_name, hub in hubs for row in hub.send_latency.samples({**labels, "hub": hub_name})
+        ]))
+        families.append(("producer_batch_events", "histogram", "Events per delivered batch", [
+            row for hub_name, hub in hubs for row in hub.batch_events.samples({**labels, "hub": hub_name})
+        ]))
+        families.append(("producer_batch_bytes", "histogram", "Bytes per delivered batch", [
+            row for hub_name, hub in hubs for row in hub.batch_bytes.samples({**labels, "hub": hub_name})
+        ]))
+        if sender.spill:
+            families.append(("producer_spill_batches", "gauge", "Batches in the spill file not yet delivered",
+                             [("", labels, sender.spill.depth)]))
+            families.append(("producer_spill_file_bytes", "gauge", "Size of the spill file",
+                             [("", labels, sender.spill.size_in_bytes)]))
+        return families
+
+    return register(collect)
+
+
+def register_event_counters(counters, **labels):
+    """Events generated per stream (eventlog.EventCounters)"""
+    def collect():
+        return [("producer_events_generated_total", "counter", "Events generated and queued for sending", [
+            ("", {**labels, "stream": name}, n) for name, n in list(counters.counts.items())
+        ])]
+
+    return register(collect)
+
+
+def register_vendor_cache(cache, **labels):
+    """Size, refresh count and age of a VendorCache"""
+    def collect():
+        families = [
+            ("vendor_cache_vendors", "gauge", "Active vendors in the cache", [("", labels, len(cache.vendors))]),
+            ("vendor_cache_refreshes_total", "counter", "Successful vendor cache refreshes",
+             [("", labels, cache.refreshes)]),
+        ]
+        age = cache.age
+        if age is not None:
+            families.append(("vendor_cache_age_seconds", "gauge", "Seconds since the last successful refresh",
+                             [("", labels, round(age, 3))]))
+        return families
+
+    return register(collect)
+
+
+def register_sessions(sessions, **labels):
+    """Live sessions and state size of a SessionSimulator"""
+    def collect():
+        families = [
+            ("sessions_live", "gauge", "Live simulated sessions", [("", labels, sessions.live)]),
+            ("sessions_state_bytes_per_session", "gauge", "Array state bytes per session slot",
+             [("", labels, sessions.bytes_per_session)]),
+        ]
+        for key in ("started", "purchases", "abandoned", "rejected"):
+            families.append((f"sessions_{key}_total", "counter", f"Sessions {key}",
+                             [("", labels, sessions.stats[key])]))
+        return families
+
+    return register(collect)
+
+
+def register_vendor_churn(churn, **labels):
+    """Vendor change events by kind, and the registered population (vendor_churn.VendorChurn)"""
+    def collect():
+        return [
+            ("vendor_churn_events_total", "counter", "Vendor change events generated",
+             [("", {**labels, "change": kind}, n) for kind, n in list(churn.stats.items())]),
+            ("vendor_churn_vendors", "gauge", "Vendors registered by insert events", [("", labels, churn.count)]),
+        ]
+
+    return register(collect)
+
+
+def register_faults(injector, **labels):
+    """Malformed events injected per fault kind (faults.FaultInjector)"""
+    def collect():
+        return [("producer_faults_injected_total", "counter", "Malformed events injected", [
+            ("", {**labels, "fault": fault, "run": injector.run_id}, n)
+            for fault, n in list(injector.counts.items())
+        ])]
+
+    return register(collect)
+
+
+def register_startup(phases, **labels):
+    """Duration of each startup phase (boot.phases)"""
+    def collect():
+        rows, previous = [], 0.0
+        for phase, at in list(phases):
+            rows.append(("", {**labels, "phase": phase}, round(at - previous, 4)))
+            previous = at
+        return [("producer_startup_phase_seconds", "gauge", "Duration of each startup phase", rows)]
+
+    return register(collect)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are not worth a log line each
+        pass
+
+
+def start_server(port=METRICS_PORT, host="0.0.0.0"):
+    """Serve /metrics on a daemon thread; no-op when port is 0"""
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"📊 Metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,60 @@
+"""
+Partition-key strategies
+========================
+
+Chooses the partition key of each event so that everything belonging to the
+same entity lands on the same Event Hub partition, and downstream
+per-customer / per-session / per-vendor processing can run partition-parallel.
+
+Strategy per hub, via <HUB>_PARTITION_KEY (e.g. ORDERS_PARTITION_KEY=vendor):
+    orders       customer (default) | order | vendor | none
+    clickstream  session (default) | user | none
+    vendors      vendor (default) | none
+"""
+
+import os
+
+
+def _order_vendor(event):
+    items = event.get("items") or []
+    return items[0].get("vendor_id") if items else None
+
+
+STRATEGIES = {
+    "orders": {
+        "customer": lambda e: (e.get("customer") or {}).get("id"),
+        "order": lambda e: e.get("order_id"),
+        "vendor": _order_vendor,
+    },
+    "clickstream": {
+        "session": lambda e: e.get("session_id"),
+        "user": lambda e: e.get("user_id") or e.get("session_id"),
+    },
+    "vendors": {
+        "vendor": lambda e: e.get("vendor_id"),
+    },
+}
+
+DEFAULTS = {"orders": "customer", "clickstream": "session", "vendors": "vendor"}
+
+
+def key_function(hub):
+    """Partition key extractor for `hub`, or None to let Event Hubs round-robin"""
+    strategy = os.getenv(f"{hub.upper()}_PARTITION_KEY", DEFAULTS.get(hub, "none"))
+    if strategy == "none":
+        return None
+    try:
+        return STRATEGIES[hub][strategy]
+    except KeyError:
+        raise RuntimeError(f"Unknown partition key strategy '{strategy}' for hub '{hub}'")
+
+
+_key_functions = {}
+
+
+def partition_key(hub, event):
+    """Partition key of one event (None when the strategy is 'none' or the field is null)"""
+    if hub not in _key_functions:
+        _key_functions[hub] = key_function(hub)
+    func = _key_functions[hub]
+    return func(event) if func else None
@@ -0,0 +1,235 @@
+"""
+Columnar entity pools
+=====================
+
+Customer and product pools for millions of entities. Each entity is a row
+of small NumPy columns (UUID bytes, indices into interned string
+vocabularies, price in cents); the dict that producers and the columnar
+generator use is only built when the entity is picked, and kept in a
+bounded cache. warm(indices) builds a whole batch of picks at once.
+
+Vocabularies (names, streets, cities, catch phrases, ...) are drawn from
+Faker once, so a million customers cost a few thousand Faker calls and
+about 30 bytes each instead of a million dicts of strings.
+
+The pools are read-only sequences: len(), pool[i] (a dict with the same
+keys as producers.build_*_pool), random.choice / random.sample, and slicing
+(pool[i::n], a view used by fleet shards) all work.
+
+Columns and vocabularies are all a pool is made of, so a pool can be saved
+to a snapshot file and memory-mapped back (snapshot.py); Faker is only
+imported when a pool is actually generated.
+"""
+
+import re
+from collections.abc import Sequence
+
+import numpy as np
+
+from columnar import CATEGORIES, format_uuids, random_uuid_bytes
+
+CACHE_SIZE = 65536
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]")
+
+
+def _vocab(draw, size):
+    """Up to `size` distinct values of `draw()`, in draw order"""
+    return list(dict.fromkeys(draw() for _ in range(size)))
+
+
+def _index(rng, vocabulary, count):
+    """`count` random indices into `vocabulary`, in the smallest unsigned dtype that holds them"""
+    dtype = np.uint8 if len(vocabulary) <= 256 else np.uint16 if len(vocabulary) <= 65536 else np.uint32
+    return rng.integers(0, len(vocabulary), size=count, dtype=dtype)
+
+
+def _slug(text):
+    return _NON_ALNUM.sub("", text.lower())
+
+
+class ColumnarPool(Sequence):
+    """Sequence of entities stored as parallel arrays, materialized on access"""
+
+    columns = ()
+    vocabularies = ()
+
+    @classmethod
+    def from_arrays(cls, columns, vocabularies):
+        """Pool over existing arrays (e.g. memory-mapped from a snapshot)"""
+        pool = object.__new__(cls)
+        for name in cls.vocabularies:
+            setattr(pool, name, vocabularies[name])
+        for name in cls.columns:
+            setattr(pool, name, columns[name])
+        pool._cache = {}
+        pool._derived()
+        return pool
+
+    def __len__(self):
+        return len(getattr(self, self.columns[0]))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._view(index)
+        cache = self._cache
+        record = cache.get(index)
+        if record is None:
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("pool index out of range")
+            if len(cache) >= CACHE_SIZE:
+                cache.clear()
+            record = cache[index] = self._materialize([index])[0]
+        return record
+
+    def warm(self, indices):
+        """Materialize the rows of `indices` (array or list) in one vectorized pass"""
+        cache = self._cache
+        wanted = list(dict.fromkeys(np.ravel(indices).tolist()))
+        missing = [i for i in wanted if i not in cache]
+        if not missing:
+            return
+        if len(cache) + len(missing) > CACHE_SIZE:
+            cache.clear()
+            missing = wanted
+        cache.update(zip(missing, self._materialize(missing)))
+
+    def _view(self, rows):
+        """Pool over a slice of the rows; arrays are NumPy views, vocabularies shared"""
+        view = object.__new__(type(self))
+        view.__dict__.update(self.__dict__)
+        for name in self.columns:
+            setattr(view, name, getattr(self, name)[rows])
+        view._cache = {}
+        view._derived()
+        return view
+
+    def _derived(self):
+        """Rebuild attributes computed from the columns"""
+
+    @property
+    def nbytes(self):
+        """Bytes held by the columns (vocabularies excluded)"""
+        return sum(getattr(self, name).nbytes for name in self.columns)
+
+
+class CustomerPool(ColumnarPool):
+    """Customers: id, name, email, address, city, country"""
+
+    columns = ("ids", "first", "last", "domain", "number", "street", "city", "country")
+    vocabularies = ("first_names", "last_names", "first_slugs", "last_slugs", "domains", "streets",
+                    "cities", "countries")
+
+    def __init__(self, count, seed=None, vocab_size=2000):
+        from faker import Faker
+        rng = np.random.default_rng(seed)
+        fake = Faker()
+        fake.seed_instance(seed)
+
+        self.first_names = _vocab(fake.first_name, vocab_size)
+        self.last_names = _vocab(fake.last_name, vocab_size)
+        self.first_slugs = [_slug(s) for s in self.first_names]
+        self.last_slugs = [_slug(s) for s in self.last_names]
+        self.domains = _vocab(fake.free_email_domain, 100)
+        self.streets = _vocab(fake.street_name, vocab_size)
+        self.cities = _vocab(fake.city, vocab_size)
+        self.countries = _vocab(fake.country, vocab_size)
+
+        self.ids = random_uuid_bytes(rng, count)
+        self.first = _index(rng, self.first_names, count)
+        self.last = _index(rng, self.last_names, count)
+        self.domain = _index(rng, self.domains, count)
+        self.number = rng.integers(1, 10000, size=count, dtype=np.uint16)
+        self.street = _index(rng, self.streets, count)
+        self.city = _index(rng, self.cities, count)
+        self.country = _index(rng, self.countries, count)
+        self._cache = {}
+
+    def _materialize(self, rows):
+        ids = format_uuids(self.ids[rows])
+        first, last, number = self.first[rows].tolist(), self.last[rows].tolist(), self.number[rows].tolist()
+        domain, street = self.domain[rows].tolist(), self.street[rows].tolist()
+        city, country = self.city[rows].tolist(), self.country[rows].tolist()
+        return [
+            {
+                "id": ids[k],
+                "name": f"{self.first_names[first[k]]} {self.last_names[last[k]]}",
+                "email": f"{self.first_slugs[first[k]]}.{self.last_slugs[last[k]]}{number[k] % 100}"
+                         f"@{self.domains[domain[k]]}",
+                "address": f"{number[k]} {self.streets[street[k]]}",
+                "city": self.cities[city[k]],
+                "country": self.countries[country[k]],
+            }
+            for k in range(len(rows))
+        ]
+
+
+class _Lazy(Sequence):
+    """Read-only sequence computed per index from a function"""
+
+    def __init__(self, length, func):
+        self._length = length
+        self._func = func
+        self._cache = {}
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        value = self._cache.get(index)
+        if value is None:
+            if len(self._cache) >= CACHE_SIZE:
+                self._cache.clear()
+            value = self._cache[index] = self._func(index)
+        return value
+
+
+class ProductPool(ColumnarPool):
+    """Products: product_id, name, category, description, price
+
+    Also provides what ColumnarGenerator otherwise builds per product:
+    `prices` (array), `items` (item dict of product j // 3 with quantity
+    j % 3 + 1) and `urls` ("/product/<id>"), all computed lazily.
+    """
+
+    columns = ("ids", "name", "category", "description", "cents")
+    vocabularies = ("names", "descriptions")
+
+    def __init__(self, count, seed=None, vocab_size=5000):
+        from faker import Faker
+        rng = np.random.default_rng(seed)
+        fake = Faker()
+        fake.seed_instance(seed)
+
+        self.names = _vocab(fake.catch_phrase, vocab_size)
+        self.descriptions = _vocab(fake.sentence, vocab_size)
+
+        self.ids = random_uuid_bytes(rng, count)
+        self.name = _index(rng, self.names, count)
+        self.category = _index(rng, CATEGORIES, count)
+        self.description = _index(rng, self.descriptions, count)
+        self.cents = rng.integers(500, 30001, size=count, dtype=np.uint32)
+        self._cache = {}
+        self._derived()
+
+    def _derived(self):
+        self.prices = self.cents / 100
+        self.items = _Lazy(3 * len(self), lambda j: {**self[j // 3], "quantity": j % 3 + 1})
+        self.urls = _Lazy(len(self), lambda i: f"/product/{self[i]['product_id']}")
+
+    def _materialize(self, rows):
+        ids = format_uuids(self.ids[rows])
+        name, category = self.name[rows].tolist(), self.category[rows].tolist()
+        description, cents = self.description[rows].tolist(), self.cents[rows].tolist()
+        return [
+            {
+                "product_id": ids[k],
+                "name": self.names[name[k]],
+                "category": CATEGORIES[category[k]],
+                "description": self.descriptions[description[k]],
+                "price": cents[k] / 100,
+            }
+            for k in range(len(rows))
+        ]
@@ -1,58 +1,43 @@
-from azure.eventhub import EventHubProducerClient, EventData
-import json
+import boot  # first: startup clock
+import asyncio
 import time
 import random
 import uuid
 import os
-from faker import Faker
 
-# Initialize Faker
-fake = Faker()
+import common
+import eventlog
+import faults
+import metrics
+import traffic
+from common import RATE_REPORT_INTERVAL, SESSION_CAPACITY, SESSION_SIMULATION, SESSION_THINK_TIME, safe_send
+from rate import RateScheduler
+from sender import cancel_on_sigterm
 
-# On lit la connexion depuis une variable d'environnement
-CONNECTION_STR = os.getenv("EVENTHUB_CONNECTION_STR")
+# Connection, batching, pools and sender are shared with streams.py (common.py)
 ORDERS_INTERVAL      = int(os.getenv("ORDERS_INTERVAL", 60))
 PRODUCTS_INTERVAL    = int(os.getenv("PRODUCTS_INTERVAL", 120))
 CLICKSTREAM_INTERVAL = int(os.getenv("CLICKSTREAM_INTERVAL", 2))
 
-if not CONNECTION_STR:
-    raise RuntimeError("EVENTHUB_CONNECTION_STR n'est pas définie dans les variables d'environnement")
+# Target-rate mode (events/s); 0 keeps the interval-based loop
+ORDERS_RATE      = float(os.getenv("ORDERS_RATE", 0))
+CLICKSTREAM_RATE = float(os.getenv("CLICKSTREAM_RATE", 0))
+# Target-rate mode generates events in NumPy batches unless disabled
+COLUMNAR_GENERATION  = os.getenv("COLUMNAR_GENERATION", "1") == "1"
 
 EVENT_HUBS = {
     "orders": ORDERS_INTERVAL,
     "clickstream": CLICKSTREAM_INTERVAL,
 }
 
-producers = {
-    name: EventHubProducerClient.from_connection_string(CONNECTION_STR, eventhub_name=name)
-    for name in EVENT_HUBS
+TARGET_RATES = {
+    name: rate
+    for name, rate in {"orders": ORDERS_RATE, "clickstream": CLICKSTREAM_RATE}.items()
+    if rate > 0
 }
 
 timers = {name: 0.0 for name in EVENT_HUBS}
 
-# Global pool of customers
-CUSTOMERS_POOL = []
-for _ in range(100):
-    CUSTOMERS_POOL.append({
-        "id": str(uuid.uuid4()),
-        "name": fake.name(),
-        "email": fake.email(),
-        "address": fake.street_address(),
-        "city": fake.city(),
-        "country": fake.country()
-    })
-
-# Global pool of products
-PRODUCTS_POOL = []
-for _ in range(1000):
-    PRODUCTS_POOL.append({
-        "product_id": str(uuid.uuid4()),
-        "name": fake.catch_phrase(),
-        "category": random.choice(["Electronics", "Home", "Clothing", "Books", "Beauty"]),
-        "description": fake.sentence(),
-        "price": round(random.uniform(5, 300), 2)
-    })
-
 def build_event(name, now):
     if name == "orders":
         order_id = str(uuid.uuid4())
@@ -60,7 +45,7 @@ def build_event(name, now):
         total_amount = 0
         num_items = random.randint(1, 5)
         # Select unique products to avoid duplicates in the same order
-        selected_products = random.sample(PRODUCTS_POOL, num_items)
+        selected_products = random.sample(common.PRODUCTS_POOL, num_items)
         
         for product in selected_products:
             qty = random.randint(1, 3)
@@ -71,7 +56,7 @@ def build_event(name, now):
             total_amount += product["price"] * qty
         
         # Pick a random customer from the pool
-        customer = random.choice(CUSTOMERS_POOL)
+        customer = random.choice(common.CUSTOMERS_POOL)
 
         return {
             "event_id": str(uuid.uuid4()),
@@ -95,7 +80,7 @@ def build_event(name, now):
             url = "/checkout"
         else:  # view_page
             category = random.choice(["Electronics", "Home", "Clothing", "Books", "Beauty"])
-            product = random.choice(PRODUCTS_POOL)
+            product = random.choice(common.PRODUCTS_POOL)
             url = random.choice([
                 "/",
                 "/login",
@@ -109,30 +94,111 @@ def build_event(name, now):
             "user_id": str(uuid.uuid4()) if (event_type == "checkout_start" or random.random() > 0.3) else None,
             "url": url,
             "event_type": event_type,
-            "user_agent": fake.user_agent(),
-            "ip_address": fake.ipv4(),
+            "user_agent": common.fake.user_agent(),
+            "ip_address": common.fake.ipv4(),
             "timestamp": now
         }
 
-def safe_send(name, event):
+def target_rates():
+    """Per-hub events/s; hubs without a target rate keep their interval"""
+    return {name: TARGET_RATES.get(name, 1 / interval) for name, interval in EVENT_HUBS.items()}
+
+async def run_target_rate(sender, rates=None, on_report=None, controller=None, commands=None, injector=None):
+    """Drive each hub at its target rate, or at the rates of a TrafficController
+
+    `injector` (faults.FaultInjector) adds malformed events in its ratio to the normal ones.
+    """
+    if controller:
+        rates = controller.rates()
+    rates = rates or target_rates()
+    if SESSION_SIMULATION:
+        # Orders are emitted by converting sessions, not scheduled
+        rates = {name: rate for name, rate in rates.items() if name != "orders"}
+    scheduler = RateScheduler(rates, report_every=RATE_REPORT_INTERVAL, on_report=on_report)
+    # NumPy-based, imported only in target-rate mode
+    from columnar import ColumnarGenerator
+    from sessions import SessionSimulator
+    # Built here, after fleet workers have sharded the pools
+    generator = ColumnarGenerator(*common.load_pools()) if COLUMNAR_GENERATION or SESSION_SIMULATION else None
+    sessions = SessionSimulator(generator, SESSION_CAPACITY, SESSION_THINK_TIME) if SESSION_SIMULATION else None
+    if sessions:
+        metrics.register_sessions(sessions)
+
+    async def emit(name, n):
+        now = time.time()
+        if sessions and name == "clickstream":
+            events = sessions.clickstream(n, now)
+        elif generator:
+            events = generator.batch(name, n, now)
+        else:
+            events = [build_event(name, now) for _ in range(n)]
+        for event in events:
+            await safe_send(sender, name, event)
+        if injector:
+            await faults.send_faults(sender, injector, name, events)
+        if sessions:
+            orders = sessions.take_orders()
+            for order in orders:
+                await safe_send(sender, "orders", order)
+            if injector:
+                await faults.send_faults(sender, injector, "orders", orders)
+
+    for name, rate in rates.items():
+        print(f"   [{name}] target {rate:,.2f} events/s")
+    if sessions:
+        print(f"   [sessions] capacity {sessions.capacity:,}, {sessions.bytes_per_session:.0f} bytes/session "
+              f"({sessions.bytes_per_session * sessions.capacity / 1024 / 1024:,.0f} MB), "
+              f"orders from converting sessions")
+    control = asyncio.create_task(controller.run(scheduler, commands)) if controller else None
     try:
-        batch = producers[name].create_batch()
-        batch.add(EventData(json.dumps(event)))
-        producers[name].send_batch(batch)
-        print(f"[{name}] Sent:", json.dumps(event, indent=2))
-    except Exception as e:
-        print("Erreur:", e)
+        await scheduler.run(emit)
+    finally:
+        if control:
+            control.cancel()
 
-if __name__ == "__main__":
+async def main():
+    eventlog.setup()
     print("Multi-producer démarré dans le container.")
+    common.load_pools()
+    injector = faults.make_injector()
+    cancel_on_sigterm()
 
-    while True:
-        now = time.time()
-
-        for name, interval in EVENT_HUBS.items():
-            if now - timers[name] >= interval:
-                event = build_event(name, now)
-                safe_send(name, event)
-                timers[name] = now
+    try:
+        async with common.make_sender(EVENT_HUBS) as sender:
+            boot.mark("event hubs")
+            boot.watch_first_event(sender)
+            eventlog.start_partition_report(sender)
+            metrics.register_sender(sender)
+            metrics.register_event_counters(common.counters)
+            metrics.register_startup(boot.phases)
+            if injector:
+                metrics.register_faults(injector)
+            metrics.start_server()
+            if TARGET_RATES or traffic.TRAFFIC_PROFILE or traffic.CONTROL_PORT:
+                controller = traffic.make_controller(target_rates())
+                traffic.start_control_server(controller.apply, controller.state)
+                if controller.profile:
+                    print(f"🎚️  Traffic profile: {controller.profile}")
+                await run_target_rate(sender, controller=controller, injector=injector)
+                return
+
+            while True:
+                now = time.time()
+
+                for name, interval in EVENT_HUBS.items():
+                    if now - timers[name] >= interval:
+                        event = build_event(name, now)
+                        await safe_send(sender, name, event)
+                        if injector:
+                            await faults.send_faults(sender, injector, name, [event])
+                        timers[name] = now
+
+                await asyncio.sleep(0.5)
+    except asyncio.CancelledError:
+        print("🛑 SIGTERM: batches en attente envoyés, producer arrêté")
+    finally:
+        if injector:
+            injector.write_stats()
 
-        time.sleep(0.5)
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,148 @@
+"""
+Target-rate scheduling
+======================
+
+Token buckets drive each stream at a target events-per-second figure.
+A single timer heap wakes the stream that is due next, emits every token
+available at that moment and reports achieved versus requested rate.
+Rates can be changed while running (set_rate); a stream at rate 0 is paused.
+Between two due times the loop sleeps: a stream at one event per minute
+costs one wake-up per minute, and set_rate() wakes the loop to re-plan.
+"""
+
+import asyncio
+import heapq
+import time
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/s, at most `burst` banked"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        # Default burst = 100 ms worth of tokens, never less than one event
+        self.burst = float(burst) if burst else max(1.0, self.rate * 0.1)
+        # Start with one token so the first event goes out immediately
+        self.tokens = 1.0 if self.rate > 0 else 0.0
+        self.updated = time.monotonic()
+
+    def refill(self, now=None):
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, n, now=None):
+        """Take up to n whole tokens, return how many were granted"""
+        self.refill(now)
+        granted = min(n, int(self.tokens))
+        self.tokens -= granted
+        return granted
+
+    def delay(self, n=1):
+        """Seconds until n tokens are available"""
+        missing = n - self.tokens
+        return max(0.0, missing / self.rate) if self.rate > 0 else float("inf")
+
+
+class RateScheduler:
+    """Runs several streams at target rates from one timer heap"""
+
+    def __init__(self, rates, report_every=10.0, tick=0.01, max_chunk=5000, on_report=None, max_wait=None):
+        self.buckets = {name: TokenBucket(rate) for name, rate in rates.items()}
+        self.report_every = report_every
+        self.tick = tick
+        # Optional cap on the time between two looks at a stream
+        self.max_wait = max_wait
+        self.max_chunk = max_chunk
+        # Called with report() rows instead of printing them (fleet workers)
+        self.on_report = on_report
+        self.counts = {name: 0 for name in self.buckets}
+        self._last_counts = dict(self.counts)
+        self._last_report = time.monotonic()
+        # Set by set_rate(): the sleeping loop re-plans every stream
+        self._replan = asyncio.Event()
+
+    def set_rate(self, name, rate):
+        bucket = self.buckets[name]
+        if float(rate) == bucket.rate:
+            return
+        bucket.refill()
+        bucket.rate = float(rate)
+        bucket.burst = max(1.0, bucket.rate * 0.1)
+        bucket.tokens = min(bucket.tokens, bucket.burst)
+        self._replan.set()
+
+    def report(self):
+        """Achieved vs requested rate since the last report, per stream"""
+        now = time.monotonic()
+        elapsed = max(now - self._last_report, 1e-9)
+        rows = {}
+        for name, bucket in self.buckets.items():
+            sent = self.counts[name] - self._last_counts[name]
+            rows[name] = {
+                "requested": bucket.rate,
+                "achieved": sent / elapsed,
+                "total": self.counts[name],
+            }
+        self._last_counts = dict(self.counts)
+        self._last_report = now
+        return rows
+
+    def print_report(self):
+        for name, row in self.report().items():
+            ratio = row["achieved"] / row["requested"] * 100 if row["requested"] else 0
+            print(f"[{name}] rate {row['achieved']:,.1f}/s of {row['requested']:,.1f}/s "
+                  f"requested ({ratio:.0f}%), total {row['total']:,}")
+
+    async def _sleep(self, seconds):
+        """Sleep up to `seconds` (inf = until woken); True when set_rate() woke us"""
+        try:
+            await asyncio.wait_for(self._replan.wait(), None if seconds == float("inf") else seconds)
+        except asyncio.TimeoutError:
+            return False
+        self._replan.clear()
+        return True
+
+    async def run(self, emit, duration=None):
+        """Call `await emit(name, n)` whenever n events are due for a stream"""
+        now = time.monotonic()
+        heap = [(now, name) for name in self.buckets]
+        heapq.heapify(heap)
+        deadline = now + duration if duration else None
+        self._replan.clear()
+
+        while heap:
+            due, name = heap[0]
+            now = time.monotonic()
+            if deadline and now >= deadline:
+                break
+            if self.report_every and now - self._last_report >= self.report_every:
+                if self.on_report:
+                    self.on_report(self.report())
+                else:
+                    self.print_report()
+            if due > now:
+                wake = min(due, deadline) if deadline else due
+                if self.report_every:
+                    wake = min(wake, self._last_report + self.report_every)
+                if await self._sleep(wake - now):
+                    # A rate changed: every stream is due again now
+                    now = time.monotonic()
+                    heap = [(now, name) for name in self.buckets]
+                    heapq.heapify(heap)
+                continue
+            heapq.heappop(heap)
+
+            bucket = self.buckets[name]
+            n = bucket.take(self.max_chunk, now)
+            if n:
+                await emit(name, n)
+                self.counts[name] += n
+                # Yield so the sender's in-flight tasks get a turn
+                await asyncio.sleep(0)
+
+            # Paused streams (rate 0) sleep until set_rate() re-plans
+            wait = max(self.tick, bucket.delay(1))
+            if self.max_wait:
+                wait = min(self.max_wait, wait)
+            heapq.heappush(heap, (time.monotonic() + wait, name))
@@ -0,0 +1,491 @@
+"""
+Async batched sender
+====================
+
+Packs events into as few batches as possible and sends them through a
+pluggable sink. A batch is flushed when it is full (max events or max size)
+or when its oldest event has waited longer than the linger time. Several
+sends per hub can be in flight at once. Events with a partition key are
+grouped into per-partition batches.
+
+A batch whose send fails (including ServerBusy throttling) is written to the
+optional spill file and retried from a bounded in-memory queue with jittered
+exponential backoff. When the queue is full, send() blocks: generation slows
+down to what the sink accepts.
+
+Sinks:
+    EventHubSink  - azure.eventhub.aio producer client (production)
+    MemorySink    - in-memory stand-in used by bench.py
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import signal
+import time
+import zlib
+
+from metrics import BATCH_BYTES_BUCKETS, BATCH_EVENTS_BUCKETS, LATENCY_BUCKETS, Histogram
+
+
+class EventHubBatch:
+    """Thin wrapper so the sender only deals with raw bytes"""
+
+    def __init__(self, batch):
+        from azure.eventhub import EventData
+
+        self._event_data = EventData
+        self.batch = batch
+        # Kept so a failed batch can be spilled and rebuilt
+        self.bodies = []
+
+    def add(self, body):
+        # Raises ValueError when the batch is full
+        self.batch.add(self._event_data(body))
+        self.bodies.append(body)
+
+    def __len__(self):
+        return len(self.batch)
+
+    @property
+    def size_in_bytes(self):
+        return self.batch.size_in_bytes
+
+
+class EventHubSink:
+    """Sink backed by azure.eventhub.aio"""
+
+    def __init__(self, connection_str, eventhub_name):
+        from azure.eventhub.aio import EventHubProducerClient
+
+        self.client = EventHubProducerClient.from_connection_string(
+            connection_str, eventhub_name=eventhub_name
+        )
+
+    async def partition_ids(self):
+        return await self.client.get_partition_ids()
+
+    async def create_batch(self, partition_id=None, partition_key=None):
+        return EventHubBatch(await self.client.create_batch(
+            partition_id=partition_id, partition_key=partition_key
+        ))
+
+    async def send(self, batch):
+        await self.client.send_batch(batch.batch)
+
+    async def close(self):
+        await self.client.close()
+
+
+class MemoryBatch:
+    """Batch with the same size limit semantics as EventDataBatch"""
+
+    def __init__(self, max_size_in_bytes):
+        self.max_size_in_bytes = max_size_in_bytes
+        self.size_in_bytes = 0
+        self.bodies = []
+
+    def add(self, body):
+        size = len(body)
+        if self.size_in_bytes + size > self.max_size_in_bytes:
+            raise ValueError("EventDataBatch has reached its size limit")
+        self.bodies.append(body)
+        self.size_in_bytes += size
+
+    def __len__(self):
+        return len(self.bodies)
+
+
+class MemorySink:
+    """In-memory sink: counts what it receives, optionally simulates latency and failures"""
+
+    def __init__(self, latency=0.0, max_size_in_bytes=1024 * 1024, keep=False, partitions=4,
+                 failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.partitions = [str(i) for i in range(partitions)]
+        self.max_size_in_bytes = max_size_in_bytes
+        self.keep = keep
+        self.received = []
+        self.events = 0
+        self.batches = 0
+
+    async def partition_ids(self):
+        return self.partitions
+
+    async def create_batch(self, partition_id=None, partition_key=None):
+        return MemoryBatch(self.max_size_in_bytes)
+
+    async def send(self, batch):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise ConnectionError("simulated send failure")
+        self.events += len(batch)
+        self.batches += 1
+        if self.keep:
+            self.received.extend(batch.bodies)
+
+    async def close(self):
+        pass
+
+
+class _HubState:
+    def __init__(self, sink, max_in_flight):
+        self.sink = sink
+        self.partition_ids = []
+        # Next partition for keyless events of a sender with a partition range
+        self.rotation = itertools.count()
+        # Open batch and its opening time, per partition id (None = unrouted)
+        self.batches = {}
+        self.opened_at = {}
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.tasks = set()
+        self.lock = asyncio.Lock()
+        self.stats = {
+            "events": 0, "batches": 0, "bytes": 0, "errors": 0,
+            # Retry queue: attempts, events written to the spill file, events awaiting delivery,
+            # events given up for good (unsent at shutdown without a spill file)
+            "retries": 0, "spilled": 0, "pending": 0, "dropped": 0,
+            "partitions": {},
+        }
+        self.send_latency = Histogram(LATENCY_BUCKETS)
+        self.batch_events = Histogram(BATCH_EVENTS_BUCKETS)
+        self.batch_bytes = Histogram(BATCH_BYTES_BUCKETS)
+
+    def delivered(self, batch, pid, latency):
+        self.stats["events"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["bytes"] += batch.size_in_bytes
+        if pid in self.stats["partitions"]:
+            self.stats["partitions"][pid] += len(batch)
+        self.send_latency.observe(latency)
+        self.batch_events.observe(len(batch))
+        self.batch_bytes.observe(batch.size_in_bytes)
+
+
+def partition_for(key, partition_ids):
+    """Stable key -> partition id (Python's hash() is salted per process)"""
+    return partition_ids[zlib.crc32(key.encode("utf-8")) % len(partition_ids)]
+
+
+def partition_range(partition_ids, index, count):
+    """Contiguous share of the partitions for sender `index` out of `count`
+
+    Disjoint while count <= partitions; beyond that, senders share one partition each.
+    """
+    n = len(partition_ids)
+    if count > n:
+        return [partition_ids[index % n]]
+    return partition_ids[index * n // count:(index + 1) * n // count]
+
+
+def is_throttled(error):
+    """ServerBusy from Event Hubs (checked by name: the sender does not import azure)"""
+    return type(error).__name__ == "ServerBusyError"
+
+
+def cancel_on_sigterm():
+    """Turn SIGTERM into cancellation of the current task
+
+    `async with sender` then exits normally: pending batches are flushed and
+    the retry queue is drained (what is left stays in the spill file).
+    A second SIGTERM is ignored while shutting down.
+    """
+    task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+
+    def stop():
+        loop.add_signal_handler(signal.SIGTERM, lambda: None)
+        task.cancel()
+
+    loop.add_signal_handler(signal.SIGTERM, stop)
+
+
+def partition_skew(stats):
+    """max / mean events per partition for one hub's stats; 1.0 is perfectly even"""
+    counts = list(stats["partitions"].values())
+    if not counts or not sum(counts):
+        return None
+    return max(counts) / (sum(counts) / len(counts))
+
+
+class BatchSender:
+    """Batches events per hub and partition, keeps up to max_in_flight sends running
+
+    Events sent with a partition key are routed to a partition id computed
+    from the key, so every event of the same key lands on the same partition
+    and each partition gets its own, well-filled batches. With `partitions`
+    = (index, count) the sender only uses its partition_range() of each hub,
+    keyless events included (fleet workers).
+
+    Failed batches go to `spill` (a spill.SpillFile, optional) and to a retry
+    queue of at most `max_pending` batches; send() waits while it is full.
+    Retries back off exponentially from `retry_base` to `retry_max` seconds
+    with full jitter, and wait at least `throttle_delay` after ServerBusy.
+    close() gives the retry queue up to `drain_timeout` seconds.
+    """
+
+    def __init__(self, sink_factory, hubs, max_events=500, linger=0.05, max_in_flight=4,
+                 partitions=None, spill=None, max_pending=1000, retry_base=0.1,
+                 retry_max=30.0, throttle_delay=4.0, drain_timeout=10.0):
+        self.sink_factory = sink_factory
+        self.partitions = partitions
+        self.hub_names = list(hubs)
+        self.max_events = max_events
+        self.linger = linger
+        self.max_in_flight = max_in_flight
+        self.spill = spill
+        self.max_pending = max_pending
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.throttle_delay = throttle_delay
+        self.drain_timeout = drain_timeout
+        self.hubs = {}
+        self._linger_task = None
+        self._retry_task = None
+        # Heap of (due, order, spill seq, hub name, partition id, bodies, attempt)
+        self._retry = []
+        self._order = itertools.count()
+        # (spill seq, hub name, partition id, bodies) of the batch being resent, if any
+        self._resending = None
+        self._retry_wakeup = asyncio.Event()
+        self._retry_space = asyncio.Event()
+        self._retry_space.set()
+        # Set once a batch has been delivered (startup report)
+        self.first_delivery = asyncio.Event()
+
+    async def start(self):
+        for name in self.hub_names:
+            hub = _HubState(self.sink_factory(name), self.max_in_flight)
+            hub.partition_ids = await hub.sink.partition_ids()
+            if self.partitions and hub.partition_ids:
+                hub.partition_ids = partition_range(hub.partition_ids, *self.partitions)
+            hub.stats["partitions"] = {pid: 0 for pid in hub.partition_ids}
+            self.hubs[name] = hub
+        if self.spill:
+            leftover = self.spill.open()
+            for seq, name, pid, bodies in leftover:
+                if name in self.hubs:
+                    self._queue_retry(seq, name, pid, bodies, attempt=0, delay=0)
+            if leftover:
+                print(f"[spill] {len(leftover)} undelivered batches loaded from {self.spill.path}")
+        self._linger_task = asyncio.create_task(self._linger_loop())
+        self._retry_task = asyncio.create_task(self._retry_loop())
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @property
+    def stats(self):
+        return {
+            name: {**hub.stats, "partitions": dict(hub.stats["partitions"])}
+            for name, hub in self.hubs.items()
+        }
+
+    async def _open_batch(self, hub, pid):
+        if pid is None:
+            batch = await hub.sink.create_batch()
+        else:
+            batch = await hub.sink.create_batch(partition_id=pid)
+        hub.batches[pid] = batch
+        hub.opened_at[pid] = time.monotonic()
+        return batch
+
+    async def send(self, name, body, partition_key=None):
+        """Queue one serialized event (str or bytes) for hub `name`"""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        # Backpressure: wait while the retry queue is full
+        while not self._retry_space.is_set():
+            await self._retry_space.wait()
+        hub = self.hubs[name]
+        if partition_key and hub.partition_ids:
+            pid = partition_for(partition_key, hub.partition_ids)
+        elif self.partitions and hub.partition_ids:
+            # Keyless events stay in the sender's partition range, in turn
+            pid = hub.partition_ids[next(hub.rotation) % len(hub.partition_ids)]
+        else:
+            pid = None
+        async with hub.lock:
+            batch = hub.batches.get(pid)
+            if batch is None:
+                batch = await self._open_batch(hub, pid)
+            try:
+                batch.add(body)
+            except ValueError:
+                # Batch full by size: ship it and start a new one
+                await self._flush_locked(name, hub, pid)
+                batch = await self._open_batch(hub, pid)
+                try:
+                    batch.add(body)
+                except ValueError:
+                    # Larger than an empty batch: can never be sent
+                    hub.stats["dropped"] += 1
+                    print(f"[{name}] Event of {len(body)} bytes dropped: larger than the maximum batch size")
+                    return
+            if len(batch) >= self.max_events:
+                await self._flush_locked(name, hub, pid)
+
+    async def flush(self, name=None):
+        """Flush pending batches and wait for in-flight sends"""
+        names = [name] if name else list(self.hubs)
+        for hub_name in names:
+            hub = self.hubs[hub_name]
+            async with hub.lock:
+                for pid in list(hub.batches):
+                    await self._flush_locked(hub_name, hub, pid)
+            if hub.tasks:
+                await asyncio.gather(*list(hub.tasks), return_exceptions=True)
+
+    async def close(self):
+        if self._linger_task:
+            self._linger_task.cancel()
+            try:
+                await self._linger_task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        await self._drain()
+        if self.spill:
+            if self.spill.depth:
+                print(f"[spill] {self.spill.depth} batches left in {self.spill.path}, resent on next start")
+            self.spill.close()
+        for hub in self.hubs.values():
+            await hub.sink.close()
+
+    async def _flush_locked(self, name, hub, pid):
+        batch = hub.batches.pop(pid, None)
+        hub.opened_at.pop(pid, None)
+        if batch is None or len(batch) == 0:
+            return
+        # Blocks when max_in_flight sends are already running (backpressure)
+        await hub.in_flight.acquire()
+        task = asyncio.create_task(self._send_batch(name, hub, batch, pid))
+        hub.tasks.add(task)
+        task.add_done_callback(hub.tasks.discard)
+
+    async def _send_batch(self, name, hub, batch, pid):
+        try:
+            start = time.perf_counter()
+            await hub.sink.send(batch)
+            hub.delivered(batch, pid, time.perf_counter() - start)
+            self.first_delivery.set()
+        except Exception as e:
+            hub.stats["errors"] += 1
+            print(f"[{name}] Error sending batch of {len(batch)} events, queued for retry: {e}")
+            # Written ahead of the retry queue, so a crash does not lose it
+            seq = self.spill.append(name, pid, batch.bodies) if self.spill else None
+            hub.stats["spilled"] += len(batch) if self.spill else 0
+            self._queue_retry(seq, name, pid, batch.bodies, attempt=1, delay=self._backoff(1, e))
+        finally:
+            hub.in_flight.release()
+
+    def _backoff(self, attempt, error=None):
+        """Full-jitter exponential backoff, at least throttle_delay after ServerBusy"""
+        delay = random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))
+        if error is not None and is_throttled(error):
+            delay = max(delay, self.throttle_delay * random.uniform(1.0, 1.5))
+        return delay
+
+    def _queue_retry(self, seq, name, pid, bodies, attempt, delay):
+        heapq.heappush(self._retry, (time.monotonic() + delay, next(self._order), seq, name, pid, bodies, attempt))
+        self.hubs[name].stats["pending"] += len(bodies)
+        if len(self._retry) >= self.max_pending:
+            self._retry_space.clear()
+        self._retry_wakeup.set()
+
+    async def _resend(self, name, pid, bodies):
+        hub = self.hubs[name]
+        async with hub.in_flight:
+            if pid is None:
+                batch = await hub.sink.create_batch()
+            else:
+                batch = await hub.sink.create_batch(partition_id=pid)
+            for body in bodies:
+                batch.add(body)
+            start = time.perf_counter()
+            await hub.sink.send(batch)
+        hub.delivered(batch, pid, time.perf_counter() - start)
+        self.first_delivery.set()
+
+    async def _retry_loop(self):
+        """Resend queued batches one at a time, in due order"""
+        while True:
+            if not self._retry:
+                self._retry_wakeup.clear()
+                await self._retry_wakeup.wait()
+                continue
+            delay = self._retry[0][0] - time.monotonic()
+            if delay > 0:
+                self._retry_wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._retry_wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, seq, name, pid, bodies, attempt = heapq.heappop(self._retry)
+            hub = self.hubs[name]
+            hub.stats["pending"] -= len(bodies)
+            hub.stats["retries"] += 1
+            # Out of the queue but not delivered yet: _drain must wait for it
+            self._resending = (seq, name, pid, bodies)
+            try:
+                await self._resend(name, pid, bodies)
+            except Exception as e:
+                self._resending = None
+                self._queue_retry(seq, name, pid, bodies, attempt + 1, self._backoff(attempt + 1, e))
+                continue
+            self._resending = None
+            if seq is not None:
+                self.spill.ack(seq)
+            if len(self._retry) < self.max_pending:
+                self._retry_space.set()
+
+    async def _drain(self):
+        """Give queued retries up to drain_timeout seconds, then stop retrying"""
+        if self._retry_task is None:
+            return
+        now = time.monotonic()
+        deadline = now + self.drain_timeout
+        # Shutting down: retry everything now instead of after its backoff
+        self._retry = [(now, *item[1:]) for item in self._retry]
+        heapq.heapify(self._retry)
+        self._retry_wakeup.set()
+        while (self._retry or self._resending) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        self._retry_task.cancel()
+        try:
+            await self._retry_task
+        except asyncio.CancelledError:
+            pass
+        # Past the deadline: batches in the spill file are resent on next start, the others are lost
+        left = [item[2:6] for item in self._retry]
+        if self._resending:
+            left.append(self._resending)
+        dropped = 0
+        for seq, name, _, bodies in left:
+            if seq is None:
+                self.hubs[name].stats["dropped"] += len(bodies)
+                dropped += len(bodies)
+        if dropped:
+            print(f"[sender] {dropped} events dropped: retry queue not drained after {self.drain_timeout}s")
+
+    async def _linger_loop(self):
+        while True:
+            await asyncio.sleep(self.linger)
+            now = time.monotonic()
+            for name, hub in self.hubs.items():
+                expired = [pid for pid, opened in hub.opened_at.items() if now - opened >= self.linger]
+                if not expired:
+                    continue
+                async with hub.lock:
+                    for pid in expired:
+                        if pid in hub.opened_at and now - hub.opened_at[pid] >= self.linger:
+                            await self._flush_locked(name, hub, pid)
@@ -0,0 +1,253 @@
+"""
+Session simulator
+=================
+
+Keeps up to millions of live browsing sessions as parallel NumPy arrays (one
+slot per session, no per-session Python object) and advances them as a
+Markov chain:
+
+    home / login / category / product  -> view_page
+    cart                               -> add_to_cart
+    checkout                           -> checkout_start
+    exit after checkout                -> order (purchase) or abandon
+
+Every event of a session shares its session_id, user agent and IP; user_id is
+the customer id once the session is logged in, and a purchase emits an order
+for that customer with the products added to the cart.
+
+clickstream(n, now) advances the sessions that are due (think time elapsed)
+and opens new sessions when fewer than n are due, so the number of live
+sessions settles wherever the requested clickstream rate needs it. Orders of
+converting sessions are collected and returned by take_orders().
+"""
+
+import numpy as np
+
+from columnar import CATEGORIES, format_uuids, random_uuid_bytes, warm
+
+HOME, LOGIN, CATEGORY, PRODUCT, CART, CHECKOUT, EXIT = range(7)
+FREE = 255
+MAX_CART = 4
+
+EVENT_TYPES = ["view_page", "view_page", "view_page", "view_page", "add_to_cart", "checkout_start"]
+
+# Transition probabilities: row = current page, columns = next page + exit
+TRANSITIONS = np.array([
+    # home  login  cat   prod  cart  chk   exit
+    [0.00, 0.10, 0.35, 0.35, 0.00, 0.00, 0.20],  # home
+    [0.30, 0.00, 0.30, 0.30, 0.00, 0.00, 0.10],  # login
+    [0.05, 0.02, 0.18, 0.60, 0.00, 0.00, 0.15],  # category
+    [0.03, 0.02, 0.20, 0.25, 0.30, 0.00, 0.20],  # product
+    [0.00, 0.00, 0.15, 0.25, 0.05, 0.45, 0.10],  # cart
+    [0.00, 0.00, 0.00, 0.00, 0.10, 0.00, 0.90],  # checkout
+])
+CUMULATIVE = np.cumsum(TRANSITIONS, axis=1)
+CUMULATIVE[:, -1] = 1.0
+# Landing page of a new session
+LANDING = np.cumsum([0.5, 0.0, 0.2, 0.3])
+
+
+class SessionSimulator:
+    """Array-backed sessions over a ColumnarGenerator's pools"""
+
+    def __init__(self, generator, capacity=1_000_000, think_time=30.0, purchase_rate=0.7,
+                 logged_in_rate=0.6):
+        self.gen = generator
+        self.rng = generator.rng
+        self.capacity = capacity
+        self.think_time = think_time
+        self.purchase_rate = purchase_rate
+        self.logged_in_rate = logged_in_rate
+        self.epoch = None
+
+        # Session state, one slot per session
+        self.session = np.zeros((capacity, 16), dtype=np.uint8)
+        self.customer = np.full(capacity, -1, dtype=np.int32)     # -1 = anonymous
+        self.page = np.full(capacity, FREE, dtype=np.uint8)
+        self.steps = np.zeros(capacity, dtype=np.uint16)
+        self.next_at = np.full(capacity, np.inf, dtype=np.float64)  # seconds since epoch
+        self.product = np.zeros(capacity, dtype=np.int32)          # last product viewed
+        self.cart = np.zeros((capacity, MAX_CART), dtype=np.int32)
+        self.cart_len = np.zeros(capacity, dtype=np.uint8)
+        self.ua = np.zeros(capacity, dtype=np.uint16)
+        self.ip = np.zeros(capacity, dtype=np.uint16)
+        # Stack of free slots
+        self.free = np.arange(capacity - 1, -1, -1, dtype=np.int32)
+        self.free_top = capacity
+
+        self.orders = []
+        self.stats = {"started": 0, "events": 0, "purchases": 0, "abandoned": 0, "rejected": 0}
+
+    @property
+    def live(self):
+        return self.capacity - self.free_top
+
+    @property
+    def bytes_per_session(self):
+        """State bytes per session slot (arrays and free list)"""
+        arrays = (self.session, self.customer, self.page, self.steps, self.next_at, self.product,
+                  self.cart, self.cart_len, self.ua, self.ip, self.free)
+        return sum(a.nbytes for a in arrays) / self.capacity
+
+    def _now(self, now):
+        if self.epoch is None:
+            self.epoch = now
+        # float64: float32 steps reach 0.06 s after ~12 days of uptime
+        return np.float64(now - self.epoch)
+
+    def _schedule(self, idx, t):
+        self.next_at[idx] = t + self.rng.exponential(self.think_time, size=len(idx))
+
+    def _open(self, n, t):
+        """Allocate up to n new sessions on their landing page"""
+        if n <= 0:
+            return np.empty(0, dtype=np.int32)
+        # At capacity: the missing events are simply not generated
+        self.stats["rejected"] += max(0, n - self.free_top)
+        n = min(n, self.free_top)
+        idx = self.free[self.free_top - n:self.free_top].copy()
+        self.free_top -= n
+        rng = self.rng
+
+        self.session[idx] = random_uuid_bytes(rng, n)
+        logged_in = rng.random(n) < self.logged_in_rate
+        self.customer[idx] = np.where(logged_in, rng.integers(0, len(self.gen.customers), size=n), -1)
+        self.page[idx] = np.searchsorted(LANDING, rng.random(n), side="right")
+        self.steps[idx] = 0
+        self.cart_len[idx] = 0
+        self.ua[idx] = rng.integers(0, len(self.gen.user_agents), size=n)
+        self.ip[idx] = rng.integers(0, len(self.gen.ips), size=n)
+        self.product[idx] = rng.integers(0, len(self.gen.products), size=n)
+        self.stats["started"] += n
+        return idx
+
+    def _close(self, idx):
+        self.page[idx] = FREE
+        self.next_at[idx] = np.inf
+        self.free[self.free_top:self.free_top + len(idx)] = idx
+        self.free_top += len(idx)
+
+    def _advance(self, idx, t, now):
+        """Move sessions to their next page; returns the sessions still alive"""
+        rng = self.rng
+        page = self.page[idx]
+        nxt = (rng.random(len(idx))[:, None] < CUMULATIVE[page]).argmax(axis=1).astype(np.uint8)
+
+        done = nxt == EXIT
+        if done.any():
+            ended = idx[done]
+            bought = ended[(page[done] == CHECKOUT) & (rng.random(len(ended)) < self.purchase_rate)]
+            self._purchase(bought, now)
+            self.stats["abandoned"] += len(ended) - len(bought)
+            self._close(ended)
+        idx, nxt = idx[~done], nxt[~done]
+        self.page[idx] = nxt
+
+        # New product view / add to cart / checkout needs a customer
+        viewing = idx[nxt == PRODUCT]
+        self.product[viewing] = rng.integers(0, len(self.gen.products), size=len(viewing))
+        adding = idx[(nxt == CART) & (self.cart_len[idx] < MAX_CART)]
+        # Products are unique within an order, as in build_event
+        in_cart = ((self.cart[adding] == self.product[adding][:, None])
+                   & (np.arange(MAX_CART) < self.cart_len[adding][:, None])).any(axis=1)
+        adding = adding[~in_cart]
+        self.cart[adding, self.cart_len[adding]] = self.product[adding]
+        self.cart_len[adding] += 1
+        needs_login = idx[((nxt == LOGIN) | (nxt == CHECKOUT)) & (self.customer[idx] < 0)]
+        self.customer[needs_login] = rng.integers(0, len(self.gen.customers), size=len(needs_login))
+        return idx
+
+    def _purchase(self, idx, now):
+        if not len(idx):
+            return
+        gen, rng = self.gen, self.rng
+        ids = format_uuids(random_uuid_bytes(rng, 2 * len(idx)))
+        qty = rng.integers(1, 4, size=(len(idx), MAX_CART))
+        warm(gen.customers, self.customer[idx])
+        warm(gen.products, self.cart[idx][np.arange(MAX_CART) < self.cart_len[idx][:, None]])
+        carts, lens, customers = self.cart[idx].tolist(), self.cart_len[idx].tolist(), self.customer[idx].tolist()
+        qty_l = qty.tolist()
+        for i in range(len(idx)):
+            if not lens[i]:
+                continue
+            products = carts[i][:lens[i]]
+            items = [gen.items[p * 3 + q - 1] for p, q in zip(products, qty_l[i])]
+            total = sum(gen.products[p]["price"] * q for p, q in zip(products, qty_l[i]))
+            self.orders.append({
+                "event_id": ids[2 * i],
+                "order_id": ids[2 * i + 1],
+                "customer": gen.customers[customers[i]],
+                "items": items,
+                "total_amount": round(total, 2),
+                "currency": "USD",
+                "status": "PLACED",
+                "timestamp": now,
+            })
+        self.stats["purchases"] += len(idx)
+
+    def _events(self, idx, now):
+        gen, rng = self.gen, self.rng
+        n = len(idx)
+        self.steps[idx] += 1
+        page_l = self.page[idx].tolist()
+        sessions = format_uuids(self.session[idx])
+        event_ids = format_uuids(random_uuid_bytes(rng, n))
+        customer_idx, page = self.customer[idx], self.page[idx]
+        warm(gen.customers, customer_idx[customer_idx >= 0])
+        warm(gen.products, self.product[idx][page == PRODUCT])
+        customers, products = customer_idx.tolist(), self.product[idx].tolist()
+        ua_l, ip_l = self.ua[idx].tolist(), self.ip[idx].tolist()
+        category_l = rng.integers(0, len(CATEGORIES), size=n).tolist()
+
+        events = []
+        for i in range(n):
+            page = page_l[i]
+            if page == HOME:
+                url = "/"
+            elif page == LOGIN:
+                url = "/login"
+            elif page == CATEGORY:
+                url = gen.category_urls[category_l[i]]
+            elif page == PRODUCT:
+                url = gen.product_urls[products[i]]
+            elif page == CART:
+                url = "/cart"
+            else:
+                url = "/checkout"
+            customer = customers[i]
+            events.append({
+                "event_id": event_ids[i],
+                "session_id": sessions[i],
+                "user_id": gen.customers[customer]["id"] if customer >= 0 else None,
+                "url": url,
+                "event_type": EVENT_TYPES[page],
+                "user_agent": gen.user_agents[ua_l[i]],
+                "ip_address": gen.ips[ip_l[i]],
+                "timestamp": now,
+            })
+        self.stats["events"] += n
+        return events
+
+    def clickstream(self, n, now):
+        """Up to n clickstream events: due sessions first, then new sessions"""
+        t = self._now(now)
+        due = np.flatnonzero(self.next_at <= t)
+        if len(due) > n:
+            # Most overdue first
+            due = due[np.argpartition(self.next_at[due], n - 1)[:n]]
+        alive = self._advance(due.astype(np.int32), t, now)
+        opened = self._open(n - len(alive), t)
+        idx = np.concatenate([alive, opened])
+        self._schedule(idx, t)
+        return self._events(idx, now)
+
+    def take_orders(self):
+        """Orders of sessions that converted since the last call"""
+        orders, self.orders = self.orders, []
+        return orders
+
+    def batch(self, name, n, now):
+        """ColumnarGenerator-compatible entry point for the clickstream stream"""
+        if name != "clickstream":
+            raise ValueError(f"Sessions only generate clickstream, not {name}")
+        return self.clickstream(n, now)
@@ -0,0 +1,132 @@
+"""
+Pool snapshots
+==============
+
+Customer and product pools saved once to a file, so a restarted producer
+neither imports Faker nor regenerates its pools. Columnar pools (pools.py)
+are memory-mapped: loading them reads the header, not the arrays, and
+forked fleet workers share the same pages. Lists of dicts are stored as
+JSON in the header.
+
+The snapshot is reused while its key (pool storage and sizes) matches the
+configuration; otherwise, or when the file is unreadable, the pools are
+generated again and the file is replaced. Delete it to get new entities.
+
+File layout:
+    b"DWHPOOL1" | u32 header length | JSON header | padding | arrays...
+    header = {"key": {...}, "pools": {name: {"type": "dicts", "records": [...]}
+                                      | {"type": class name, "vocabularies": {...},
+                                         "columns": {column: [dtype, shape, offset]}}}}
+    offsets are relative to the first array, which starts on a 64-byte boundary
+"""
+
+import json
+import mmap
+import os
+import struct
+
+MAGIC = b"DWHPOOL1"
+HEADER_LEN = struct.Struct("<I")
+ALIGN = 64
+VERSION = 1
+
+
+def _aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def save(path, key, pools):
+    """Write `pools` ({name: list of dicts | ColumnarPool}) atomically to `path`"""
+    entries, arrays, offset = {}, [], 0
+    for name, pool in pools.items():
+        if isinstance(pool, list):
+            entries[name] = {"type": "dicts", "records": pool}
+            continue
+        columns = {}
+        for column in pool.columns:
+            array = getattr(pool, column)
+            offset = _aligned(offset)
+            columns[column] = [array.dtype.str, list(array.shape), offset]
+            arrays.append((offset, array))
+            offset += array.nbytes
+        entries[name] = {
+            "type": type(pool).__name__,
+            "vocabularies": {v: getattr(pool, v) for v in pool.vocabularies},
+            "columns": columns,
+        }
+
+    raw_header = json.dumps({"key": {**key, "version": VERSION}, "pools": entries}).encode("utf-8")
+    data_start = _aligned(len(MAGIC) + HEADER_LEN.size + len(raw_header))
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(HEADER_LEN.pack(len(raw_header)))
+        f.write(raw_header)
+        for array_offset, array in arrays:
+            f.seek(data_start + array_offset)
+            f.write(array.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    # A crash mid-write leaves the .tmp file, never a torn snapshot
+    os.replace(tmp, path)
+
+
+def load(path, key):
+    """Pools of the snapshot at `path`, or None when missing or built for another key"""
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a pool snapshot")
+    (header_len,) = HEADER_LEN.unpack_from(data, len(MAGIC))
+    offset = len(MAGIC) + HEADER_LEN.size
+    header = json.loads(data[offset:offset + header_len])
+    if header["key"] != {**key, "version": VERSION}:
+        return None
+    data_start = _aligned(offset + header_len)
+
+    result = {}
+    for name, entry in header["pools"].items():
+        if entry["type"] == "dicts":
+            result[name] = entry["records"]
+            continue
+        import numpy as np
+        import pools
+        columns = {}
+        for column, (dtype, shape, array_offset) in entry["columns"].items():
+            # Views on the map: pages are read on first access and shared between processes
+            count = int(np.prod(shape))
+            columns[column] = np.frombuffer(data, dtype=dtype, count=count,
+                                            offset=data_start + array_offset).reshape(shape)
+        result[name] = getattr(pools, entry["type"]).from_arrays(columns, entry["vocabularies"])
+    return result
+
+
+def load_or_build(path, key, build):
+    """Pools from the snapshot at `path` if its key matches, else build() and save them
+
+    `path` empty disables snapshots: build() on every start.
+    """
+    if not path:
+        return build()
+    try:
+        pools = load(path, key)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        print(f"⚠️  Unreadable pool snapshot {path}, rebuilding: {e}")
+        pools = None
+    if pools is not None:
+        print(f"📦 Pools loaded from snapshot {path}")
+        return pools
+
+    pools = build()
+    try:
+        save(path, key, pools)
+        print(f"📦 Pools snapshot written to {path}")
+    except OSError as e:
+        print(f"⚠️  Could not write pool snapshot {path}: {e}")
+    return pools
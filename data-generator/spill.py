@@ -0,0 +1,137 @@
+"""
+Spill file
+==========
+
+Write-ahead log for batches whose send failed. A failed batch is appended
+(and flushed to the OS) before it enters the sender's in-memory retry queue,
+and a tombstone is appended once it has been delivered. When nothing is left
+to retry the file is truncated.
+
+On start-up the batches without a tombstone are loaded back into the retry
+queue, so a crash or a supervisord restart does not lose them. Delivery is
+at-least-once: a batch sent just before a crash may be sent again.
+
+Record layout:
+    u32 payload length | u8 kind | u64 sequence | payload
+    kind B (batch): u16 hub length | hub | u16 partition length | partition
+                    | (u32 body length | body)*
+    kind A (ack):   empty payload, sequence of the delivered batch
+"""
+
+import os
+import struct
+
+RECORD = struct.Struct("<IBQ")
+SHORT = struct.Struct("<H")
+LENGTH = struct.Struct("<I")
+
+BATCH = 0x42  # "B"
+ACK = 0x41    # "A"
+
+
+def _pack_batch(hub, pid, bodies):
+    hub_raw = hub.encode("utf-8")
+    pid_raw = (pid or "").encode("utf-8")
+    parts = [SHORT.pack(len(hub_raw)), hub_raw, SHORT.pack(len(pid_raw)), pid_raw]
+    for body in bodies:
+        parts.append(LENGTH.pack(len(body)))
+        parts.append(body)
+    return b"".join(parts)
+
+
+def _unpack_batch(payload):
+    view = memoryview(payload)
+    (n,) = SHORT.unpack_from(view, 0)
+    hub = bytes(view[2:2 + n]).decode("utf-8")
+    offset = 2 + n
+    (n,) = SHORT.unpack_from(view, offset)
+    pid = bytes(view[offset + 2:offset + 2 + n]).decode("utf-8") or None
+    offset += 2 + n
+    bodies = []
+    while offset < len(view):
+        (n,) = LENGTH.unpack_from(view, offset)
+        offset += LENGTH.size
+        bodies.append(bytes(view[offset:offset + n]))
+        offset += n
+    return hub, pid, bodies
+
+
+class SpillFile:
+    """Append-only spill file of undelivered batches"""
+
+    def __init__(self, path):
+        self.path = path
+        self.depth = 0  # batches written and not yet acknowledged
+        self._seq = 0
+        self._file = None
+
+    def _read(self):
+        """Batches of an existing file that have no tombstone, in write order"""
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as f:
+            data = f.read()
+        batches, acked = {}, set()
+        offset = 0
+        while offset + RECORD.size <= len(data):
+            length, kind, seq = RECORD.unpack_from(data, offset)
+            end = offset + RECORD.size + length
+            if end > len(data):
+                break  # torn record from a crash mid-write
+            if kind == BATCH:
+                batches[seq] = _unpack_batch(data[offset + RECORD.size:end])
+            elif kind == ACK:
+                acked.add(seq)
+            offset = end
+        return [batch for seq, batch in batches.items() if seq not in acked]
+
+    def open(self):
+        """Open for appending; returns the leftover batches as (seq, hub, pid, bodies)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        leftover = self._read()
+        # Compact: rewrite the undelivered batches to a temporary file, then swap
+        # it in, so a crash or a full disk mid-rewrite keeps the original WAL
+        tmp = f"{self.path}.tmp"
+        self._file = open(tmp, "wb")
+        try:
+            pending = [(self.append(hub, pid, bodies), hub, pid, bodies) for hub, pid, bodies in leftover]
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        finally:
+            self._file.close()
+        os.replace(tmp, self.path)
+        self._file = open(self.path, "ab")
+        return pending
+
+    def _write(self, kind, seq, payload=b""):
+        self._file.write(RECORD.pack(len(payload), kind, seq))
+        self._file.write(payload)
+        self._file.flush()
+
+    def append(self, hub, pid, bodies):
+        """Persist one batch; returns its sequence number"""
+        self._seq += 1
+        self._write(BATCH, self._seq, _pack_batch(hub, pid, bodies))
+        self.depth += 1
+        return self._seq
+
+    def ack(self, seq):
+        """Mark a batch delivered; truncates the file once nothing is pending"""
+        self.depth -= 1
+        if self.depth == 0:
+            self._file.truncate(0)
+        else:
+            self._write(ACK, seq)
+
+    @property
+    def size_in_bytes(self):
+        return os.fstat(self._file.fileno()).st_size if self._file else 0
+
+    def close(self):
+        if self._file:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Stock snapshots
+===============
+
+Inventory per (vendor, product) pair for fact_stock. Generated marketplace
+orders, each made of products its vendor stocks, decrement it, low pairs get
+restocked, and every tick the pairs whose level changed are emitted as
+snapshot events in batches, which StockLoader bulk-inserts into fact_stock
+with stock_status set against alert_threshold:
+
+    out_of_stock    stock_level <= 0
+    low_stock       stock_level <= alert_threshold
+    in_stock        otherwise
+
+A pair is one sorted uint64 key (vendor * products + product row) plus its
+level, threshold and warehouse: 16 bytes, so a million pairs take 16 MB.
+Events only exist one batch at a time and product ids are formatted per
+batch, so memory does not grow with the number of pairs or ticks.
+
+Usage:
+    python stock.py --ticks 10 --interval 60 --orders 5000
+    python stock.py --dry-run --vendors 1000 --per-vendor 1000 --ticks 3 --full
+
+Vendors are the current active rows of dim_vendor (their vendor_key is what
+fact_stock references); --dry-run uses synthetic vendors and only counts the
+rows. Products come from the shared pools (PRODUCTS_POOL_SIZE,
+POOL_STORAGE), so generated orders and stock refer to the same products.
+
+The snapshot events stay in this process: there is no stock Event Hub or
+Stream Analytics output for fact_stock, which needs dim_vendor's vendor_key.
+"""
+
+import argparse
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+
+STOCK_STATUSES = ("out_of_stock", "low_stock", "in_stock")
+WAREHOUSES = ["Paris", "Lyon", "Lille", "Marseille", "Bordeaux", "Toulouse", "Nantes", "Strasbourg"]
+
+STOCK_PRODUCTS_PER_VENDOR = int(os.getenv("STOCK_PRODUCTS_PER_VENDOR", 1000))
+STOCK_BATCH_SIZE = int(os.getenv("STOCK_BATCH_SIZE", 10_000))
+STOCK_INITIAL_MAX = int(os.getenv("STOCK_INITIAL_MAX", 200))
+# Share of the pairs at or below their threshold that get restocked per tick
+STOCK_RESTOCK_PROBABILITY = float(os.getenv("STOCK_RESTOCK_PROBABILITY", 0.3))
+
+INSERT_STOCK = """
+    INSERT INTO fact_stock (vendor_key, product_id, stock_level, warehouse_location,
+                            alert_threshold, stock_status, snapshot_date)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+ACTIVE_VENDORS_QUERY = """
+    SELECT vendor_key, vendor_id
+    FROM dim_vendor
+    WHERE is_current = 1
+    AND vendor_status = 'active'
+    ORDER BY vendor_key
+"""
+
+
+def stock_status(level, threshold):
+    """fact_stock.stock_status of one pair"""
+    if level <= 0:
+        return "out_of_stock"
+    if level <= threshold:
+        return "low_stock"
+    return "in_stock"
+
+
+def status_codes(levels, thresholds):
+    """Index into STOCK_STATUSES for arrays of levels and thresholds"""
+    return np.where(levels <= 0, 0, np.where(levels <= thresholds, 1, 2))
+
+
+def _product_lookup(products):
+    """Function mapping product_id strings to pool rows (-1 when unknown)"""
+    if hasattr(products, "ids"):
+        # pools.ProductPool: binary search over the sorted 16-byte ids, no dict of a million strings
+        keys = np.ascontiguousarray(products.ids).view("S16").ravel()
+        order = np.argsort(keys).astype(np.uint32)
+        sorted_keys = keys[order]
+
+        def rows(product_ids):
+            wanted = np.array([uuid.UUID(p).bytes for p in product_ids], dtype="S16")
+            pos = np.minimum(np.searchsorted(sorted_keys, wanted), len(sorted_keys) - 1)
+            return np.where(sorted_keys[pos] == wanted, order[pos].astype(np.int64), -1)
+
+        return rows
+
+    index = {p["product_id"]: i for i, p in enumerate(products)}
+    return lambda product_ids: np.array([index.get(p, -1) for p in product_ids], dtype=np.int64)
+
+
+def _product_ids(products, rows):
+    if hasattr(products, "ids"):
+        from columnar import format_uuids
+        return format_uuids(products.ids[rows])
+    return [products[r]["product_id"] for r in rows.tolist()]
+
+
+class StockSimulator:
+    """Stock levels of `per_vendor` products for each vendor"""
+
+    def __init__(self, vendors, products, per_vendor=STOCK_PRODUCTS_PER_VENDOR, seed=None):
+        self.rng = rng = np.random.default_rng(seed)
+        self.products = products
+        self.vendor_keys = np.array([v["vendor_key"] for v in vendors], dtype=np.int64)
+        self.vendor_ids = [v["vendor_id"] for v in vendors]
+        self._vendor_index = {vendor_id: i for i, vendor_id in enumerate(self.vendor_ids)}
+        self._rows = _product_lookup(products)
+
+        n_vendors, n_products = len(vendors), len(products)
+        self.per_vendor = min(per_vendor, n_products)
+        # Each vendor stocks a window of one shuffled catalog: distinct products, different mixes
+        shuffled = rng.permutation(n_products)
+        keys = np.empty(n_vendors * self.per_vendor, dtype=np.uint64)
+        window = np.arange(self.per_vendor)
+        for v, start in enumerate(rng.integers(0, n_products, size=n_vendors).tolist()):
+            rows = shuffled[(start + window) % n_products]
+            keys[v * self.per_vendor:(v + 1) * self.per_vendor] = v * n_products + rows
+        keys.sort()
+        self.keys = keys
+
+        size = len(keys)
+        self.level = rng.integers(0, STOCK_INITIAL_MAX + 1, size=size, dtype=np.int32)
+        self.threshold = rng.integers(5, 21, size=size, dtype=np.uint16)
+        self.warehouse = rng.integers(0, len(WAREHOUSES), size=size, dtype=np.uint8)
+        # The first snapshot holds every pair
+        self.changed = np.ones(size, dtype=bool)
+        self.stats = {"orders": 0, "units_sold": 0, "units_missed": 0, "unstocked_items": 0, "restocked": 0}
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.level.nbytes + self.threshold.nbytes + self.warehouse.nbytes + self.changed.nbytes
+
+    def order_items(self, n):
+        """Vendor (n,) and product rows (n, MAX_ITEMS) of n orders, from each vendor's stocked products"""
+        from columnar import MAX_ITEMS
+        rng = self.rng
+        vendors = rng.integers(0, len(self.vendor_keys), size=n)
+        # The keys of vendor v are keys[v * per_vendor:(v + 1) * per_vendor]
+        offsets = rng.integers(0, self.per_vendor, size=(n, MAX_ITEMS))
+        if self.per_vendor >= MAX_ITEMS:
+            ordered = np.sort(offsets, axis=1)
+            for row in np.nonzero((ordered[:, 1:] == ordered[:, :-1]).any(axis=1))[0]:
+                offsets[row] = rng.choice(self.per_vendor, size=MAX_ITEMS, replace=False)
+        keys = self.keys[vendors[:, None] * self.per_vendor + offsets]
+        return vendors, (keys % len(self.products)).astype(np.int64)
+
+    def apply_orders(self, orders):
+        """Decrement stock by the items of marketplace orders; stock never goes below 0"""
+        vendors, product_ids, quantities = [], [], []
+        for order in orders:
+            for item in order["items"]:
+                vendors.append(self._vendor_index.get(item.get("vendor_id"), -1))
+                product_ids.append(item["product_id"])
+                quantities.append(item["quantity"])
+        self.stats["orders"] += len(orders)
+        if not product_ids:
+            return
+
+        vendors = np.array(vendors, dtype=np.int64)
+        rows = self._rows(product_ids)
+        quantities = np.array(quantities, dtype=np.int32)
+        known = (vendors >= 0) & (rows >= 0)
+        keys = (vendors * len(self.products) + rows)[known].astype(np.uint64)
+        pos = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        stocked = self.keys[pos] == keys
+        pos, quantities = pos[stocked], quantities[known][stocked]
+        self.stats["unstocked_items"] += len(product_ids) - len(pos)
+
+        np.subtract.at(self.level, pos, quantities)
+        # Demand beyond the stock on hand is missed, not backordered
+        negative = self.level < 0
+        missed = int(-self.level[negative].sum())
+        self.level[negative] = 0
+        self.stats["units_missed"] += missed
+        self.stats["units_sold"] += int(quantities.sum()) - missed
+        self.changed[pos] = True
+
+    def restock(self):
+        """Refill a share of the pairs at or below their alert threshold"""
+        low = np.flatnonzero(self.level <= self.threshold)
+        refill = low[self.rng.random(len(low)) < STOCK_RESTOCK_PROBABILITY]
+        self.level[refill] += self.rng.integers(50, STOCK_INITIAL_MAX + 1, size=len(refill), dtype=np.int32)
+        self.changed[refill] = True
+        self.stats["restocked"] += len(refill)
+
+    def snapshots(self, now, batch_size=STOCK_BATCH_SIZE, full=False):
+        """Snapshot events of the changed pairs (every pair if `full`), `batch_size` per list"""
+        selected = np.arange(len(self.keys)) if full else np.flatnonzero(self.changed)
+        n_products = len(self.products)
+        for start in range(0, len(selected), batch_size):
+            chunk = selected[start:start + batch_size]
+            keys = self.keys[chunk]
+            vendors = (keys // n_products).astype(np.int64)
+            product_ids = _product_ids(self.products, (keys % n_products).astype(np.int64))
+            vendor_keys = self.vendor_keys[vendors].tolist()
+            vendor_l, levels = vendors.tolist(), self.level[chunk].tolist()
+            thresholds, warehouses = self.threshold[chunk].tolist(), self.warehouse[chunk].tolist()
+            yield [
+                {
+                    "vendor_key": vendor_keys[k],
+                    "vendor_id": self.vendor_ids[vendor_l[k]],
+                    "product_id": product_ids[k],
+                    "stock_level": levels[k],
+                    "warehouse_location": WAREHOUSES[warehouses[k]],
+                    "alert_threshold": thresholds[k],
+                    "timestamp": now,
+                }
+                for k in range(len(chunk))
+            ]
+            self.changed[chunk] = False
+
+    def status_counts(self):
+        """Pairs per stock_status right now"""
+        counts = np.bincount(status_codes(self.level, self.threshold), minlength=len(STOCK_STATUSES))
+        return dict(zip(STOCK_STATUSES, counts.tolist()))
+
+
+class StockLoader:
+    """Bulk INSERT of snapshot events into fact_stock"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        # Parameters sent as arrays, one round trip per batch instead of one per row
+        self.cursor.fast_executemany = True
+        self.rows = 0
+        self.seconds = 0.0
+
+    def load(self, events):
+        """Insert one batch of snapshot events and commit"""
+        if not events:
+            return
+        start = time.perf_counter()
+        # ASA writes epoch timestamps as DATEADD(second, ts, '1970-01-01'): naive UTC
+        snapshot_date = {}
+        rows = []
+        for e in events:
+            ts = e["timestamp"]
+            if ts not in snapshot_date:
+                snapshot_date[ts] = datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None)
+            rows.append((e["vendor_key"], e["product_id"], e["stock_level"], e["warehouse_location"],
+                         e["alert_threshold"], stock_status(e["stock_level"], e["alert_threshold"]),
+                         snapshot_date[ts]))
+        self.cursor.executemany(INSERT_STOCK, rows)
+        self.conn.commit()
+        self.rows += len(rows)
+        self.seconds += time.perf_counter() - start
+
+    @property
+    def rate(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def active_vendors(conn):
+    cursor = conn.cursor()
+    cursor.execute(ACTIVE_VENDORS_QUERY)
+    return [{"vendor_key": key, "vendor_id": vendor_id} for key, vendor_id in cursor.fetchall()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ticks", type=int, default=1, help="Snapshots to take")
+    parser.add_argument("--interval", type=float, default=0, help="Seconds between snapshots")
+    parser.add_argument("--orders", type=int, default=1000, help="Marketplace orders generated per tick")
+    parser.add_argument("--per-vendor", type=int, default=STOCK_PRODUCTS_PER_VENDOR, help="Products stocked per vendor")
+    parser.add_argument("--batch-size", type=int, default=STOCK_BATCH_SIZE, help="Rows per INSERT batch")
+    parser.add_argument("--full", action="store_true", help="Every pair in every snapshot, not only changed pairs")
+    parser.add_argument("--dry-run", action="store_true", help="Synthetic vendors, rows counted but not inserted")
+    parser.add_argument("--vendors", type=int, default=100, help="Synthetic vendors with --dry-run")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import common
+    from columnar import ColumnarGenerator
+
+    if args.dry_run:
+        vendors = [{"vendor_key": i + 1, "vendor_id": f"VENDOR{i + 1:05d}"} for i in range(args.vendors)]
+        loader = None
+    else:
+        from vendor_cache import connect_sql
+        conn = connect_sql()
+        vendors = active_vendors(conn)
+        loader = StockLoader(conn)
+    if not vendors:
+        raise RuntimeError("No active vendors in dim_vendor (run seed_vendors.py)")
+
+    start = time.perf_counter()
+    customers, products = common.load_pools()
+    sim = StockSimulator(vendors, products, args.per_vendor, seed=args.seed)
+    generator = ColumnarGenerator(customers, products, seed=args.seed)
+    print(f"📦 {len(sim):,} vendor-product pairs ({len(vendors):,} vendors x {sim.per_vendor:,} products), "
+          f"{sim.nbytes / 2**20:.1f} MB, built in {time.perf_counter() - start:.1f}s")
+
+    for tick in range(args.ticks):
+        if tick:
+            time.sleep(args.interval)
+        now = time.time()
+        # The first snapshot is the opening stock, before any sale
+        if tick:
+            vendor_idx, picks = sim.order_items(args.orders)
+            sim.apply_orders(generator.marketplace_orders(args.orders, now, vendors, vendor_idx, picks))
+            sim.restock()
+
+        start, rows = time.perf_counter(), 0
+        for events in sim.snapshots(now, args.batch_size, full=args.full):
+            if loader:
+                loader.load(events)
+            rows += len(events)
+        elapsed = time.perf_counter() - start
+        counts = sim.status_counts()
+        print(f"📸 Snapshot {tick + 1}/{args.ticks}: {rows:,} rows in {elapsed:.1f}s "
+              f"({rows / elapsed if elapsed else 0:,.0f} rows/s) - "
+              + ", ".join(f"{status} {count:,}" for status, count in counts.items()))
+
+    stats = sim.stats
+    print(f"🛒 {stats['orders']:,} orders: {stats['units_sold']:,} units sold, {stats['units_missed']:,} missed "
+          f"(out of stock), {stats['unstocked_items']:,} items not stocked by their vendor, "
+          f"{stats['restocked']:,} restocks")
+    if loader:
+        print(f"✅ {loader.rows:,} rows inserted into fact_stock ({loader.rate:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Unified producer
+================
+
+One process for every stream: a single event loop, a single BatchSender (one
+Event Hub client per hub) and a single set of customer/product pools. Each
+stream is a plugin (a Stream subclass in STREAM_TYPES) that generates a
+batch of events on demand; the RateScheduler timer heap calls it when its
+next events are due, so nothing polls between two events.
+
+STREAMS selects the streams (comma-separated, default orders,clickstream).
+Each runs at <PREFIX>_RATE events/s, or one event every <PREFIX>_INTERVAL s:
+
+    stream        hub           prefix               default interval
+    orders        orders        ORDERS               60 s
+    marketplace   orders        MARKETPLACE_ORDERS   90 s   (vendors from dim_vendor)
+    clickstream   clickstream   CLICKSTREAM          2 s
+    vendors       vendors       VENDORS              300 s
+
+TRAFFIC_PROFILE and CONTROL_PORT change the same rates at runtime
+(traffic.py). FAULT_MIX adds malformed events to the orders and clickstream
+hubs (faults.py). With SESSION_SIMULATION=1 the clickstream stream runs the
+session simulator and its orders replace the orders stream.
+
+Marketplace orders draw from the first MARKETPLACE_PRODUCTS_POOL_SIZE products
+of the shared pool (common.py).
+
+Usage:
+    STREAMS=marketplace,clickstream python streams.py
+"""
+
+import boot  # first: startup clock
+import asyncio
+import os
+import time
+
+import common
+import eventlog
+import faults
+import metrics
+import traffic
+from rate import RateScheduler
+from sender import cancel_on_sigterm
+from vendor_cache import VendorCache, connect_sql
+
+STREAMS = [name.strip() for name in os.getenv("STREAMS", "orders,clickstream").split(",") if name.strip()]
+VENDOR_REFRESH_INTERVAL = float(os.getenv("VENDOR_REFRESH_INTERVAL", 60))
+VENDOR_REFRESH_LAG = float(os.getenv("VENDOR_REFRESH_LAG", 5))
+
+
+class Stream:
+    """A generated stream: generate(n, now) returns n events for `hub`"""
+
+    hub = None
+    prefix = None
+    interval = 60
+
+    def __init__(self, name, generator):
+        self.name = name
+        self.gen = generator
+
+    @property
+    def hubs(self):
+        """Every hub this stream sends to"""
+        return (self.hub,)
+
+    def rate(self):
+        """<PREFIX>_RATE events/s, else one event every <PREFIX>_INTERVAL seconds"""
+        rate = float(os.getenv(f"{self.prefix}_RATE", 0))
+        return rate if rate > 0 else 1 / float(os.getenv(f"{self.prefix}_INTERVAL", self.interval))
+
+    def start(self):
+        """Blocking set-up before the first event (metrics, caches)"""
+
+    def stop(self):
+        pass
+
+    def generate(self, n, now):
+        raise NotImplementedError
+
+    def derived(self):
+        """Events for other hubs produced as a side effect, as {hub: events}"""
+        return {}
+
+
+class OrdersStream(Stream):
+    hub = "orders"
+    prefix = "ORDERS"
+    interval = 60
+
+    def generate(self, n, now):
+        return self.gen.orders(n, now)
+
+
+class ClickstreamStream(Stream):
+    hub = "clickstream"
+    prefix = "CLICKSTREAM"
+    interval = 2
+
+    def __init__(self, name, generator):
+        super().__init__(name, generator)
+        self.sessions = None
+        if common.SESSION_SIMULATION:
+            from sessions import SessionSimulator
+            self.sessions = SessionSimulator(generator, common.SESSION_CAPACITY, common.SESSION_THINK_TIME)
+
+    @property
+    def hubs(self):
+        return ("clickstream", "orders") if self.sessions else ("clickstream",)
+
+    def start(self):
+        if self.sessions:
+            metrics.register_sessions(self.sessions)
+
+    def generate(self, n, now):
+        if self.sessions:
+            return self.sessions.clickstream(n, now)
+        return self.gen.clickstream(n, now)
+
+    def derived(self):
+        return {"orders": self.sessions.take_orders()} if self.sessions else {}
+
+
+class MarketplaceStream(Stream):
+    """Orders of vendors currently active in dim_vendor"""
+
+    hub = "orders"
+    prefix = "MARKETPLACE_ORDERS"
+    interval = 90
+
+    def __init__(self, name, generator):
+        products = generator.products
+        if len(products) > common.MARKETPLACE_PRODUCTS_POOL_SIZE:
+            # Vendors sell a smaller catalogue: the first MARKETPLACE_PRODUCTS_POOL_SIZE products
+            from columnar import ColumnarGenerator
+            generator = ColumnarGenerator(generator.customers, products[:common.MARKETPLACE_PRODUCTS_POOL_SIZE])
+        super().__init__(name, generator)
+        self.vendor_cache = VendorCache(connect_sql, interval=VENDOR_REFRESH_INTERVAL, lag=VENDOR_REFRESH_LAG)
+        self._warned = False
+
+    def start(self):
+        self.vendor_cache.start()
+        print(f"   Found {len(self.vendor_cache.vendors)} active vendors")
+        boot.mark("vendors")
+        metrics.register_vendor_cache(self.vendor_cache)
+
+    def stop(self):
+        self.vendor_cache.stop()
+
+    def generate(self, n, now):
+        vendors = self.vendor_cache.vendors
+        if not vendors:
+            if not self._warned:
+                print("No vendors available, skipping marketplace orders")
+                self._warned = True
+            return []
+        self._warned = False
+        return self.gen.marketplace_orders(n, now, vendors)
+
+
+class VendorsStream(Stream):
+    """Vendor registrations and changes for stg_vendor (vendor_churn.py)"""
+
+    hub = "vendors"
+    prefix = "VENDORS"
+    interval = 300
+
+    def __init__(self, name, generator):
+        super().__init__(name, generator)
+        from vendor_churn import make_churn
+        self.churn = make_churn()
+
+    def start(self):
+        print(f"   [vendors] {self.churn.population:,} vendors, prefix {self.churn.prefix}")
+        metrics.register_vendor_churn(self.churn)
+
+    def stop(self):
+        stats = self.churn.expected()
+        print(f"   [vendors] {stats['events']:,} events, expected {stats['vendors']:,} vendors / "
+              f"{stats['versions']:,} dim_vendor rows for prefix {stats['prefix']}")
+
+    def generate(self, n, now):
+        return self.churn.batch(n, now)
+
+
+STREAM_TYPES = {
+    "orders": OrdersStream,
+    "marketplace": MarketplaceStream,
+    "clickstream": ClickstreamStream,
+    "vendors": VendorsStream,
+}
+
+
+def build_streams(names, generator):
+    """Stream instances for `names`, sharing one generator (and its pools)"""
+    unknown = [name for name in names if name not in STREAM_TYPES]
+    if unknown:
+        raise RuntimeError(f"Unknown stream(s) {', '.join(unknown)} (known: {', '.join(STREAM_TYPES)})")
+    if common.SESSION_SIMULATION and "orders" in names:
+        # Orders come from converting sessions
+        names = [name for name in names if name != "orders"]
+    return {name: STREAM_TYPES[name](name, generator) for name in names}
+
+
+async def send_events(sender, name, hub, events):
+    """Send `events` to `hub`, counted under stream `name`"""
+    for event in events:
+        await common.safe_send(sender, hub, event, name)
+
+
+async def main(names=STREAMS):
+    eventlog.setup()
+    # Built before the streams: NumPy batches over the shared pools
+    from columnar import ColumnarGenerator
+    if set(names) <= {"marketplace", "vendors"}:
+        # Marketplace alone only needs its own catalogue
+        pools = common.load_pools("marketplace", common.MARKETPLACE_PRODUCTS_POOL_SIZE)
+    else:
+        pools = common.load_pools()
+    generator = ColumnarGenerator(*pools)
+    streams = build_streams(names, generator)
+    rates = {name: stream.rate() for name, stream in streams.items()}
+
+    print("🔀 Unified producer started")
+    for name, stream in streams.items():
+        print(f"   [{name}] -> {stream.hub}, {rates[name]:,.3f} events/s")
+    for stream in streams.values():
+        stream.start()
+    boot.mark("streams")
+
+    explicit = any(os.getenv(f"{stream.prefix}_RATE") for stream in streams.values())
+    controller = traffic.make_controller(rates)
+    injector = faults.make_injector()
+    cancel_on_sigterm()
+
+    async def emit(name, n):
+        stream = streams[name]
+        events = stream.generate(n, time.time())
+        await send_events(sender, name, stream.hub, events)
+        if injector:
+            await faults.send_faults(sender, injector, stream.hub, events)
+        for hub, derived in stream.derived().items():
+            await send_events(sender, hub, hub, derived)
+            if injector:
+                await faults.send_faults(sender, injector, hub, derived)
+
+    hubs = sorted({hub for stream in streams.values() for hub in stream.hubs})
+    try:
+        async with common.make_sender(hubs, spill_name="streams") as sender:
+            boot.mark("event hubs")
+            boot.watch_first_event(sender)
+            eventlog.start_partition_report(sender)
+            metrics.register_sender(sender)
+            metrics.register_event_counters(common.counters)
+            metrics.register_startup(boot.phases)
+            if injector:
+                metrics.register_faults(injector)
+            metrics.start_server()
+            traffic.start_control_server(controller.apply, controller.state)
+            if controller.profile:
+                print(f"🎚️  Traffic profile: {controller.profile}")
+
+            # Rate report only when rates were asked for, not for the slow interval defaults
+            report = common.RATE_REPORT_INTERVAL if explicit or controller.profile else 0
+            scheduler = RateScheduler(controller.rates(), report_every=report)
+            control = asyncio.create_task(controller.run(scheduler))
+            try:
+                await scheduler.run(emit)
+            finally:
+                control.cancel()
+    except asyncio.CancelledError:
+        print("🛑 SIGTERM: pending batches flushed, producer stopped")
+    finally:
+        for stream in streams.values():
+            stream.stop()
+        if injector:
+            injector.write_stats()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
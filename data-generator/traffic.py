@@ -0,0 +1,248 @@
+"""
+Traffic profiles
+================
+
+Declarative per-stream rate curves (traffic_profiles.json) applied to the
+RateScheduler while it runs, plus a local HTTP control endpoint to switch
+profile or override rates without a restart.
+
+Shapes (events/s), per stream:
+    {"shape": "constant", "rate": 50}
+    {"shape": "diurnal", "min": 5, "max": 60, "peak_hour": 20, "period": 600}
+        cosine over the day; wall-clock UTC hour, or a compressed day of
+        `period` seconds counted from the profile start
+    {"shape": "steps", "steps": [[0, 10], [300, 50]], "interpolate": false}
+        rate of the last step reached (seconds since start), linear if interpolate
+    {"shape": "burst", "base": 10 | {shape}, "factor": 20, "start": 60,
+     "duration": 120, "every": 900}
+        base x factor during the burst window, repeated every `every` seconds
+
+Streams missing from a profile keep their default rate (ORDERS_RATE /
+CLICKSTREAM_RATE, or 1/interval).
+
+Control endpoint (CONTROL_PORT, bound to 127.0.0.1):
+    curl localhost:8088/traffic
+    curl -X POST localhost:8088/traffic -d '{"profile": "black-friday"}'
+    curl -X POST localhost:8088/traffic -d '{"rates": {"orders": 200}}'
+    curl -X POST localhost:8088/traffic -d '{"rates": {"orders": null}, "scale": 2}'
+"""
+
+import asyncio
+import json
+import math
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+TRAFFIC_PROFILE = os.getenv("TRAFFIC_PROFILE", "")
+TRAFFIC_PROFILES_FILE = Path(os.getenv(
+    "TRAFFIC_PROFILES_FILE", Path(__file__).parent / "traffic_profiles.json"
+))
+CONTROL_PORT = int(os.getenv("CONTROL_PORT", 0))
+# Seconds between two rate updates pushed to the scheduler
+TRAFFIC_TICK = float(os.getenv("TRAFFIC_TICK", 1))
+
+SHAPES = ("constant", "diurnal", "steps", "burst")
+
+
+def validate(spec, where):
+    """Raise on an unknown shape or a missing parameter"""
+    shape = spec.get("shape")
+    if shape not in SHAPES:
+        raise RuntimeError(f"{where}: unknown shape '{shape}' (expected one of {', '.join(SHAPES)})")
+    required = {"constant": ["rate"], "diurnal": ["min", "max"], "steps": ["steps"], "burst": ["base", "factor", "duration"]}
+    missing = [key for key in required[shape] if key not in spec]
+    if missing:
+        raise RuntimeError(f"{where}: '{shape}' needs {', '.join(missing)}")
+    if shape == "burst" and isinstance(spec["base"], dict):
+        validate(spec["base"], f"{where}.base")
+
+
+def load_profiles(path=TRAFFIC_PROFILES_FILE):
+    profiles = json.loads(Path(path).read_text())
+    for name, streams in profiles.items():
+        for stream, spec in streams.items():
+            validate(spec, f"{name}.{stream}")
+    return profiles
+
+
+def rate_at(spec, elapsed, now=None):
+    """Rate of one shape, `elapsed` seconds after the profile started"""
+    if isinstance(spec, (int, float)):
+        return float(spec)
+    shape = spec["shape"]
+
+    if shape == "constant":
+        return float(spec["rate"])
+
+    if shape == "diurnal":
+        if spec.get("period"):
+            hour = (elapsed / spec["period"] * 24) % 24
+        else:
+            now = time.time() if now is None else now
+            t = datetime.fromtimestamp(now, timezone.utc)
+            hour = t.hour + t.minute / 60 + t.second / 3600
+        phase = (1 + math.cos(2 * math.pi * (hour - spec.get("peak_hour", 20)) / 24)) / 2
+        return spec["min"] + (spec["max"] - spec["min"]) * phase
+
+    if shape == "steps":
+        steps = spec["steps"]
+        rate = float(steps[0][1])
+        for i, (start, value) in enumerate(steps):
+            if elapsed < start:
+                if spec.get("interpolate") and i > 0:
+                    prev_start, prev_value = steps[i - 1]
+                    return prev_value + (value - prev_value) * (elapsed - prev_start) / (start - prev_start)
+                break
+            rate = float(value)
+        return rate
+
+    # burst
+    base = rate_at(spec["base"], elapsed, now)
+    offset = elapsed - spec.get("start", 0)
+    if offset >= 0:
+        every = spec.get("every")
+        if (offset % every if every else offset) < spec["duration"]:
+            return base * spec["factor"]
+    return base
+
+
+class TrafficController:
+    """Current profile, per-stream overrides and scale; feeds a RateScheduler
+
+    `defaults` holds the rate of every stream when neither the profile nor an
+    override sets it; `share` scales everything (1/N in a fleet worker).
+    """
+
+    def __init__(self, profiles, defaults, profile=None, share=1.0):
+        self.profiles = profiles
+        self.defaults = dict(defaults)
+        self.share = share
+        self.overrides = {}
+        self.scale = 1.0
+        self._lock = threading.Lock()
+        self._select(profile)
+
+    def _select(self, profile):
+        if profile and profile not in self.profiles:
+            raise ValueError(f"Unknown traffic profile '{profile}' (known: {', '.join(self.profiles)})")
+        self.profile = profile or None
+        self.started = time.monotonic()
+
+    def apply(self, command):
+        """Apply {"profile": name, "rates": {stream: rate | null}, "scale": factor}"""
+        with self._lock:
+            if "profile" in command:
+                self._select(command["profile"])
+                print(f"🎚️  Traffic profile: {self.profile or 'default rates'}")
+            for stream, rate in (command.get("rates") or {}).items():
+                if stream not in self.defaults:
+                    raise ValueError(f"Unknown stream '{stream}'")
+                if rate is None:
+                    self.overrides.pop(stream, None)
+                else:
+                    self.overrides[stream] = float(rate)
+            if "scale" in command:
+                self.scale = float(command["scale"])
+
+    def rates(self, now=None):
+        """Events/s per stream right now"""
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            streams = self.profiles.get(self.profile, {}) if self.profile else {}
+            rates = {}
+            for stream, default in self.defaults.items():
+                if stream in self.overrides:
+                    rate = self.overrides[stream]
+                elif stream in streams:
+                    rate = rate_at(streams[stream], elapsed, now)
+                else:
+                    rate = default
+                rates[stream] = max(0.0, rate * self.scale * self.share)
+            return rates
+
+    def state(self):
+        return {
+            "profile": self.profile,
+            "profiles": sorted(self.profiles),
+            "elapsed": round(time.monotonic() - self.started, 1),
+            "overrides": dict(self.overrides),
+            "scale": self.scale,
+            "rates": {stream: round(rate, 3) for stream, rate in self.rates().items()},
+        }
+
+    async def run(self, scheduler, commands=None, tick=TRAFFIC_TICK):
+        """Push the current rates to `scheduler` every `tick` seconds
+
+        `commands` is an optional multiprocessing queue of apply() commands
+        (fleet workers receive the parent's control requests this way).
+        """
+        while True:
+            while commands is not None:
+                try:
+                    self.apply(commands.get_nowait())
+                except queue.Empty:
+                    break
+            for stream, rate in self.rates().items():
+                if stream in scheduler.buckets:
+                    scheduler.set_rate(stream, rate)
+            await asyncio.sleep(tick)
+
+
+def make_controller(defaults, share=1.0, profile=TRAFFIC_PROFILE):
+    """Controller for TRAFFIC_PROFILE; profiles file is optional without a profile"""
+    if profile or TRAFFIC_PROFILES_FILE.exists():
+        profiles = load_profiles()
+    else:
+        profiles = {}
+    return TrafficController(profiles, defaults, profile=profile, share=share)
+
+
+def _handler(apply, state):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, code, payload):
+            body = json.dumps(payload, indent=2).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/traffic":
+                self._reply(404, {"error": "not found"})
+                return
+            self._reply(200, state())
+
+        def do_POST(self):
+            if self.path != "/traffic":
+                self._reply(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                command = json.loads(self.rfile.read(length) or b"{}")
+                apply(command)
+            except (ValueError, TypeError, AttributeError) as e:
+                self._reply(400, {"error": str(e)})
+                return
+            self._reply(200, state())
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_control_server(apply, state, port=CONTROL_PORT, host="127.0.0.1"):
+    """Serve GET/POST /traffic on a daemon thread; no-op when port is 0"""
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), _handler(apply, state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="traffic-control", daemon=True).start()
+    print(f"🎚️  Traffic control on http://{host}:{port}/traffic")
+    return server
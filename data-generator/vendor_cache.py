@@ -0,0 +1,177 @@
+"""
+Vendor cache
+============
+
+Active vendors for the marketplace producer, refreshed by a background thread
+on a persistent SQL connection so the send loop never waits on the database.
+
+After the initial load only rows of dim_vendor whose updated_at is at or past
+the last watermark, minus `lag` seconds, are fetched (idx_vendor_updated_at,
+migration 007). SCD2 closes the old row and inserts the new one, and both
+touch updated_at, so the delta sees every change. updated_at is set before
+commit: a row stamped before the watermark can commit after it, and the lag
+window picks it up on the next refresh. Rows read twice are applied twice,
+with the same result. Deltas are applied to a copy and swapped in as a new
+snapshot: readers always see a consistent list and random.choice(cache.vendors)
+stays O(1).
+"""
+
+import os
+import threading
+import time
+from datetime import timedelta
+
+import eventlog
+
+log = eventlog.logger
+
+# SQL Database connection
+SQL_SERVER = os.getenv("SQL_SERVER_FQDN")
+SQL_DATABASE = os.getenv("SQL_DATABASE_NAME")
+SQL_USER = os.getenv("SQL_ADMIN_LOGIN")
+SQL_PASSWORD = os.getenv("SQL_ADMIN_PASSWORD")
+
+FULL_QUERY = """
+    SELECT vendor_key, vendor_id, vendor_name, vendor_status, is_current, updated_at
+    FROM dim_vendor
+    WHERE is_current = 1
+    AND vendor_status = 'active'
+"""
+
+DELTA_QUERY = """
+    SELECT vendor_key, vendor_id, vendor_name, vendor_status, is_current, updated_at
+    FROM dim_vendor
+    WHERE updated_at >= ?
+    ORDER BY updated_at, vendor_key
+"""
+
+WATERMARK_QUERY = "SELECT MAX(updated_at) FROM dim_vendor"
+
+
+def connect_sql():
+    """Open a connection to the DWH database"""
+    import pyodbc
+    if not all([SQL_SERVER, SQL_DATABASE, SQL_USER, SQL_PASSWORD]):
+        raise RuntimeError("SQL connection variables not set")
+    conn_str = (
+        f"DRIVER={{ODBC Driver 18 for SQL Server}};"
+        f"SERVER={SQL_SERVER};"
+        f"DATABASE={SQL_DATABASE};"
+        f"UID={SQL_USER};"
+        f"PWD={SQL_PASSWORD};"
+        f"Encrypt=yes;"
+        f"TrustServerCertificate=no;"
+        f"Connection Timeout=30;"
+    )
+    return pyodbc.connect(conn_str)
+
+
+class VendorCache:
+    """Background-refreshed snapshot of active vendors"""
+
+    def __init__(self, connect, interval=60.0, lag=5.0):
+        self.connect = connect
+        self.interval = interval
+        self.lag = timedelta(seconds=lag)
+        # vendor_id -> (vendor_key, vendor dict); only replaced, never mutated
+        self._by_id = {}
+        self.vendors = []
+        self.watermark = None
+        self.last_refresh = None
+        self.refreshes = 0
+        self._conn = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def age(self):
+        """Seconds since the last successful refresh"""
+        return time.time() - self.last_refresh if self.last_refresh else None
+
+    def _cursor(self):
+        if self._conn is None:
+            self._conn = self.connect()
+        return self._conn.cursor()
+
+    def _reset_connection(self):
+        try:
+            if self._conn is not None:
+                self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def load(self):
+        """Full load of the current active set, sets the watermark"""
+        cursor = self._cursor()
+        cursor.execute(WATERMARK_QUERY)
+        row = cursor.fetchone()
+        watermark = row[0] if row else None
+        cursor.execute(FULL_QUERY)
+        by_id = {
+            r.vendor_id: (r.vendor_key, {"vendor_id": r.vendor_id, "vendor_name": r.vendor_name})
+            for r in cursor.fetchall()
+        }
+        self._swap(by_id, watermark)
+        return len(self.vendors)
+
+    def refresh(self):
+        """Fetch rows changed since the watermark (minus the lag) and apply them as a delta"""
+        if self.watermark is None:
+            return self.load()
+        cursor = self._cursor()
+        cursor.execute(DELTA_QUERY, self.watermark - self.lag)
+        rows = cursor.fetchall()
+        if not rows:
+            self.last_refresh = time.time()
+            return 0
+
+        by_id = dict(self._by_id)
+        # Closed versions first, so the new current version of a vendor wins
+        for r in sorted(rows, key=lambda r: r.is_current):
+            entry = by_id.get(r.vendor_id)
+            if r.is_current and r.vendor_status == "active":
+                by_id[r.vendor_id] = (r.vendor_key, {"vendor_id": r.vendor_id, "vendor_name": r.vendor_name})
+            elif r.is_current or (entry and entry[0] == r.vendor_key):
+                by_id.pop(r.vendor_id, None)
+        # Rows of the lag window were mostly applied already: count actual cache changes
+        changed = sum(1 for vendor_id in by_id.keys() | self._by_id.keys()
+                      if by_id.get(vendor_id) != self._by_id.get(vendor_id))
+        self._swap(by_id, max(self.watermark, max(r.updated_at for r in rows)))
+        return changed
+
+    def _swap(self, by_id, watermark):
+        self._by_id = by_id
+        # Single reference assignment: readers see the old or the new list
+        self.vendors = [vendor for _, vendor in by_id.values()]
+        if watermark is not None:
+            self.watermark = watermark
+        self.last_refresh = time.time()
+        self.refreshes += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                changed = self.refresh()
+                if changed:
+                    log.info("[vendors] %d vendors changed, %d active vendors", changed, len(self.vendors))
+            except Exception as e:
+                log.error("Error refreshing vendors: %s", e)
+                self._reset_connection()
+
+    def start(self):
+        """Initial load (blocking), then refresh every `interval` seconds in a thread"""
+        try:
+            self.load()
+        except Exception as e:
+            log.error("Error fetching vendors: %s", e)
+            self._reset_connection()
+        self._thread = threading.Thread(target=self._run, name="vendor-cache", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._reset_connection()
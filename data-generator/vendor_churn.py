@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Vendor churn
+============
+
+Vendor change events for stressing stg_vendor -> tr_vendor_staging_process
+-> sp_merge_vendor_scd2. A population of up to `population` vendors is
+registered (insert events) and then changed at random:
+
+    insert      new vendor                               -> 1 dim_vendor row
+    status      active <-> suspended (pending -> active) -> new SCD2 version
+    commission  commission_rate moved by 0.25 - 3.00     -> new SCD2 version
+    noop        current state sent again unchanged       -> no new version
+
+Vendor state lives in NumPy arrays (a few bytes per vendor, names from a
+Faker vocabulary drawn once), so populations of millions and tens of
+thousands of events/s are cheap. Every event is counted by kind; with the
+counts dim_vendor can be reconciled: rows = insert + status + commission,
+current rows = insert. Vendor ids are <prefix>-<n>, one fresh prefix per run.
+
+VENDOR_CHURN_MIX sets the kind shares ("insert=0.1,status=0.3,commission=0.4,noop=0.2").
+
+Usage:
+    python vendor_churn.py hub --rate 500 --seconds 300 --population 10000
+    python vendor_churn.py hub --dry-run --rate 50000 --seconds 10
+    python vendor_churn.py sql --connections 8 --rows 50 --seconds 120
+    python vendor_churn.py verify --stats vendor_churn_CH1A2B.json
+
+`hub` sends to the vendors Event Hub (the full Stream Analytics path); `sql`
+inserts straight into stg_vendor from several connections, so the insert
+latency is the trigger's merge time and concurrent connections show its
+contention; its INSERTs mix new and changed vendors, which needs the
+set-based sp_merge_vendor_scd2 (migration 006). Both write a stats file that
+`verify` checks against dim_vendor.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+KINDS = ("insert", "status", "commission", "noop")
+INSERT, STATUS, COMMISSION, NOOP = range(4)
+DEFAULT_MIX = {"insert": 0.1, "status": 0.3, "commission": 0.4, "noop": 0.2}
+
+STATUSES = ["active", "pending", "suspended"]
+ACTIVE, PENDING, SUSPENDED = range(3)
+CATEGORIES = ["electronics", "fashion", "home", "sports", "books", "toys", "food"]
+
+# Commission in hundredths of a percent, kept within the DECIMAL(5,2) range used by seed_vendors
+COMMISSION_MIN, COMMISSION_MAX = 500, 3000
+
+VENDOR_POPULATION = int(os.getenv("VENDOR_POPULATION", 10_000))
+VENDOR_CHURN_MIX = os.getenv("VENDOR_CHURN_MIX", "")
+VENDOR_ID_PREFIX = os.getenv("VENDOR_ID_PREFIX", "")
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]")
+
+
+def parse_mix(text):
+    """Shares per kind from "insert=0.1,status=0.3,..." (missing kinds = 0); empty = DEFAULT_MIX"""
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {kind: 0.0 for kind in KINDS}
+    for part in text.split(","):
+        kind, _, share = part.partition("=")
+        kind = kind.strip()
+        if kind not in mix:
+            raise RuntimeError(f"Unknown vendor change kind '{kind}' (expected {', '.join(KINDS)})")
+        mix[kind] = float(share)
+    if sum(mix.values()) <= 0:
+        raise RuntimeError("VENDOR_CHURN_MIX: at least one share must be positive")
+    return mix
+
+
+class VendorChurn:
+    """Vendor population and its change events"""
+
+    def __init__(self, population=VENDOR_POPULATION, mix=None, prefix=None, seed=None, vocab_size=500):
+        from faker import Faker
+        self.rng = np.random.default_rng(seed)
+        fake = Faker()
+        fake.seed_instance(seed)
+        self.names = list(dict.fromkeys(fake.company() for _ in range(vocab_size)))
+        self.slugs = [_NON_ALNUM.sub("", name.lower())[:30] for name in self.names]
+
+        # Not drawn from the seeded RNG: a rerun with the same seed gets new vendor ids
+        self.prefix = prefix or f"CH{os.urandom(2).hex().upper()}"
+        mix = mix or DEFAULT_MIX
+        shares = np.array([mix.get(kind, 0.0) for kind in KINDS], dtype=float)
+        self.mix = shares / shares.sum()
+        # Once every vendor is registered, inserts are replaced by changes
+        changes = shares[1:]
+        self.change_mix = changes / changes.sum() if changes.sum() > 0 else np.array([0.0, 0.0, 1.0])
+
+        self.population = population
+        self.count = 0
+        self.name = np.zeros(population, dtype=np.uint16)
+        self.category = np.zeros(population, dtype=np.uint8)
+        self.status = np.zeros(population, dtype=np.uint8)
+        self.commission = np.zeros(population, dtype=np.uint16)
+        self.stats = {kind: 0 for kind in KINDS}
+
+    def vendor_id(self, i):
+        return f"{self.prefix}-{i:07d}"
+
+    def _event(self, i, now):
+        name = int(self.name[i])
+        return {
+            "vendor_id": self.vendor_id(i),
+            "vendor_name": self.names[name],
+            "vendor_status": STATUSES[self.status[i]],
+            "vendor_category": CATEGORIES[self.category[i]],
+            "vendor_email": f"contact{i}@{self.slugs[name]}.com",
+            "commission_rate": int(self.commission[i]) / 100,
+            "timestamp": now,
+        }
+
+    def batch(self, n, now):
+        """n change events, applied to the population in order"""
+        rng = self.rng
+        kinds = rng.choice(len(KINDS), size=n, p=self.mix).tolist()
+        fallback = (rng.choice(3, size=n, p=self.change_mix) + 1).tolist()
+        targets = rng.random(n).tolist()
+        steps = (rng.integers(25, 301, size=n) * rng.choice([-1, 1], size=n)).tolist()
+        names = rng.integers(0, len(self.names), size=n).tolist()
+        categories = rng.integers(0, len(CATEGORIES), size=n).tolist()
+        pending = (rng.random(n) < 0.2).tolist()
+        commissions = rng.integers(1000, 2501, size=n).tolist()
+
+        events = []
+        for j in range(n):
+            kind = kinds[j]
+            if kind == INSERT and self.count >= self.population:
+                kind = fallback[j]
+            if kind != INSERT and self.count == 0:
+                kind = INSERT
+
+            if kind == INSERT:
+                i = self.count
+                self.count += 1
+                self.name[i] = names[j]
+                self.category[i] = categories[j]
+                self.status[i] = PENDING if pending[j] else ACTIVE
+                self.commission[i] = commissions[j]
+            else:
+                i = int(targets[j] * self.count)
+                if kind == STATUS:
+                    self.status[i] = SUSPENDED if self.status[i] == ACTIVE else ACTIVE
+                elif kind == COMMISSION:
+                    current = int(self.commission[i])
+                    value = min(COMMISSION_MAX, max(COMMISSION_MIN, current + steps[j]))
+                    if value == current:
+                        # Clipped at a bound: move the other way
+                        value = current - steps[j]
+                    self.commission[i] = value
+            self.stats[KINDS[kind]] += 1
+            events.append(self._event(i, now))
+        return events
+
+    def expected(self):
+        """What dim_vendor should hold for this prefix once every event is merged"""
+        return {
+            "prefix": self.prefix,
+            "events": sum(self.stats.values()),
+            **self.stats,
+            "vendors": self.count,
+            "versions": self.stats["insert"] + self.stats["status"] + self.stats["commission"],
+        }
+
+    @property
+    def nbytes(self):
+        return self.name.nbytes + self.category.nbytes + self.status.nbytes + self.commission.nbytes
+
+
+def make_churn(seed=None):
+    """VendorChurn from VENDOR_POPULATION / VENDOR_CHURN_MIX / VENDOR_ID_PREFIX"""
+    return VendorChurn(VENDOR_POPULATION, parse_mix(VENDOR_CHURN_MIX), VENDOR_ID_PREFIX or None, seed=seed)
+
+
+def _churn(args):
+    return VendorChurn(args.population, parse_mix(args.mix), args.prefix, seed=args.seed)
+
+
+def _write_stats(churn, extra=None):
+    path = f"vendor_churn_{churn.prefix}.json"
+    with open(path, "w") as f:
+        json.dump({**churn.expected(), **(extra or {})}, f, indent=2)
+    print(f"📝 Expected dim_vendor state written to {path}")
+
+
+def _print_stats(churn, elapsed):
+    stats = churn.expected()
+    print(f"📤 {stats['events']:,} vendor events in {elapsed:.1f}s ({stats['events'] / elapsed:,.0f}/s), "
+          f"prefix {churn.prefix}")
+    print("   " + ", ".join(f"{kind} {stats[kind]:,}" for kind in KINDS))
+    print(f"   expected: {stats['vendors']:,} vendors, {stats['versions']:,} dim_vendor rows")
+
+
+def run_hub(args):
+    """Send churn events to the vendors Event Hub at --rate"""
+    import encoding
+    import partitioning
+    from rate import RateScheduler
+    from sender import BatchSender, EventHubSink, MemorySink
+
+    churn = _churn(args)
+    print(f"🏪 {churn.population:,} vendors ({churn.nbytes / churn.population:.0f} bytes each), "
+          f"mix {dict(zip(KINDS, churn.mix.round(3).tolist()))}")
+    if args.dry_run:
+        sink_factory = lambda name: MemorySink()
+    else:
+        connection_str = os.getenv("EVENTHUB_CONNECTION_STR")
+        if not connection_str:
+            raise RuntimeError("EVENTHUB_CONNECTION_STR not set (or use --dry-run)")
+        sink_factory = lambda name: EventHubSink(connection_str, name)
+
+    async def run():
+        async with BatchSender(sink_factory, ["vendors"]) as sender:
+            async def emit(name, n):
+                for event in churn.batch(n, time.time()):
+                    await sender.send("vendors", encoding.encode("vendors", event),
+                                      partitioning.partition_key("vendors", event))
+
+            scheduler = RateScheduler({"vendors": args.rate}, report_every=10)
+            await scheduler.run(emit, duration=args.seconds)
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    _print_stats(churn, time.perf_counter() - start)
+    if not args.dry_run:
+        _write_stats(churn)
+
+
+INSERT_ROW = "(?, ?, ?, ?, ?, ?, ?, DATEADD(second, ?, '1970-01-01'))"
+# ORDER BY n: staging_id follows the event order, which sp_merge_vendor_scd2
+# (migration 006) uses for the rows of one statement
+INSERT_BATCH = """
+    INSERT INTO stg_vendor (vendor_id, vendor_name, vendor_status, vendor_category,
+                            vendor_email, commission_rate, event_timestamp)
+    SELECT vendor_id, vendor_name, vendor_status, vendor_category, vendor_email, commission_rate, event_timestamp
+    FROM (VALUES {}) AS batch (n, vendor_id, vendor_name, vendor_status, vendor_category,
+                               vendor_email, commission_rate, event_timestamp)
+    ORDER BY n
+"""
+# 2100 parameters per statement, 8 per row
+MAX_ROWS = 262
+
+
+def run_sql(args):
+    """Insert churn straight into stg_vendor from --connections threads"""
+    from vendor_cache import connect_sql
+
+    churn = _churn(args)
+    lock = threading.Lock()
+    stop = time.monotonic() + args.seconds
+    per_connection = args.rate / args.connections if args.rate else 0
+    latencies, errors, deadlocks, lost = [], [0], [0], {kind: 0 for kind in KINDS}
+    statement = INSERT_BATCH.format(", ".join([INSERT_ROW] * args.rows))
+
+    def worker():
+        conn = connect_sql()
+        cursor = conn.cursor()
+        next_at = time.monotonic()
+        while time.monotonic() < stop:
+            with lock:
+                before = dict(churn.stats)
+                events = churn.batch(args.rows, time.time())
+                kinds = {kind: churn.stats[kind] - before[kind] for kind in KINDS}
+            params = []
+            for n, e in enumerate(events):
+                params += [n, e["vendor_id"], e["vendor_name"], e["vendor_status"], e["vendor_category"],
+                           e["vendor_email"], e["commission_rate"], e["timestamp"]]
+            inserted = False
+            for attempt in range(3):
+                try:
+                    start = time.perf_counter()
+                    # The AFTER INSERT trigger merges within this statement
+                    cursor.execute(statement, params)
+                    conn.commit()
+                    with lock:
+                        latencies.append(time.perf_counter() - start)
+                    inserted = True
+                    break
+                except Exception as e:
+                    conn.rollback()
+                    # 1205: chosen as deadlock victim, the statement can be retried
+                    if "1205" in str(e):
+                        with lock:
+                            deadlocks[0] += 1
+                        continue
+                    print(f"❌ Insert failed: {e}")
+                    break
+            if not inserted:
+                with lock:
+                    errors[0] += 1
+                    for kind, count in kinds.items():
+                        lost[kind] += count
+            if per_connection:
+                next_at += args.rows / per_connection
+                time.sleep(max(0.0, next_at - time.monotonic()))
+        conn.close()
+
+    print(f"🏪 {args.connections} connections x {args.rows} rows per INSERT into stg_vendor, prefix {churn.prefix}")
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(args.connections)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    _print_stats(churn, elapsed)
+    if latencies:
+        ms = np.array(latencies) * 1000
+        rows = len(latencies) * args.rows
+        print(f"   merged {rows:,} rows in {len(latencies):,} INSERTs -> {rows / elapsed:,.0f} rows/s")
+        print(f"   INSERT + merge latency p50 {np.percentile(ms, 50):.0f} ms, p95 {np.percentile(ms, 95):.0f} ms, "
+              f"p99 {np.percentile(ms, 99):.0f} ms, max {ms.max():.0f} ms")
+    print(f"   deadlocks retried {deadlocks[0]:,}, failed INSERTs {errors[0]:,}")
+    # Failed statements never reached stg_vendor: take them out of the expected counts
+    for kind, count in lost.items():
+        churn.stats[kind] -= count
+    _write_stats(churn, {"deadlocks": deadlocks[0], "failed_inserts": errors[0]})
+
+
+def run_verify(args):
+    """Compare dim_vendor / stg_vendor with a stats file"""
+    from vendor_cache import connect_sql
+
+    with open(args.stats) as f:
+        expected = json.load(f)
+    pattern = expected["prefix"] + "-%"
+    cursor = connect_sql().cursor()
+    cursor.execute("""
+        SELECT COUNT(*), SUM(CASE WHEN is_current = 1 THEN 1 ELSE 0 END), COUNT(DISTINCT vendor_id)
+        FROM dim_vendor WHERE vendor_id LIKE ?
+    """, pattern)
+    rows, current, vendors = cursor.fetchone()
+    cursor.execute("SELECT COUNT(*), SUM(CASE WHEN processed = 0 THEN 1 ELSE 0 END) "
+                   "FROM stg_vendor WHERE vendor_id LIKE ?", pattern)
+    staged, unprocessed = cursor.fetchone()
+
+    checks = [
+        ("events staged", expected["events"], staged),
+        ("vendors", expected["vendors"], vendors),
+        ("current rows", expected["vendors"], current or 0),
+        ("dim_vendor rows", expected["versions"], rows),
+        ("unprocessed staging rows", 0, unprocessed or 0),
+    ]
+    ok = True
+    for label, want, got in checks:
+        mark = "✅" if want == got else "❌"
+        ok &= want == got
+        print(f"{mark} {label}: expected {want:,}, found {got:,}")
+    if not ok:
+        print("   Events merged out of order can add or drop versions (noop after a change)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def common(p):
+        p.add_argument("--population", type=int, default=VENDOR_POPULATION, help="Max vendors registered")
+        p.add_argument("--mix", default=VENDOR_CHURN_MIX, help="Shares per kind, e.g. insert=0.1,status=0.3,...")
+        p.add_argument("--prefix", default=VENDOR_ID_PREFIX or None, help="vendor_id prefix (default: random)")
+        p.add_argument("--seed", type=int, default=None)
+        p.add_argument("--seconds", type=float, default=60)
+
+    p = sub.add_parser("hub", help="Send churn to the vendors Event Hub")
+    common(p)
+    p.add_argument("--rate", type=float, default=100, help="Events/s")
+    p.add_argument("--dry-run", action="store_true", help="In-memory sink: generation throughput only")
+    p.set_defaults(func=run_hub)
+
+    p = sub.add_parser("sql", help="INSERT churn straight into stg_vendor (trigger merge)")
+    common(p)
+    p.add_argument("--rate", type=float, default=0, help="Total events/s (0 = as fast as possible)")
+    p.add_argument("--connections", type=int, default=4)
+    p.add_argument("--rows", type=int, default=50, help=f"Rows per INSERT statement (max {MAX_ROWS})")
+    p.set_defaults(func=run_sql)
+
+    p = sub.add_parser("verify", help="Reconcile dim_vendor with a stats file")
+    p.add_argument("--stats", required=True)
+    p.set_defaults(func=run_verify)
+
+    args = parser.parse_args()
+    if args.command == "sql" and not 0 < args.rows <= MAX_ROWS:
+        parser.error(f"--rows must be between 1 and {MAX_ROWS} (2100 parameters per statement)")
+    result = args.func(args)
+    if result is False:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+-- ============================================================================
+-- Migration 005: Set-Based SCD Type 2 Merge for dim_product
+-- ============================================================================
+--
+-- Replaces the cursor in sp_merge_product_scd2 (migration 003) with
+-- set-based statements. The cursor declared its @current_* variables inside
+-- the loop, where DECLARE does not reset them: after an existing product, a
+-- new product of the same batch was taken for the previous one and closed
+-- its current version. Batches inserted in one statement (seed scripts:
+-- INSERT ... SELECT into stg_product) hit this on every run.
+--
+-- The procedure now processes the whole batch at once:
+-- - each staging row is compared with the previous state of its product
+--   (current dim_product row, then the previous staging row, in arrival order)
+-- - rows that change something become versions, valid until the next one
+-- - the current dim_product row of a changed product is closed at its first
+--   new version
+--
+-- Execution: Run after 003_implement_scd2_product.sql
+-- Rollback: Re-run the procedure section of 003_implement_scd2_product.sql
+--
+-- ============================================================================
+
+PRINT 'Starting Migration 005: Set-based SCD Type 2 merge for dim_product';
+GO
+
+IF EXISTS (SELECT * FROM sys.objects WHERE name = 'sp_merge_product_scd2' AND type = 'P')
+BEGIN
+    DROP PROCEDURE sp_merge_product_scd2;
+    PRINT '⚠ Dropped existing sp_merge_product_scd2';
+END
+GO
+
+CREATE PROCEDURE sp_merge_product_scd2
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @ProcessedCount INT;
+    DECLARE @InsertedCount INT;
+    DECLARE @UpdatedCount INT;
+
+    BEGIN TRANSACTION;
+
+    -- 1. The batch: unprocessed staging rows, numbered per product in order of arrival
+    SELECT staging_id, product_id, name, category, vendor_id, event_timestamp,
+           ROW_NUMBER() OVER (PARTITION BY product_id ORDER BY created_at, staging_id) AS seq
+    INTO #batch
+    FROM stg_product WITH (UPDLOCK, HOLDLOCK)
+    WHERE processed = 0;
+
+    SET @ProcessedCount = @@ROWCOUNT;
+
+    -- 2. Versions: staging rows that differ from the previous state of their product
+    --    (seq 0 = the current dim_product row, if any)
+    WITH states AS (
+        SELECT product_id, name, category, vendor_id, CAST(NULL AS DATETIME2) AS event_timestamp, CAST(0 AS BIGINT) AS seq
+        FROM dim_product
+        WHERE is_current = 1 AND product_id IN (SELECT product_id FROM #batch)
+        UNION ALL
+        SELECT product_id, name, category, vendor_id, event_timestamp, seq
+        FROM #batch
+    ),
+    compared AS (
+        SELECT product_id, name, category, vendor_id, event_timestamp, seq,
+               LAG(seq) OVER (PARTITION BY product_id ORDER BY seq) AS prev_seq,
+               LAG(name) OVER (PARTITION BY product_id ORDER BY seq) AS prev_name,
+               LAG(category) OVER (PARTITION BY product_id ORDER BY seq) AS prev_category,
+               LAG(vendor_id) OVER (PARTITION BY product_id ORDER BY seq) AS prev_vendor_id
+        FROM states
+    )
+    SELECT product_id, name, category, vendor_id, event_timestamp, seq,
+           CASE WHEN prev_seq IS NULL THEN 1 ELSE 0 END AS is_new
+    INTO #changes
+    FROM compared
+    WHERE seq > 0
+      AND (prev_seq IS NULL
+           OR name != prev_name
+           OR category != prev_category
+           OR vendor_id != prev_vendor_id);
+
+    SELECT product_id, name, category, vendor_id, event_timestamp, is_new,
+           ROW_NUMBER() OVER (PARTITION BY product_id ORDER BY seq) AS version_no,
+           LEAD(event_timestamp) OVER (PARTITION BY product_id ORDER BY seq) AS next_timestamp,
+           LEAD(seq) OVER (PARTITION BY product_id ORDER BY seq) AS next_seq
+    INTO #versions
+    FROM #changes;
+
+    -- 3. Close the current record of every changed product at its first new version
+    UPDATE d
+    SET valid_to = v.event_timestamp,
+        is_current = 0,
+        updated_at = GETDATE()
+    FROM dim_product d
+    JOIN #versions v ON v.product_id = d.product_id AND v.version_no = 1 AND v.is_new = 0
+    WHERE d.is_current = 1;
+
+    -- 4. Insert the new versions: each valid until the next one, the last one current
+    INSERT INTO dim_product (
+        product_id, name, category, vendor_id, valid_from, valid_to, is_current
+    )
+    SELECT product_id, name, category, vendor_id, event_timestamp, next_timestamp,
+           CASE WHEN next_seq IS NULL THEN 1 ELSE 0 END
+    FROM #versions;
+
+    -- 5. Mark the batch as processed (unchanged rows included)
+    UPDATE s
+    SET processed = 1
+    FROM stg_product s
+    JOIN #batch b ON b.staging_id = s.staging_id;
+
+    SELECT @InsertedCount = ISNULL(SUM(is_new), 0),
+           @UpdatedCount = COUNT(*) - ISNULL(SUM(is_new), 0)
+    FROM #versions;
+
+    COMMIT TRANSACTION;
+
+    DROP TABLE #batch;
+    DROP TABLE #changes;
+    DROP TABLE #versions;
+
+    -- Log results
+    PRINT '✓ SCD Type 2 processing for products complete';
+    PRINT '  Processed: ' + CAST(@ProcessedCount AS NVARCHAR(10));
+    PRINT '  Inserted (new products): ' + CAST(@InsertedCount AS NVARCHAR(10));
+    PRINT '  Updated (historized products): ' + CAST(@UpdatedCount AS NVARCHAR(10));
+END
+GO
+
+PRINT '✓ sp_merge_product_scd2 stored procedure recreated (set-based)';
+GO
+
+PRINT 'Migration 005 completed successfully!';
+GO
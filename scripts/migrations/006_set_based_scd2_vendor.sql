@@ -0,0 +1,148 @@
+-- ============================================================================
+-- Migration 006: Set-Based SCD Type 2 Merge for dim_vendor
+-- ============================================================================
+--
+-- Replaces the cursor in sp_merge_vendor_scd2 (migration 002) with
+-- set-based statements, as migration 005 did for products. The cursor
+-- declared its @current_* variables inside the loop, where DECLARE does not
+-- reset them: after an existing vendor, a new vendor of the same batch was
+-- taken for the previous one and closed its current version. Multi-row
+-- inserts into stg_vendor (vendor_churn.py sql) hit this on every batch.
+--
+-- The procedure now processes the whole batch at once:
+-- - each staging row is compared with the previous state of its vendor
+--   (current dim_vendor row, then the previous staging row, in arrival order:
+--   created_at, then staging_id for rows inserted by the same statement)
+-- - rows that change something become versions, valid until the next one
+-- - the current dim_vendor row of a changed vendor is closed at its first
+--   new version
+--
+-- Execution: Run after 002_implement_scd2_vendor.sql
+-- Rollback: Re-run the procedure section of 002_implement_scd2_vendor.sql
+--
+-- ============================================================================
+
+PRINT 'Starting Migration 006: Set-based SCD Type 2 merge for dim_vendor';
+GO
+
+IF EXISTS (SELECT * FROM sys.objects WHERE name = 'sp_merge_vendor_scd2' AND type = 'P')
+BEGIN
+    DROP PROCEDURE sp_merge_vendor_scd2;
+    PRINT '⚠ Dropped existing sp_merge_vendor_scd2';
+END
+GO
+
+CREATE PROCEDURE sp_merge_vendor_scd2
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @ProcessedCount INT;
+    DECLARE @InsertedCount INT;
+    DECLARE @UpdatedCount INT;
+
+    BEGIN TRANSACTION;
+
+    -- 1. The batch: unprocessed staging rows, numbered per vendor in order of arrival
+    SELECT staging_id, vendor_id, vendor_name, vendor_status, vendor_category,
+           vendor_email, commission_rate, event_timestamp,
+           ROW_NUMBER() OVER (PARTITION BY vendor_id ORDER BY created_at, staging_id) AS seq
+    INTO #batch
+    FROM stg_vendor WITH (UPDLOCK, HOLDLOCK)
+    WHERE processed = 0;
+
+    SET @ProcessedCount = @@ROWCOUNT;
+
+    -- 2. Versions: staging rows that differ from the previous state of their vendor
+    --    (seq 0 = the current dim_vendor row, if any)
+    WITH states AS (
+        SELECT vendor_id, vendor_name, vendor_status, vendor_category, vendor_email, commission_rate,
+               CAST(NULL AS DATETIME2) AS event_timestamp, CAST(0 AS BIGINT) AS seq
+        FROM dim_vendor
+        WHERE is_current = 1 AND vendor_id IN (SELECT vendor_id FROM #batch)
+        UNION ALL
+        SELECT vendor_id, vendor_name, vendor_status, vendor_category, vendor_email, commission_rate,
+               event_timestamp, seq
+        FROM #batch
+    ),
+    compared AS (
+        SELECT vendor_id, vendor_name, vendor_status, vendor_category, vendor_email, commission_rate,
+               event_timestamp, seq,
+               LAG(seq) OVER (PARTITION BY vendor_id ORDER BY seq) AS prev_seq,
+               LAG(vendor_name) OVER (PARTITION BY vendor_id ORDER BY seq) AS prev_name,
+               LAG(vendor_status) OVER (PARTITION BY vendor_id ORDER BY seq) AS prev_status,
+               LAG(vendor_category) OVER (PARTITION BY vendor_id ORDER BY seq) AS prev_category,
+               LAG(vendor_email) OVER (PARTITION BY vendor_id ORDER BY seq) AS prev_email,
+               LAG(commission_rate) OVER (PARTITION BY vendor_id ORDER BY seq) AS prev_commission
+        FROM states
+    )
+    SELECT vendor_id, vendor_name, vendor_status, vendor_category, vendor_email, commission_rate,
+           event_timestamp, seq,
+           CASE WHEN prev_seq IS NULL THEN 1 ELSE 0 END AS is_new
+    INTO #changes
+    FROM compared
+    WHERE seq > 0
+      AND (prev_seq IS NULL
+           OR vendor_name != prev_name
+           OR vendor_status != prev_status
+           OR ISNULL(vendor_category, '') != ISNULL(prev_category, '')
+           OR ISNULL(vendor_email, '') != ISNULL(prev_email, '')
+           OR ISNULL(commission_rate, 0) != ISNULL(prev_commission, 0));
+
+    SELECT vendor_id, vendor_name, vendor_status, vendor_category, vendor_email, commission_rate,
+           event_timestamp, is_new,
+           ROW_NUMBER() OVER (PARTITION BY vendor_id ORDER BY seq) AS version_no,
+           LEAD(event_timestamp) OVER (PARTITION BY vendor_id ORDER BY seq) AS next_timestamp,
+           LEAD(seq) OVER (PARTITION BY vendor_id ORDER BY seq) AS next_seq
+    INTO #versions
+    FROM #changes;
+
+    -- 3. Close the current record of every changed vendor at its first new version
+    UPDATE d
+    SET valid_to = v.event_timestamp,
+        is_current = 0,
+        updated_at = GETDATE()
+    FROM dim_vendor d
+    JOIN #versions v ON v.vendor_id = d.vendor_id AND v.version_no = 1 AND v.is_new = 0
+    WHERE d.is_current = 1;
+
+    -- 4. Insert the new versions: each valid until the next one, the last one current
+    INSERT INTO dim_vendor (
+        vendor_id, vendor_name, vendor_status, vendor_category,
+        vendor_email, commission_rate, valid_from, valid_to, is_current
+    )
+    SELECT vendor_id, vendor_name, vendor_status, vendor_category,
+           vendor_email, commission_rate, event_timestamp, next_timestamp,
+           CASE WHEN next_seq IS NULL THEN 1 ELSE 0 END
+    FROM #versions;
+
+    -- 5. Mark the batch as processed (unchanged rows included)
+    UPDATE s
+    SET processed = 1
+    FROM stg_vendor s
+    JOIN #batch b ON b.staging_id = s.staging_id;
+
+    SELECT @InsertedCount = ISNULL(SUM(is_new), 0),
+           @UpdatedCount = COUNT(*) - ISNULL(SUM(is_new), 0)
+    FROM #versions;
+
+    COMMIT TRANSACTION;
+
+    DROP TABLE #batch;
+    DROP TABLE #changes;
+    DROP TABLE #versions;
+
+    -- Log results
+    PRINT '✓ SCD Type 2 processing complete';
+    PRINT '  Processed: ' + CAST(@ProcessedCount AS NVARCHAR(10));
+    PRINT '  Inserted (new vendors): ' + CAST(@InsertedCount AS NVARCHAR(10));
+    PRINT '  Updated (historized): ' + CAST(@UpdatedCount AS NVARCHAR(10));
+END
+GO
+
+PRINT '✓ sp_merge_vendor_scd2 stored procedure recreated (set-based)';
+GO
+
+PRINT 'Migration 006 completed successfully!';
+GO
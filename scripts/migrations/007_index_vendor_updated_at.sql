@@ -0,0 +1,35 @@
+-- ============================================================================
+-- Migration 007: Index dim_vendor.updated_at
+-- ============================================================================
+--
+-- The vendor cache of the marketplace producer (data-generator/vendor_cache.py)
+-- refreshes with WHERE updated_at >= <watermark>. Without an index on
+-- updated_at every refresh scans dim_vendor, history rows included
+-- (seed_scd2_history.py). The included columns cover the delta query.
+--
+-- Execution: Run after 001_add_marketplace_tables.sql
+-- Rollback: DROP INDEX idx_vendor_updated_at ON dim_vendor;
+--
+-- ============================================================================
+
+PRINT 'Starting Migration 007: Index dim_vendor.updated_at';
+GO
+
+IF NOT EXISTS (
+    SELECT * FROM sys.indexes
+    WHERE object_id = OBJECT_ID('dim_vendor')
+    AND name = 'idx_vendor_updated_at'
+)
+BEGIN
+    CREATE INDEX idx_vendor_updated_at ON dim_vendor(updated_at)
+        INCLUDE (vendor_id, vendor_name, vendor_status, is_current);
+    PRINT '✓ Created index idx_vendor_updated_at on dim_vendor.updated_at';
+END
+ELSE
+BEGIN
+    PRINT '⚠ Index idx_vendor_updated_at already exists on dim_vendor';
+END
+GO
+
+PRINT 'Migration 007 completed successfully!';
+GO
@@ -0,0 +1,199 @@
+"""
+Fichiers de seed
+================
+
+Jeu de données historique écrit sur disque par seed_historical_data.py
+(--generate-only), puis rechargé autant de fois que voulu (--load-from), dans
+SQL Server ou dans DuckDB, sans repayer la génération (Faker, UUID, random).
+
+Arborescence :
+    DIR/manifest.json                     paramètres de génération et format
+    DIR/dim_customer.<ext>                pool de clients
+    DIR/products.<ext>                    pool de produits
+    DIR/dim_vendor.<ext>                  pool de vendeurs (avec --scale-factor)
+    DIR/<table>/<AAAA-MM-JJ>.<ext>        une partition (table, jour)
+
+Chaque fichier est écrit sous un nom temporaire puis renommé : un fichier
+présent est une partition complète, ce qui sert de checkpoint à la génération.
+
+Formats : parquet (colonnes typées, compressé zstd, nécessite pyarrow) ou csv
+(bibliothèque standard, en-tête, valeur vide = NULL). DuckDB (--duckdb)
+nécessite le paquet duckdb.
+"""
+
+import csv
+import json
+import os
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+FORMATS = ("parquet", "csv")
+MANIFEST = "manifest.json"
+
+# Types de colonnes : conversion depuis le CSV
+PARSERS = {
+    "str": str,
+    "int": int,
+    "float": float,
+    "datetime": datetime.fromisoformat,
+}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Le format parquet nécessite pyarrow (uv sync --extra files ou pip install pyarrow)")
+    return pyarrow
+
+
+def _arrow_type(pa, kind):
+    return {"str": pa.string(), "int": pa.int32(), "float": pa.float64(), "datetime": pa.timestamp("us")}[kind]
+
+
+def partition_path(directory, table, day, fmt):
+    return Path(directory) / table / f"{day}.{fmt}"
+
+
+def list_partitions(directory, table, fmt):
+    """Jours des partitions présentes pour `table`, triés."""
+    folder = Path(directory) / table
+    if not folder.is_dir():
+        return []
+    return sorted(date.fromisoformat(p.stem) for p in folder.glob(f"*.{fmt}"))
+
+
+class PartitionWriter:
+    """Écrit des lignes dans un fichier parquet/csv, par lots de `batch_size`.
+
+    Même interface que BulkLoader (add, flush, close, total, elapsed) : le
+    fichier n'apparaît sous son nom définitif qu'au close().
+    """
+
+    def __init__(self, path, columns, types, fmt, batch_size=10000, label=""):
+        self.path = Path(path)
+        self.tmp = self.path.with_name(self.path.name + ".tmp")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.columns = columns
+        self.types = types
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.label = label
+        self.rows = []
+        self.total = 0
+        self.start = time.perf_counter()
+        if fmt == "parquet":
+            pa = _pyarrow()
+            self.schema = pa.schema([(c, _arrow_type(pa, t)) for c, t in zip(columns, types)])
+            self.writer = pa.parquet.ParquetWriter(str(self.tmp), self.schema, compression="zstd")
+        else:
+            self.file = open(self.tmp, "w", newline="", encoding="utf-8")
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(columns)
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.fmt == "parquet":
+            pa = _pyarrow()
+            arrays = [pa.array(list(col), type=field.type) for col, field in zip(zip(*self.rows), self.schema)]
+            self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        else:
+            self.writer.writerows(self.rows)
+        self.total += len(self.rows)
+        self.rows = []
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def close(self):
+        self.flush()
+        if self.fmt == "parquet":
+            self.writer.close()
+        else:
+            self.file.close()
+        os.replace(self.tmp, self.path)
+
+    def discard(self):
+        """Abandonne le fichier en cours (partition en échec)."""
+        try:
+            self.writer.close() if self.fmt == "parquet" else self.file.close()
+        finally:
+            self.tmp.unlink(missing_ok=True)
+
+
+def read_rows(path, types, batch_size=10000):
+    """Lignes (tuples) d'un fichier parquet/csv, lues par lots de `batch_size`."""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        pa = _pyarrow()
+        parquet_file = pa.parquet.ParquetFile(str(path))
+        for batch in parquet_file.iter_batches(batch_size=batch_size):
+            yield from zip(*(column.to_pylist() for column in batch.columns))
+        return
+    parsers = [PARSERS[t] for t in types]
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader)
+        for record in reader:
+            yield tuple(parse(value) if value != "" else None for parse, value in zip(parsers, record))
+
+
+def write_records(path, records, columns, fmt):
+    """Écrit une liste de dicts (pool de dimension), toutes colonnes texte."""
+    writer = PartitionWriter(path, columns, ["str"] * len(columns), fmt)
+    for record in records:
+        writer.add(tuple(record[c] for c in columns))
+    writer.close()
+
+
+def read_records(path, columns):
+    """Relit une liste de dicts écrite par write_records."""
+    return [dict(zip(columns, row)) for row in read_rows(path, ["str"] * len(columns))]
+
+
+def write_manifest(directory, manifest):
+    path = Path(directory) / MANIFEST
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(manifest, indent=2, default=str), encoding="utf-8")
+
+
+def read_manifest(directory):
+    path = Path(directory) / MANIFEST
+    if not path.exists():
+        raise RuntimeError(f"{path} introuvable : générez d'abord le jeu avec --generate-only {directory}")
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def load_duckdb(directory, database, fmt, tables):
+    """Charge dimensions et partitions dans une base DuckDB (tables recréées).
+
+    DuckDB lit tous les fichiers d'une table en une requête, en parallèle :
+    c'est la référence de débit pour comparer avec le chargement SQL Server.
+    """
+    try:
+        import duckdb
+    except ImportError:
+        raise RuntimeError("Le chargement DuckDB nécessite duckdb (uv sync --extra duckdb ou pip install duckdb)")
+
+    reader = "read_parquet" if fmt == "parquet" else "read_csv_auto"
+    con = duckdb.connect(database)
+    sources = {name: Path(directory) / f"{name}.{fmt}" for name in ("dim_customer", "products", "dim_vendor")
+               if (Path(directory) / f"{name}.{fmt}").exists()}
+    sources.update({table: Path(directory) / table / f"*.{fmt}" for table in tables})
+    for table, source in sources.items():
+        start = time.perf_counter()
+        con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT * FROM {reader}('{source.as_posix()}')")
+        rows = con.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        elapsed = time.perf_counter() - start
+        print(f"✅ {table}: {rows:,} lignes chargées dans {database} en {elapsed:.1f}s "
+              f"({rows / elapsed if elapsed else 0:,.0f} lignes/s)")
+    con.close()
@@ -5,6 +5,17 @@ Script pour générer des données historiques dans le Data Warehouse.
 Ce script insère des données fictives pour les 30 derniers jours afin de
 rendre les analyses plus réalistes lors des tests.
 
+Les faits sont découpés en partitions (table, jour) insérées chacune dans une
+transaction avec son checkpoint (table seed_checkpoint) : --workers les répartit
+sur plusieurs processus, et une relance avec le même --run reprend là où le
+précédent s'est arrêté, sans doublons.
+
+--scale-factor dimensionne tout le jeu d'un coup (clients, produits, vendeurs,
+commandes, clics, stock) à la manière des benchmarks TPC, et rend la génération
+déterministe : chaque pool et chaque partition (table, jour) a sa propre graine,
+dérivée de --seed, donc un même SF redonne exactement les mêmes données, quel
+que soit le nombre de workers ou l'ordre des partitions.
+
 Usage:
     python scripts/seed_historical_data.py \
         --server sql-dbreau-whole-rat.database.windows.net \
@@ -15,13 +26,17 @@ Usage:
 
 import pyodbc
 import random
-import uuid
+import time
 import os
-from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from pathlib import Path
 from faker import Faker
 from dotenv import load_dotenv
 import argparse
 
+import seed_files
+
 # Charger les variables d'environnement depuis .env
 load_dotenv()
 
@@ -31,6 +46,22 @@ fake = Faker()
 DAYS_OF_HISTORY = 30
 ORDERS_PER_DAY = 50
 CLICKS_PER_DAY = 500
+# Lignes par executemany (fast_executemany) : un aller-retour et un commit par lot
+BATCH_SIZE = 10000
+# Intervalle (s) entre deux affichages du débit
+REPORT_EVERY = 5
+
+# --scale-factor : volumes par unité de SF (SF1 ≈ 400 000 lignes de faits sur 30 jours)
+SCALE_FACTOR_SIZES = {
+    "customers": 1000,
+    "products": 200,
+    "vendors": 10,
+    "orders_per_day": 1000,
+    "clicks_per_day": 10000,
+}
+# Avec --scale-factor, jour de fin et graine par défaut fixes : SF1 aujourd'hui = SF1 dans un mois
+SCALE_FACTOR_END_DATE = date(2025, 1, 1)
+SCALE_FACTOR_SEED = 0
 
 # Pools de données
 CUSTOMERS_POOL = []
@@ -49,13 +80,28 @@ def create_connection(server, database, username, password):
     )
     return pyodbc.connect(connection_string)
 
+def scale_sizes(scale_factor):
+    """Tailles des pools et volumes par jour pour un scale factor donné."""
+    return {key: max(1, round(size * scale_factor)) for key, size in SCALE_FACTOR_SIZES.items()}
+
+def seed_random(seed, *parts):
+    """Graine de random et de Faker pour une partie du jeu (pool, partition).
+
+    Sans seed (None), rien ne change : génération aléatoire comme avant.
+    """
+    if seed is None:
+        return
+    key = ":".join(str(part) for part in (seed, *parts))
+    random.seed(key)
+    fake.seed_instance(key)
+
 def generate_customers(count=100):
     """Génère un pool de clients fictifs."""
     print(f"📝 Génération de {count} clients...")
     customers = []
     for _ in range(count):
         customers.append({
-            "customer_id": str(uuid.uuid4()),
+            "customer_id": new_uuid(),
             "name": fake.name(),
             "email": fake.email(),
             "address": fake.street_address(),
@@ -64,197 +110,558 @@ def generate_customers(count=100):
         })
     return customers
 
-def generate_products(count=100):
-    """Génère un pool de produits fictifs."""
+def generate_products(count=100, vendors=None):
+    """Génère un pool de produits fictifs, répartis entre les vendeurs s'il y en a."""
     print(f"📦 Génération de {count} produits...")
     products = []
     categories = ["Electronics", "Home", "Clothing", "Books", "Beauty", "Sports", "Toys"]
     
     for _ in range(count):
         products.append({
-            "product_id": str(uuid.uuid4()),
+            "product_id": new_uuid(),
             "name": fake.catch_phrase(),
-            "category": random.choice(categories)
+            "category": random.choice(categories),
+            "vendor_id": random.choice(vendors)["vendor_id"] if vendors else "SHOPNOW",
         })
     return products
 
+def generate_vendors(count):
+    """Génère un pool de vendeurs (marketplace)."""
+    print(f"🏪 Génération de {count} vendeurs...")
+    categories = ["electronics", "fashion", "home", "sports", "books", "toys", "food"]
+    vendors = []
+    for i in range(count):
+        vendor_id = f"VND{i:06d}"
+        vendors.append({
+            "vendor_id": vendor_id,
+            "vendor_name": fake.company(),
+            "vendor_category": random.choice(categories),
+            "vendor_email": f"contact@{vendor_id.lower()}.com",
+            "commission_rate": f"{random.uniform(10.0, 25.0):.2f}",
+        })
+    return vendors
+
+# Colonnes des dimensions, et tables temporaires de staging (tailles des paramètres)
+CUSTOMER_COLUMNS = ["customer_id", "name", "email", "address", "city", "country"]
+PRODUCT_COLUMNS = ["product_id", "name", "category", "vendor_id"]
+VENDOR_COLUMNS = ["vendor_id", "vendor_name", "vendor_category", "vendor_email", "commission_rate"]
+SEED_CUSTOMER_TABLE = """
+    CREATE TABLE #seed_customer (
+        customer_id VARCHAR(50) PRIMARY KEY,
+        name        NVARCHAR(255),
+        email       NVARCHAR(255),
+        address     NVARCHAR(500),
+        city        NVARCHAR(100),
+        country     NVARCHAR(100)
+    )
+"""
+SEED_CUSTOMER_INPUT_SIZES = [
+    (pyodbc.SQL_VARCHAR, 50, 0),
+    (pyodbc.SQL_WVARCHAR, 255, 0),
+    (pyodbc.SQL_WVARCHAR, 255, 0),
+    (pyodbc.SQL_WVARCHAR, 500, 0),
+    (pyodbc.SQL_WVARCHAR, 100, 0),
+    (pyodbc.SQL_WVARCHAR, 100, 0),
+]
+SEED_PRODUCT_TABLE = """
+    CREATE TABLE #seed_product (
+        product_id      NVARCHAR(50) PRIMARY KEY,
+        name            NVARCHAR(255) NOT NULL,
+        category        NVARCHAR(100) NOT NULL,
+        vendor_id       NVARCHAR(50) NOT NULL,
+        event_timestamp DATETIME2 NOT NULL
+    )
+"""
+SEED_PRODUCT_INPUT_SIZES = [
+    (pyodbc.SQL_WVARCHAR, 50, 0),
+    (pyodbc.SQL_WVARCHAR, 255, 0),
+    (pyodbc.SQL_WVARCHAR, 100, 0),
+    (pyodbc.SQL_WVARCHAR, 50, 0),
+    (pyodbc.SQL_TYPE_TIMESTAMP, 27, 7),
+]
+SEED_VENDOR_TABLE = """
+    CREATE TABLE #seed_vendor (
+        vendor_id       NVARCHAR(50) PRIMARY KEY,
+        vendor_name     NVARCHAR(255) NOT NULL,
+        vendor_category NVARCHAR(100),
+        vendor_email    NVARCHAR(255),
+        commission_rate NVARCHAR(20)
+    )
+"""
+SEED_VENDOR_INPUT_SIZES = [
+    (pyodbc.SQL_WVARCHAR, 50, 0),
+    (pyodbc.SQL_WVARCHAR, 255, 0),
+    (pyodbc.SQL_WVARCHAR, 100, 0),
+    (pyodbc.SQL_WVARCHAR, 255, 0),
+    (pyodbc.SQL_WVARCHAR, 20, 0),
+]
+
+def stage_records(conn, temp_table, create_sql, columns, input_sizes, rows):
+    """(Re)crée la table temporaire `temp_table` et y insère `rows` en un executemany."""
+    cursor = conn.cursor()
+    cursor.execute(f"IF OBJECT_ID('tempdb..{temp_table}') IS NOT NULL DROP TABLE {temp_table}")
+    cursor.execute(create_sql)
+    loader = BulkLoader(conn, temp_table, columns, max(len(rows), 1), input_sizes, commit=False)
+    for row in rows:
+        loader.add(row)
+    loader.flush()
+
 def insert_customers(conn, customers):
-    """Insère les clients dans dim_customer."""
+    """Insère les clients dans dim_customer : staging en masse puis un seul MERGE."""
     print(f"👥 Insertion de {len(customers)} clients dans dim_customer...")
+    stage_records(conn, "#seed_customer", SEED_CUSTOMER_TABLE, CUSTOMER_COLUMNS, SEED_CUSTOMER_INPUT_SIZES,
+                  [tuple(customer[c] for c in CUSTOMER_COLUMNS) for customer in customers])
     cursor = conn.cursor()
-    
-    for customer in customers:
-        cursor.execute("""
-            IF NOT EXISTS (SELECT 1 FROM dim_customer WHERE customer_id = ?)
-            INSERT INTO dim_customer (customer_id, name, email, address, city, country)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, 
-        customer["customer_id"],
-        customer["customer_id"],
-        customer["name"],
-        customer["email"],
-        customer["address"],
-        customer["city"],
-        customer["country"])
-    
+    # Les clients déjà présents sont conservés tels quels
+    cursor.execute("""
+        MERGE dim_customer AS target
+        USING #seed_customer AS source
+        ON target.customer_id = source.customer_id
+        WHEN NOT MATCHED BY TARGET THEN
+            INSERT (customer_id, name, email, address, city, country)
+            VALUES (source.customer_id, source.name, source.email, source.address, source.city, source.country);
+    """)
+    inserted = cursor.rowcount
+    cursor.execute("DROP TABLE #seed_customer")
     conn.commit()
-    print("✅ Clients insérés")
+    print(f"✅ Clients insérés ({inserted} nouveaux)")
 
 def insert_products(conn, products):
-    """Insère les produits dans stg_product ou dim_product selon la version du schéma."""
+    """Insère les produits dans stg_product ou dim_product selon la version du schéma.
+
+    Les produits passent d'abord en masse dans une table temporaire. Avec
+    stg_product, un seul INSERT ... SELECT les y verse : le trigger
+    tr_product_staging_process (donc sp_merge_product_scd2) s'exécute une
+    fois pour tout le lot, et non une fois par produit.
+    """
     cursor = conn.cursor()
     
     # Vérifier si stg_product existe (Marketplace migration 003)
     cursor.execute("SELECT 1 FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'stg_product'")
     has_stg_product = cursor.fetchone() is not None
     
+    event_timestamp = datetime.now()
+    stage_records(conn, "#seed_product", SEED_PRODUCT_TABLE, PRODUCT_COLUMNS + ["event_timestamp"],
+                  SEED_PRODUCT_INPUT_SIZES,
+                  [tuple(product[c] for c in PRODUCT_COLUMNS) + (event_timestamp,) for product in products])
+    
     if has_stg_product:
         print(f"📦 Insertion de {len(products)} produits dans stg_product...")
-        for product in products:
-            event_timestamp = datetime.now()
-            cursor.execute("""
-                INSERT INTO stg_product (product_id, name, category, event_timestamp)
-                VALUES (?, ?, ?, ?)
-            """,
-            product["product_id"],
-            product["name"],
-            product["category"],
-            event_timestamp)
-        print("✅ Produits insérés dans stg_product")
+        cursor.execute("""
+            INSERT INTO stg_product (product_id, name, category, vendor_id, event_timestamp)
+            SELECT product_id, name, category, vendor_id, event_timestamp FROM #seed_product
+        """)
+        print("✅ Produits insérés dans stg_product (SCD2 appliqué en un lot)")
     else:
         print(f"📦 Insertion de {len(products)} produits dans dim_product (fallback)...")
-        for product in products:
-            cursor.execute("""
-                IF NOT EXISTS (SELECT 1 FROM dim_product WHERE product_id = ?)
-                INSERT INTO dim_product (product_id, name, category)
-                VALUES (?, ?, ?)
-            """,
-            product["product_id"],
-            product["product_id"],
-            product["name"],
-            product["category"])
-        print("✅ Produits insérés dans dim_product")
+        cursor.execute("""
+            MERGE dim_product AS target
+            USING #seed_product AS source
+            ON target.product_id = source.product_id
+            WHEN NOT MATCHED BY TARGET THEN
+                INSERT (product_id, name, category)
+                VALUES (source.product_id, source.name, source.category);
+        """)
+        print(f"✅ Produits insérés dans dim_product ({cursor.rowcount} nouveaux)")
     
+    cursor.execute("DROP TABLE #seed_product")
     conn.commit()
 
-def generate_historical_orders(conn, customers, products, days, orders_per_day):
-    """Génère des commandes historiques."""
-    print(f"🛒 Génération de {days * orders_per_day} commandes historiques...")
+def has_table(conn, table):
     cursor = conn.cursor()
-    
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-    
-    total_orders = 0
-    for day in range(days):
-        current_date = start_date + timedelta(days=day)
+    cursor.execute("SELECT 1 FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = ?", table)
+    return cursor.fetchone() is not None
+
+def insert_vendors(conn, vendors):
+    """Insère les vendeurs dans dim_vendor (staging en masse puis un seul MERGE).
+
+    Retourne {vendor_id: vendor_key} des versions courantes, pour fact_stock.
+    """
+    print(f"🏪 Insertion de {len(vendors)} vendeurs dans dim_vendor...")
+    stage_records(conn, "#seed_vendor", SEED_VENDOR_TABLE, VENDOR_COLUMNS, SEED_VENDOR_INPUT_SIZES,
+                  [tuple(vendor[c] for c in VENDOR_COLUMNS) for vendor in vendors])
+    cursor = conn.cursor()
+    cursor.execute("""
+        MERGE dim_vendor AS target
+        USING #seed_vendor AS source
+        ON target.vendor_id = source.vendor_id AND target.is_current = 1
+        WHEN NOT MATCHED BY TARGET THEN
+            INSERT (vendor_id, vendor_name, vendor_status, vendor_category, vendor_email,
+                    commission_rate, valid_from, is_current)
+            VALUES (source.vendor_id, source.vendor_name, 'active', source.vendor_category, source.vendor_email,
+                    CAST(source.commission_rate AS DECIMAL(5,2)), GETDATE(), 1);
+    """)
+    inserted = cursor.rowcount
+    cursor.execute("""
+        SELECT v.vendor_id, v.vendor_key
+        FROM dim_vendor v JOIN #seed_vendor s ON s.vendor_id = v.vendor_id
+        WHERE v.is_current = 1
+    """)
+    vendor_keys = dict(cursor.fetchall())
+    cursor.execute("DROP TABLE #seed_vendor")
+    conn.commit()
+    print(f"✅ Vendeurs insérés ({inserted} nouveaux)")
+    return vendor_keys
+
+def new_uuid():
+    """UUID v4 tiré du générateur random, formaté directement (2x plus rapide que uuid.UUID)."""
+    h = "%032x" % random.getrandbits(128)
+    return f"{h[:8]}-{h[8:12]}-4{h[13:16]}-{'89ab'[int(h[16], 16) & 3]}{h[17:20]}-{h[20:]}"
+
+class BulkLoader:
+    """Insertion en masse dans une table, par lots de `batch_size` lignes.
+
+    Chaque lot part en un seul aller-retour grâce à fast_executemany (les
+    paramètres sont envoyés sous forme de tableaux). Avec commit=True chaque
+    lot est commité ; sinon le commit revient à l'appelant (une partition
+    entière dans une seule transaction). Le débit (lignes/s) est affiché au
+    fil de l'eau et à la fin.
+    """
+
+    def __init__(self, conn, table, columns, batch_size=BATCH_SIZE, input_sizes=None,
+                 report_every=REPORT_EVERY, commit=True, label=""):
+        self.conn = conn
+        self.table = table
+        self.cursor = conn.cursor()
+        self.cursor.fast_executemany = True
+        self.input_sizes = input_sizes
+        self.sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        self.batch_size = batch_size
+        self.report_every = report_every
+        self.commit = commit
+        self.label = label
+        self.rows = []
+        self.total = 0
+        self.insert_seconds = 0.0
+        self.start = time.perf_counter()
+        self.last_report = self.start
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Envoie le lot en cours en un seul executemany."""
+        if not self.rows:
+            return
+        started = time.perf_counter()
+        if self.input_sizes:
+            self.cursor.setinputsizes(self.input_sizes)
+        self.cursor.executemany(self.sql, self.rows)
+        if self.commit:
+            self.conn.commit()
+        now = time.perf_counter()
+        self.insert_seconds += now - started
+        self.total += len(self.rows)
+        self.rows = []
+        if now - self.last_report >= self.report_every:
+            print(f"  {self.label}✓ {self.total:,} lignes insérées dans {self.table} "
+                  f"({self.total / (now - self.start):,.0f} lignes/s)", flush=True)
+            self.last_report = now
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def close(self):
+        self.flush()
+        elapsed = self.elapsed
+        rate = self.total / elapsed if elapsed else 0
+        db_rate = self.total / self.insert_seconds if self.insert_seconds else 0
+        print(f"{self.label}✅ {self.total:,} lignes insérées dans {self.table} en {elapsed:.1f}s "
+              f"({rate:,.0f} lignes/s, {db_rate:,.0f} lignes/s côté insertion)", flush=True)
+
+def order_rows(day_start, orders, customers, products):
+    """Lignes fact_order (une par item) de `orders` commandes sur la journée `day_start`."""
+    statuses = ["completed", "completed", "completed", "pending", "cancelled"]
+    for _ in range(orders):
+        # Sélectionner un client et des produits aléatoires
+        customer_id = random.choice(customers)["customer_id"]
+        # Au plus autant d'items que de produits (SF0.01 : moins de 5 produits)
+        selected_products = random.sample(products, min(random.randint(1, 5), len(products)))
+        order_id = new_uuid()
+        # Ajouter un peu de variation dans l'heure
+        order_time = day_start + timedelta(seconds=random.randrange(86400))
         
-        for _ in range(orders_per_day):
-            # Sélectionner un client et des produits aléatoires
-            customer = random.choice(customers)
-            num_items = random.randint(1, 5)
-            selected_products = random.sample(products, num_items)
-            
-            order_id = str(uuid.uuid4())
-            
-            # Ajouter un peu de variation dans l'heure
-            order_time = current_date + timedelta(
-                hours=random.randint(0, 23),
-                minutes=random.randint(0, 59),
-                seconds=random.randint(0, 59)
-            )
-            
-            # Insérer chaque item de la commande
-            for product in selected_products:
-                quantity = random.randint(1, 3)
-                unit_price = round(random.uniform(10, 500), 2)
-                status = random.choice(["completed", "completed", "completed", "pending", "cancelled"])
-                
-                cursor.execute("""
-                    INSERT INTO fact_order 
-                    (order_id, product_id, customer_id, quantity, unit_price, status, order_timestamp)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
+        # Une ligne par item de la commande
+        for product in selected_products:
+            yield (
                 order_id,
                 product["product_id"],
-                customer["customer_id"],
-                quantity,
-                unit_price,
-                status,
-                order_time)
-            
-            total_orders += 1
-            
-            # Commit par batch de 100 commandes
-            if total_orders % 100 == 0:
-                conn.commit()
-                print(f"  ✓ {total_orders} commandes insérées...")
-    
-    conn.commit()
-    print(f"✅ {total_orders} commandes historiques insérées")
+                customer_id,
+                random.randint(1, 3),
+                round(random.uniform(10, 500), 2),
+                random.choice(statuses),
+                order_time,
+            )
 
-def generate_historical_clickstream(conn, days, clicks_per_day):
-    """Génère des événements clickstream historiques."""
-    print(f"🖱️  Génération de {days * clicks_per_day} événements clickstream...")
-    cursor = conn.cursor()
-    
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-    
-    event_types = ["view_page", "view_page", "view_page", "add_to_cart", "checkout_start"]
-    urls = [
-        "/",
-        "/products",
-        "/category/electronics",
-        "/category/home",
-        "/category/clothing",
-        "/cart",
-        "/checkout",
-        "/product/123",
-        "/product/456"
-    ]
-    
-    total_events = 0
-    for day in range(days):
-        current_date = start_date + timedelta(days=day)
+CLICKSTREAM_EVENT_TYPES = ["view_page", "view_page", "view_page", "add_to_cart", "checkout_start"]
+CLICKSTREAM_URLS = [
+    "/",
+    "/products",
+    "/category/electronics",
+    "/category/home",
+    "/category/clothing",
+    "/cart",
+    "/checkout",
+    "/product/123",
+    "/product/456"
+]
+
+def clickstream_rows(day_start, clicks, customers):
+    """Lignes fact_clickstream de `clicks` événements sur la journée `day_start`.
+
+    user_id est un client du pool (30 % de visiteurs anonymes, user_id NULL).
+    """
+    for _ in range(clicks):
+        event_time = day_start + timedelta(seconds=random.randrange(86400))
+        event_type = random.choice(CLICKSTREAM_EVENT_TYPES)
         
-        for _ in range(clicks_per_day):
-            event_time = current_date + timedelta(
-                hours=random.randint(0, 23),
-                minutes=random.randint(0, 59),
-                seconds=random.randint(0, 59)
-            )
-            
-            event_type = random.choice(event_types)
-            url = random.choice(urls)
-            
-            # Ajuster l'URL selon le type d'événement
-            if event_type == "add_to_cart":
-                url = "/cart"
-            elif event_type == "checkout_start":
-                url = "/checkout"
-            
-            cursor.execute("""
-                INSERT INTO fact_clickstream 
-                (event_id, session_id, user_id, url, event_type, event_timestamp)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """,
-            str(uuid.uuid4()),
-            str(uuid.uuid4()),
-            str(uuid.uuid4()) if random.random() > 0.3 else None,
+        # Ajuster l'URL selon le type d'événement
+        if event_type == "add_to_cart":
+            url = "/cart"
+        elif event_type == "checkout_start":
+            url = "/checkout"
+        else:
+            url = random.choice(CLICKSTREAM_URLS)
+        
+        yield (
+            new_uuid(),
+            new_uuid(),
+            random.choice(customers)["customer_id"] if random.random() > 0.3 else None,
             url,
             event_type,
-            event_time)
-            
-            total_events += 1
-            
-            # Commit par batch de 500 événements
-            if total_events % 500 == 0:
-                conn.commit()
-                print(f"  ✓ {total_events} événements insérés...")
-    
+            event_time,
+        )
+
+STOCK_STATUSES = ("out_of_stock", "low_stock", "in_stock")
+WAREHOUSES = ["Paris", "Lyon", "Lille", "Marseille", "Bordeaux", "Toulouse", "Nantes", "Strasbourg"]
+
+def stock_rows(day_start, products):
+    """Lignes fact_stock : un relevé de fin de journée par produit, chez son vendeur.
+
+    La première colonne est le vendor_id ; insert_partition le remplace par le
+    vendor_key de dim_vendor (inconnu hors base, avec --generate-only).
+    """
+    snapshot_time = day_start + timedelta(hours=23, minutes=59)
+    for product in products:
+        product_id = product["product_id"]
+        # Seuil et entrepôt fixes par produit, le niveau varie d'un jour à l'autre
+        threshold = 5 + int(product_id[:2], 16) % 26
+        level = max(0, int(random.gauss(3 * threshold, 2 * threshold)))
+        status = STOCK_STATUSES[(level > 0) + (level > threshold)]
+        yield (
+            product["vendor_id"],
+            product_id,
+            level,
+            WAREHOUSES[int(product_id[2:4], 16) % len(WAREHOUSES)],
+            threshold,
+            status,
+            snapshot_time,
+        )
+
+# Taille max explicite pour url (NVARCHAR(MAX)) : sans elle, fast_executemany
+# traite la colonne comme un LOB et retombe sur un envoi ligne à ligne
+CLICKSTREAM_INPUT_SIZES = [
+    (pyodbc.SQL_VARCHAR, 50, 0),
+    (pyodbc.SQL_VARCHAR, 50, 0),
+    (pyodbc.SQL_VARCHAR, 50, 0),
+    (pyodbc.SQL_WVARCHAR, 2000, 0),
+    (pyodbc.SQL_WVARCHAR, 50, 0),
+    (pyodbc.SQL_TYPE_TIMESTAMP, 23, 3),
+]
+
+# Tables de faits partitionnées par jour : colonnes et tailles des paramètres
+FACT_TABLES = {
+    "fact_order": (["order_id", "product_id", "customer_id", "quantity", "unit_price", "status", "order_timestamp"],
+                   None),
+    "fact_clickstream": (["event_id", "session_id", "user_id", "url", "event_type", "event_timestamp"],
+                         CLICKSTREAM_INPUT_SIZES),
+    "fact_stock": (["vendor_key", "product_id", "stock_level", "warehouse_location", "alert_threshold",
+                    "stock_status", "snapshot_date"], None),
+}
+# Tables de faits générées par défaut ; fact_stock s'ajoute quand il y a des vendeurs (--scale-factor)
+DEFAULT_FACT_TABLES = ["fact_order", "fact_clickstream"]
+# Dans les fichiers, fact_stock garde le vendor_id (le vendor_key n'existe qu'en base)
+FILE_COLUMNS = {
+    "fact_stock": ["vendor_id"] + FACT_TABLES["fact_stock"][0][1:],
+}
+# Types des colonnes dans les fichiers de seed (seed_files.py)
+FACT_COLUMN_TYPES = {
+    "fact_order": ["str", "str", "str", "int", "float", "str", "datetime"],
+    "fact_clickstream": ["str", "str", "str", "str", "str", "datetime"],
+    "fact_stock": ["str", "str", "int", "str", "int", "str", "datetime"],
+}
+
+# ============================================================================
+# Partitions et checkpoints
+# ============================================================================
+
+# Une ligne par partition (table, jour) terminée, insérée dans la même
+# transaction que ses données : une partition est soit complète et notée,
+# soit absente (rollback), jamais à moitié insérée.
+CHECKPOINT_TABLE_SQL = """
+    IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'seed_checkpoint')
+    CREATE TABLE seed_checkpoint (
+        run_name        NVARCHAR(100) NOT NULL,
+        table_name      NVARCHAR(100) NOT NULL,
+        partition_date  DATE NOT NULL,
+        row_count       INT NOT NULL,
+        seconds         FLOAT NOT NULL,
+        finished_at     DATETIME2 NOT NULL DEFAULT GETDATE(),
+        PRIMARY KEY (run_name, table_name, partition_date)
+    )
+"""
+
+def ensure_checkpoint_table(conn):
+    """Crée la table seed_checkpoint si besoin."""
+    conn.cursor().execute(CHECKPOINT_TABLE_SQL)
     conn.commit()
-    print(f"✅ {total_events} événements clickstream insérés")
+
+def finished_partitions(conn, run_name):
+    """Partitions (table, jour) déjà terminées pour ce run."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT table_name, partition_date FROM seed_checkpoint WHERE run_name = ?", run_name)
+    return {(table, str(day)) for table, day in cursor.fetchall()}
+
+def partition_days(days, end_date):
+    """Les `days` jours qui précèdent end_date (exclu), du plus ancien au plus récent."""
+    return [end_date - timedelta(days=days - i) for i in range(days)]
+
+# Contexte d'un worker : connexion, pools et options, initialisé une fois par processus
+_worker = {}
+
+def init_worker(connection, customers, products, settings):
+    """Initialisation d'un processus du pool : sa propre connexion (sauf --generate-only) et ses pools."""
+    # Les processus forkés héritent du même état random : sans re-seed, mêmes UUID partout
+    random.seed()
+    _worker.update(
+        connection=connection,
+        conn=create_connection(*connection) if connection else None,
+        customers=customers,
+        products=products,
+        name=f"[w{os.getpid()}] ",
+        **settings,
+    )
+
+def partition_rows(table, day):
+    """Lignes de la partition : générées, ou relues depuis les fichiers (--load-from)."""
+    if _worker["load_from"]:
+        path = seed_files.partition_path(_worker["load_from"], table, day, _worker["format"])
+        return seed_files.read_rows(path, FACT_COLUMN_TYPES[table], _worker["batch_size"])
+    # Une graine par partition : mêmes lignes quel que soit le worker qui la traite.
+    # Le scale factor en fait partie : deux SF chargés dans la même base n'ont pas les mêmes event_id
+    scale = (f"sf{_worker['scale_factor']:g}",) if _worker["scale_factor"] else ()
+    seed_random(_worker["seed"], *scale, table, day)
+    day_start = datetime.combine(day, datetime.min.time())
+    if table == "fact_order":
+        return order_rows(day_start, _worker["orders_per_day"], _worker["customers"], _worker["products"])
+    if table == "fact_stock":
+        return stock_rows(day_start, _worker["products"])
+    return clickstream_rows(day_start, _worker["clicks_per_day"], _worker["customers"])
+
+def write_partition(table, day, label):
+    """Écrit la partition dans son fichier (--generate-only) ; le fichier n'existe qu'une fois complet."""
+    columns = FILE_COLUMNS.get(table, FACT_TABLES[table][0])
+    path = seed_files.partition_path(_worker["output"], table, day, _worker["format"])
+    writer = seed_files.PartitionWriter(path, columns, FACT_COLUMN_TYPES[table], _worker["format"],
+                                        _worker["batch_size"], label)
+    try:
+        for row in partition_rows(table, day):
+            writer.add(row)
+        writer.close()
+    except Exception:
+        writer.discard()
+        raise
+    return writer
+
+def insert_partition(table, day, label):
+    """Insère la partition dans une transaction, checkpoint compris."""
+    conn = _worker["conn"]
+    columns, input_sizes = FACT_TABLES[table]
+    try:
+        loader = BulkLoader(conn, table, columns, _worker["batch_size"], input_sizes, commit=False, label=label)
+        rows = partition_rows(table, day)
+        if table == "fact_stock":
+            vendor_keys = _worker["vendor_keys"]
+            rows = ((vendor_keys[row[0]],) + tuple(row[1:]) for row in rows)
+        for row in rows:
+            loader.add(row)
+        loader.flush()
+        conn.cursor().execute("""
+            INSERT INTO seed_checkpoint (run_name, table_name, partition_date, row_count, seconds)
+            VALUES (?, ?, ?, ?, ?)
+        """, _worker["run_name"], table, day, loader.total, loader.elapsed)
+        conn.commit()
+    except Exception:
+        # Toute erreur (SQL, ou vendor_id inconnu de vendor_keys) : rien de la partition ne reste
+        try:
+            conn.rollback()
+        except pyodbc.Error:
+            # Connexion perdue : une nouvelle pour les partitions suivantes de ce worker
+            _worker["conn"] = create_connection(*_worker["connection"])
+        raise
+    return loader
+
+def seed_partition(table, day):
+    """Traite la partition (table, jour) : vers SQL Server, ou vers un fichier avec --generate-only.
+
+    Retourne (table, jour, lignes, secondes, erreur).
+    """
+    label = f"{_worker['name']}{day} "
+    try:
+        sink = write_partition(table, day, label) if _worker["output"] else insert_partition(table, day, label)
+    except Exception as e:
+        # Partition en échec, pas le worker : les autres continuent, la reprise la refera
+        error = f"{type(e).__name__}: {e}"
+        print(f"{label}❌ {table}: {error}", flush=True)
+        return table, str(day), 0, 0.0, error
+    elapsed = sink.elapsed
+    print(f"{label}✅ {table}: {sink.total:,} lignes en {elapsed:.1f}s "
+          f"({sink.total / elapsed if elapsed else 0:,.0f} lignes/s)", flush=True)
+    return table, str(day), sink.total, elapsed, None
+
+def seed_facts(connection, customers, products, partitions, workers, settings):
+    """Traite les partitions, en parallèle sur `workers` processus (une connexion chacun).
+
+    Retourne la liste des résultats de seed_partition.
+    """
+    if workers <= 1:
+        init_worker(connection, customers, products, settings)
+        return [seed_partition(table, day) for table, day in partitions]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(connection, customers, products, settings)) as pool:
+        futures = [pool.submit(seed_partition, table, day) for table, day in partitions]
+        for future in as_completed(futures):
+            results.append(future.result())
+    return results
+
+def report_partitions(results, elapsed):
+    """Débit global et par table des partitions insérées."""
+    done = [r for r in results if r[4] is None]
+    failed = [r for r in results if r[4] is not None]
+    total = sum(r[2] for r in done)
+    print(f"\n⚡ {len(done)} partitions, {total:,} lignes en {elapsed:.1f}s ({total / elapsed if elapsed else 0:,.0f} lignes/s au total)")
+    for table in sorted({r[0] for r in done}, key=list(FACT_TABLES).index):
+        rows = [r for r in done if r[0] == table]
+        if rows:
+            seconds = sum(r[3] for r in rows)
+            print(f"  {table:.<30} {sum(r[2] for r in rows):>12,} lignes, "
+                  f"{sum(r[2] for r in rows) / seconds if seconds else 0:,.0f} lignes/s par worker")
+    if failed:
+        print(f"❌ {len(failed)} partition(s) en échec (annulées, relancez la même commande pour les reprendre) :")
+        for table, day, _, _, error in sorted(failed):
+            print(f"  {table} {day}: {error}")
+    return not failed
 
 def show_statistics(conn):
     """Affiche les statistiques des données insérées."""
@@ -270,6 +677,9 @@ def show_statistics(conn):
         ("fact_order", "Commandes (lignes)"),
         ("fact_clickstream", "Événements clickstream")
     ]
+    # Tables marketplace (migration 001)
+    if has_table(conn, "dim_vendor"):
+        tables += [("dim_vendor", "Vendeurs"), ("fact_stock", "Relevés de stock")]
     
     for table, label in tables:
         cursor.execute(f"SELECT COUNT(*) FROM {table}")
@@ -303,18 +713,8 @@ def show_statistics(conn):
     
     print("=" * 60)
 
-def main():
-    parser = argparse.ArgumentParser(description="Génère des données historiques pour le DWH")
-    parser.add_argument("--server", help="SQL Server FQDN")
-    parser.add_argument("--database", help="Nom de la base de données")
-    parser.add_argument("--username", help="Username SQL")
-    parser.add_argument("--password", help="Password SQL")
-    parser.add_argument("--days", type=int, default=DAYS_OF_HISTORY, help="Nombre de jours d'historique")
-    parser.add_argument("--orders-per-day", type=int, default=ORDERS_PER_DAY, help="Commandes par jour")
-    parser.add_argument("--clicks-per-day", type=int, default=CLICKS_PER_DAY, help="Clics par jour")
-    
-    args = parser.parse_args()
-    
+def connection_settings(args):
+    """(server, database, username, password) depuis les arguments ou le .env ; quitte s'il en manque."""
     # Utiliser les variables d'environnement si les arguments ne sont pas fournis
     server = args.server or os.getenv("SQL_SERVER_FQDN")
     database = args.database or os.getenv("SQL_DATABASE_NAME", "dwh-shopnow")
@@ -330,38 +730,222 @@ def main():
         print("SQL_ADMIN_LOGIN=dwhadmin")
         print("SQL_ADMIN_PASSWORD=YourPassword123!")
         exit(1)
+    return server, database, username, password
+
+def resolve_sizes(args):
+    """Tailles des pools et volumes par jour : --scale-factor, ou les options séparées."""
+    if args.scale_factor:
+        return scale_sizes(args.scale_factor)
+    return {
+        "customers": 100,
+        "products": 100,
+        "vendors": 0,
+        "orders_per_day": args.orders_per_day or ORDERS_PER_DAY,
+        "clicks_per_day": args.clicks_per_day or CLICKS_PER_DAY,
+    }
+
+def generate_pools(sizes, seed):
+    """Pools clients, produits et vendeurs ; chacun a sa graine, indépendante des autres tailles."""
+    seed_random(seed, "vendors")
+    vendors = generate_vendors(sizes["vendors"]) if sizes["vendors"] else []
+    seed_random(seed, "customers")
+    customers = generate_customers(sizes["customers"])
+    seed_random(seed, "products")
+    products = generate_products(sizes["products"], vendors)
+    return customers, products, vendors
+
+def generate_files(args, sizes, tables, settings):
+    """--generate-only : écrit dimensions et partitions dans des fichiers, sans base de données."""
+    output, fmt = args.generate_only, args.format
+    days = partition_days(args.days, args.end_date)
+    print(f"📁 Génération hors ligne dans {output} ({fmt}), {args.days} jours ({days[0]} → {days[-1]})")
+    
+    # Les pools font partie du jeu : on les réutilise à la reprise pour garder des partitions cohérentes
+    customers_path = Path(output) / f"dim_customer.{fmt}"
+    products_path = Path(output) / f"products.{fmt}"
+    vendors_path = Path(output) / f"dim_vendor.{fmt}"
+    if customers_path.exists() and products_path.exists():
+        customers = seed_files.read_records(customers_path, CUSTOMER_COLUMNS)
+        products = seed_files.read_records(products_path, PRODUCT_COLUMNS)
+        vendors = seed_files.read_records(vendors_path, VENDOR_COLUMNS) if vendors_path.exists() else []
+        print(f"♻️  Pools existants réutilisés ({len(customers)} clients, {len(products)} produits, "
+              f"{len(vendors)} vendeurs)")
+    else:
+        customers, products, vendors = generate_pools(sizes, settings["seed"])
+        if vendors:
+            seed_files.write_records(vendors_path, vendors, VENDOR_COLUMNS, fmt)
+        seed_files.write_records(customers_path, customers, CUSTOMER_COLUMNS, fmt)
+        seed_files.write_records(products_path, products, PRODUCT_COLUMNS, fmt)
+    seed_files.write_manifest(output, {
+        "format": fmt,
+        "scale_factor": args.scale_factor,
+        "seed": settings["seed"],
+        "end_date": str(args.end_date),
+        "days": [str(day) for day in days],
+        "sizes": sizes,
+        "tables": tables,
+    })
+    
+    # Un fichier présent est une partition terminée
+    partitions = [(table, day) for day in days for table in tables
+                  if not seed_files.partition_path(output, table, day, fmt).exists()]
+    if len(partitions) < len(days) * len(tables):
+        print(f"♻️  Reprise : {len(days) * len(tables) - len(partitions)} partitions déjà écrites, "
+              f"{len(partitions)} restantes")
+    print(f"\n🧩 {len(partitions)} partitions sur {args.workers} worker(s)...")
+    start = time.perf_counter()
+    results = seed_facts(None, customers, products, partitions, args.workers, settings)
+    return report_partitions(results, time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère des données historiques pour le DWH")
+    parser.add_argument("--server", help="SQL Server FQDN")
+    parser.add_argument("--database", help="Nom de la base de données")
+    parser.add_argument("--username", help="Username SQL")
+    parser.add_argument("--password", help="Password SQL")
+    parser.add_argument("--days", type=int, default=DAYS_OF_HISTORY, help="Nombre de jours d'historique")
+    parser.add_argument("--end-date", type=date.fromisoformat,
+                        help="Jour suivant le dernier jour généré (AAAA-MM-JJ, défaut : aujourd'hui, "
+                             f"{SCALE_FACTOR_END_DATE} avec --scale-factor)")
+    parser.add_argument("--scale-factor", type=float,
+                        help="Dimensionne tout le jeu (SF1 : " + ", ".join(f"{v} {k}" for k, v in SCALE_FACTOR_SIZES.items())
+                             + ") et le rend reproductible")
+    parser.add_argument("--seed", type=int,
+                        help=f"Graine de génération (défaut : aléatoire, {SCALE_FACTOR_SEED} avec --scale-factor)")
+    parser.add_argument("--orders-per-day", type=int, help=f"Commandes par jour (défaut : {ORDERS_PER_DAY})")
+    parser.add_argument("--clicks-per-day", type=int, help=f"Clics par jour (défaut : {CLICKS_PER_DAY})")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Lignes par lot d'insertion")
+    parser.add_argument("--workers", type=int, default=1, help="Processus en parallèle (une connexion chacun)")
+    parser.add_argument("--run", help="Nom du run dans seed_checkpoint (reprise ; défaut : default, ou sf<SF>)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--generate-only", metavar="DIR", help="Écrit le jeu dans DIR (un fichier par table et jour), sans base")
+    mode.add_argument("--load-from", metavar="DIR", help="Charge un jeu écrit par --generate-only au lieu de générer")
+    parser.add_argument("--format", choices=seed_files.FORMATS, default="parquet", help="Format des fichiers (--generate-only)")
+    parser.add_argument("--duckdb", metavar="FICHIER", help="Avec --load-from : charge dans cette base DuckDB au lieu de SQL Server")
+    
+    args = parser.parse_args()
+    if args.duckdb and not args.load_from:
+        parser.error("--duckdb s'utilise avec --load-from")
+    if args.scale_factor is not None:
+        if args.scale_factor <= 0:
+            parser.error("--scale-factor doit être positif")
+        if args.orders_per_day or args.clicks_per_day:
+            parser.error("--scale-factor fixe déjà --orders-per-day et --clicks-per-day")
+        args.end_date = args.end_date or SCALE_FACTOR_END_DATE
+        args.seed = SCALE_FACTOR_SEED if args.seed is None else args.seed
+        args.run = args.run or f"sf{args.scale_factor:g}"
+    args.end_date = args.end_date or date.today()
+    args.run = args.run or "default"
+    
+    sizes = resolve_sizes(args)
+    tables = DEFAULT_FACT_TABLES + (["fact_stock"] if sizes["vendors"] else [])
+    settings = {
+        "orders_per_day": sizes["orders_per_day"],
+        "clicks_per_day": sizes["clicks_per_day"],
+        "batch_size": args.batch_size,
+        "run_name": args.run,
+        "seed": args.seed,
+        "scale_factor": args.scale_factor,
+        "output": args.generate_only,
+        "load_from": args.load_from,
+        "format": args.format,
+        "vendor_keys": {},
+    }
+    
+    if args.generate_only:
+        ok = generate_files(args, sizes, tables, settings)
+        exit(0 if ok else 1)
+    
+    if args.load_from:
+        manifest = seed_files.read_manifest(args.load_from)
+        settings["format"] = manifest["format"]
+        tables = manifest["tables"]
+        if args.duckdb:
+            seed_files.load_duckdb(args.load_from, args.duckdb, manifest["format"], tables)
+            return
+        # Les partitions sont celles présentes sur disque, pas --days / --end-date
+        days_by_table = {table: seed_files.list_partitions(args.load_from, table, manifest["format"])
+                         for table in tables}
+        days = sorted(set().union(*days_by_table.values()))
+        if not days:
+            print(f"❌ Aucune partition dans {args.load_from}")
+            exit(1)
+    else:
+        days = partition_days(args.days, args.end_date)
+    
+    server, database, username, password = connection_settings(args)
     
     print("🚀 Génération de données historiques pour le Data Warehouse")
     print("=" * 60)
     print(f"Serveur: {server}")
     print(f"Base de données: {database}")
-    print(f"Période: {args.days} jours")
-    print(f"Commandes/jour: {args.orders_per_day}")
-    print(f"Clics/jour: {args.clicks_per_day}")
+    print(f"Période: {len(days)} jours ({days[0]} → {days[-1]})")
+    if args.load_from:
+        print(f"Source: {args.load_from} ({settings['format']})")
+    else:
+        if args.scale_factor:
+            print(f"Scale factor: {args.scale_factor:g} (seed {args.seed}) : {sizes['customers']} clients, "
+                  f"{sizes['products']} produits, {sizes['vendors']} vendeurs")
+        print(f"Commandes/jour: {sizes['orders_per_day']}")
+        print(f"Clics/jour: {sizes['clicks_per_day']}")
+    print(f"Lot d'insertion: {args.batch_size} lignes")
+    print(f"Workers: {args.workers}, run: {args.run}")
     print("=" * 60)
     
     # Connexion
     print("\n🔌 Connexion à la base de données...")
-    conn = create_connection(server, database, username, password)
+    connection = (server, database, username, password)
+    conn = create_connection(*connection)
     print("✅ Connecté")
     
-    # Générer les pools
-    global CUSTOMERS_POOL, PRODUCTS_POOL
-    CUSTOMERS_POOL = generate_customers(100)
-    PRODUCTS_POOL = generate_products(100)
+    if "fact_stock" in tables and not (has_table(conn, "dim_vendor") and has_table(conn, "fact_stock")):
+        print("⚠️  dim_vendor / fact_stock absents (migration 001) : vendeurs et stock ignorés")
+        tables = [table for table in tables if table != "fact_stock"]
     
-    # Insérer les dimensions
-    insert_customers(conn, CUSTOMERS_POOL)
-    insert_products(conn, PRODUCTS_POOL)
+    ensure_checkpoint_table(conn)
+    done = finished_partitions(conn, args.run)
+    if args.load_from:
+        candidates = [(table, day) for day in days for table in tables if day in days_by_table[table]]
+    else:
+        candidates = [(table, day) for day in days for table in tables]
+    partitions = [(table, day) for table, day in candidates if (table, str(day)) not in done]
+    if len(partitions) < len(candidates):
+        print(f"♻️  Reprise du run '{args.run}' : {len(candidates) - len(partitions)} partitions déjà terminées, "
+              f"{len(partitions)} restantes")
     
-    # Générer les faits historiques
-    generate_historical_orders(conn, CUSTOMERS_POOL, PRODUCTS_POOL, args.days, args.orders_per_day)
-    generate_historical_clickstream(conn, args.days, args.clicks_per_day)
+    if partitions:
+        # Générer les pools (ou les relire depuis les fichiers)
+        global CUSTOMERS_POOL, PRODUCTS_POOL
+        if args.load_from:
+            fmt = settings["format"]
+            CUSTOMERS_POOL = seed_files.read_records(Path(args.load_from) / f"dim_customer.{fmt}", CUSTOMER_COLUMNS)
+            PRODUCTS_POOL = seed_files.read_records(Path(args.load_from) / f"products.{fmt}", PRODUCT_COLUMNS)
+            vendors_path = Path(args.load_from) / f"dim_vendor.{fmt}"
+            vendors = seed_files.read_records(vendors_path, VENDOR_COLUMNS) if vendors_path.exists() else []
+        else:
+            CUSTOMERS_POOL, PRODUCTS_POOL, vendors = generate_pools(sizes, args.seed)
+        
+        # Insérer les dimensions
+        if vendors and "fact_stock" in tables:
+            settings["vendor_keys"] = insert_vendors(conn, vendors)
+        insert_customers(conn, CUSTOMERS_POOL)
+        insert_products(conn, PRODUCTS_POOL)
+        
+        # Insérer les faits historiques, une partition (table, jour) par tâche
+        print(f"\n🧩 {len(partitions)} partitions sur {args.workers} worker(s)...")
+        start = time.perf_counter()
+        results = seed_facts(connection, CUSTOMERS_POOL, PRODUCTS_POOL, partitions, args.workers, settings)
+        ok = report_partitions(results, time.perf_counter() - start)
+    else:
+        print("✅ Toutes les partitions sont déjà terminées")
+        ok = True
     
     # Afficher les stats
     show_statistics(conn)
     
     conn.close()
+    if not ok:
+        exit(1)
     print("\n✅ Terminé!")
 
 if __name__ == "__main__":
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Seed SCD2 History
+=================
+
+Generate deep SCD Type 2 version chains for dim_vendor and dim_product and
+bulk-load them directly into the dimensions (no staging table, no merge
+procedure), to benchmark as-of lookups and index choices on histories of
+millions of rows.
+
+Each entity gets --versions versions spread over the last --days days:
+change dates are random points in the window, each version is valid from
+its change date to the next one (valid_to = next valid_from, the last one
+is current with valid_to NULL). Attributes drift between versions:
+commission rates random-walk, statuses move through pending / active /
+suspended, and products occasionally get renamed, recategorised or moved
+to another vendor. The current version of every vendor is inactive: the
+producers (vendor_cache.py, stock.py) only use active current vendors, so
+they never send orders or stock for a synthetic vendor.
+
+--scale-factor takes the vendor and product counts of seed_historical_data.py
+at the same scale factor, and makes the history reproducible (fixed seed and
+window ending on the same day).
+
+Entity ids start with --prefix (default HIST) so the history never collides
+with streamed or seeded data; --replace deletes a previous history first,
+along with the fact rows that reference its vendors.
+
+Usage:
+    uv run --directory scripts python seed_scd2_history.py --vendors 10000 --products 200000 --versions 10
+    uv run --directory scripts python seed_scd2_history.py --products 1000000 --versions 20 --replace --lookups 2000
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from faker import Faker
+
+from seed_historical_data import (BATCH_SIZE, SCALE_FACTOR_END_DATE, SCALE_FACTOR_SEED, BulkLoader,
+                                  connection_settings, create_connection, scale_sizes)
+
+VENDOR_COLUMNS = [
+    "vendor_id", "vendor_name", "vendor_status", "vendor_category", "vendor_email",
+    "vendor_phone", "commission_rate", "valid_from", "valid_to", "is_current",
+]
+PRODUCT_COLUMNS = ["product_id", "name", "category", "vendor_id", "valid_from", "valid_to", "is_current"]
+
+VENDOR_CATEGORIES = ['electronics', 'fashion', 'home', 'sports', 'books', 'toys', 'food']
+PRODUCT_CATEGORIES = ["Electronics", "Clothing", "Home", "Sports", "Books", "Toys", "Food"]
+# vendor_status -> possible next statuses (the status does not always change)
+STATUS_DRIFT = {
+    "pending": ["pending", "active", "active"],
+    "active": ["active"] * 6 + ["suspended"],
+    "suspended": ["suspended", "active", "inactive"],
+    "inactive": ["inactive", "active"],
+}
+NAME_POOL_SIZE = 1000
+# Fact tables with a foreign key to dim_vendor.vendor_key
+VENDOR_FACT_TABLES = ("fact_stock", "fact_vendor_performance")
+
+def change_dates(start, end, versions):
+    """valid_from of each version: creation then versions - 1 change dates, sorted"""
+    span = (end - start).total_seconds()
+    offsets = sorted(random.random() * span for _ in range(versions))
+    return [start + timedelta(seconds=offset) for offset in offsets]
+
+def intervals(dates):
+    """(valid_from, valid_to, is_current) for consecutive versions"""
+    for i, valid_from in enumerate(dates):
+        if i + 1 < len(dates):
+            yield valid_from, dates[i + 1], 0
+        else:
+            yield valid_from, None, 1
+
+def vendor_ids(prefix, count):
+    return [f"{prefix}V{i:07d}" for i in range(count)]
+
+def vendor_rows(ids, versions, start, end, names):
+    """dim_vendor rows: `versions` versions per vendor with drifting attributes"""
+    for vendor_id in ids:
+        name = f"{random.choice(names)} {vendor_id[-4:]}"
+        category = random.choice(VENDOR_CATEGORIES)
+        status = "pending"
+        rate = random.uniform(10.0, 25.0)
+        phone = f"+33 1 {random.randint(10, 99)} {random.randint(10, 99)} {random.randint(10, 99)} {random.randint(10, 99)}"
+        for n, (valid_from, valid_to, is_current) in enumerate(intervals(change_dates(start, end, versions))):
+            if n:
+                status = random.choice(STATUS_DRIFT[status])
+                rate = min(30.0, max(5.0, rate + random.gauss(0, 0.75)))
+                if random.random() < 0.05:
+                    category = random.choice(VENDOR_CATEGORIES)
+                if random.random() < 0.03:
+                    name = f"{random.choice(names)} {vendor_id[-4:]}"
+            if is_current:
+                # Kept out of the live vendor set (active current vendors)
+                status = "inactive"
+            yield (vendor_id, name, status, category, f"contact@{vendor_id.lower()}.com", phone,
+                   Decimal(f"{rate:.2f}"), valid_from, valid_to, is_current)
+
+def product_rows(prefix, count, versions, start, end, names, vendors):
+    """dim_product rows: `versions` versions per product with drifting attributes"""
+    for i in range(count):
+        product_id = f"{prefix}P{i:08d}"
+        name = random.choice(names)
+        category = random.choice(PRODUCT_CATEGORIES)
+        vendor_id = random.choice(vendors)
+        for n, (valid_from, valid_to, is_current) in enumerate(intervals(change_dates(start, end, versions))):
+            if n:
+                drift = random.random()
+                if drift < 0.5:
+                    name = f"{name.split(' (')[0]} ({n + 1})"
+                elif drift < 0.7:
+                    category = random.choice(PRODUCT_CATEGORIES)
+                elif drift < 0.9:
+                    vendor_id = random.choice(vendors)
+                else:
+                    name = random.choice(names)
+            yield product_id, name, category, vendor_id, valid_from, valid_to, is_current
+
+def existing_history(conn, prefix):
+    """Rows already loaded with `prefix` in dim_vendor and dim_product"""
+    cursor = conn.cursor()
+    counts = {}
+    for table, key in (("dim_vendor", "vendor_id"), ("dim_product", "product_id")):
+        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {key} LIKE ?", f"{prefix}%")
+        counts[table] = cursor.fetchone()[0]
+    return counts
+
+def delete_history(conn, prefix, batch_size):
+    """Delete a previous history, in batches to keep transactions small
+
+    Fact rows referencing the history's vendors go first (foreign keys on vendor_key).
+    """
+    cursor = conn.cursor()
+    targets = [(table, "vendor_key IN (SELECT vendor_key FROM dim_vendor WHERE vendor_id LIKE ?)")
+               for table in VENDOR_FACT_TABLES]
+    targets += [("dim_product", "product_id LIKE ?"), ("dim_vendor", "vendor_id LIKE ?")]
+    for table, condition in targets:
+        deleted = 0
+        while True:
+            cursor.execute(f"DELETE TOP ({batch_size}) FROM {table} WHERE {condition}", f"{prefix}%")
+            conn.commit()
+            if cursor.rowcount <= 0:
+                break
+            deleted += cursor.rowcount
+        print(f"🗑️  {deleted:,} rows deleted from {table}")
+
+def benchmark_lookups(conn, prefix, products, start, end, lookups):
+    """Time `lookups` as-of lookups (version of a product at a random date)"""
+    cursor = conn.cursor()
+    timings = []
+    misses = 0
+    span = (end - start).total_seconds()
+    for _ in range(lookups):
+        product_id = f"{prefix}P{random.randrange(products):08d}"
+        as_of = start + timedelta(seconds=random.random() * span)
+        began = time.perf_counter()
+        cursor.execute("""
+            SELECT product_key, name, category, vendor_id
+            FROM dim_product
+            WHERE product_id = ? AND valid_from <= ? AND (valid_to > ? OR valid_to IS NULL)
+        """, product_id, as_of, as_of)
+        # Before the product's creation there is no version
+        misses += cursor.fetchone() is None
+        timings.append((time.perf_counter() - began) * 1000)
+    timings.sort()
+    print(f"\n⏱️  {lookups:,} as-of lookups on dim_product: "
+          f"p50 {statistics.median(timings):.2f} ms, p95 {timings[int(len(timings) * 0.95)]:.2f} ms, "
+          f"max {timings[-1]:.2f} ms ({misses:,} dates before creation)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load synthetic SCD2 histories into dim_vendor and dim_product")
+    parser.add_argument("--server", help="SQL Server FQDN")
+    parser.add_argument("--database", help="Database name")
+    parser.add_argument("--username", help="SQL username")
+    parser.add_argument("--password", help="SQL password")
+    parser.add_argument("--vendors", type=int, default=1000, help="Vendors to generate")
+    parser.add_argument("--products", type=int, default=10000, help="Products to generate")
+    parser.add_argument("--versions", type=int, default=10, help="Versions per entity")
+    parser.add_argument("--days", type=int, default=730, help="History window, ending now")
+    parser.add_argument("--prefix", default="HIST", help="Prefix of the generated vendor/product ids")
+    parser.add_argument("--replace", action="store_true", help="Delete a previous history with the same prefix first")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows per insert batch")
+    parser.add_argument("--lookups", type=int, default=0, help="Then time N as-of lookups on dim_product")
+    parser.add_argument("--seed", type=int, help="Random seed (same seed = same history)")
+    parser.add_argument("--scale-factor", type=float,
+                        help="Vendors and products of seed_historical_data.py at this scale factor, reproducible")
+    args = parser.parse_args()
+
+    end = datetime.now().replace(microsecond=0)
+    if args.scale_factor is not None:
+        if args.scale_factor <= 0:
+            parser.error("--scale-factor must be positive")
+        sizes = scale_sizes(args.scale_factor)
+        args.vendors, args.products = sizes["vendors"], sizes["products"]
+        args.seed = SCALE_FACTOR_SEED if args.seed is None else args.seed
+        end = datetime.combine(SCALE_FACTOR_END_DATE, datetime.min.time())
+
+    if args.vendors < 1 or args.versions < 1:
+        parser.error("--vendors and --versions must be at least 1")
+
+    random.seed(args.seed)
+    Faker.seed(args.seed)
+    fake = Faker()
+    # Names come from a small pool: Faker per version would dominate the generation time
+    vendor_names = [fake.company() for _ in range(NAME_POOL_SIZE)]
+    product_names = [fake.catch_phrase() for _ in range(NAME_POOL_SIZE)]
+    start = end - timedelta(days=args.days)
+
+    print(f"🕰️  SCD2 history: {args.vendors:,} vendors and {args.products:,} products x {args.versions} versions "
+          f"({(args.vendors + args.products) * args.versions:,} rows) over {args.days} days")
+
+    conn = create_connection(*connection_settings(args))
+    existing = existing_history(conn, args.prefix)
+    if any(existing.values()):
+        if not args.replace:
+            print(f"❌ A '{args.prefix}' history already exists "
+                  f"({existing['dim_vendor']:,} vendor rows, {existing['dim_product']:,} product rows)")
+            print("💡 Use --replace to delete it, or another --prefix")
+            sys.exit(1)
+        delete_history(conn, args.prefix, args.batch_size)
+
+    ids = vendor_ids(args.prefix, args.vendors)
+    began = time.perf_counter()
+    with BulkLoader(conn, "dim_vendor", VENDOR_COLUMNS, args.batch_size) as loader:
+        for row in vendor_rows(ids, args.versions, start, end, vendor_names):
+            loader.add(row)
+    with BulkLoader(conn, "dim_product", PRODUCT_COLUMNS, args.batch_size) as loader:
+        for row in product_rows(args.prefix, args.products, args.versions, start, end, product_names, ids):
+            loader.add(row)
+    print(f"\n✅ History loaded in {time.perf_counter() - began:.1f}s")
+
+    if args.lookups and args.products:
+        benchmark_lookups(conn, args.prefix, args.products, start, end, args.lookups)
+    conn.close()
+
+if __name__ == "__main__":
+    main()
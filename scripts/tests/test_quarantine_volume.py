@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Test Quarantine Volume
+======================
+
+Reconcile the malformed events injected by a producer run (FAULT_MIX, see
+data-generator/faults.py) with what Stream Analytics wrote to the quarantine
+containers. Quarantined events keep their "fault" and "fault_run" fields, so
+the blobs are counted per fault kind for the run only.
+
+The quarantine rules depend on the running job (enable_marketplace output):
+the base job also quarantines items with quantity <= 0. The marketplace job
+writes them to fact_order, so a run that injected bad_quantity against it
+fails (the producers skip it unless FAULT_QUANTITY_QUARANTINE=1).
+
+Usage:
+    uv run --directory scripts python tests/test_quarantine_volume.py ../data-generator/faults_<run>.json
+    uv run --directory scripts python tests/test_quarantine_volume.py faults_<run>.json --max-wait 600 --hours 3
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from azure.storage.blob import BlobServiceClient
+from dotenv import load_dotenv
+
+from test_quarantine import CYAN, GREEN, NC, RED, YELLOW, get_storage_connection, get_terraform_output
+
+# Load environment
+env_path = Path(__file__).parent.parent.parent / '.env'
+load_dotenv(env_path)
+
+# fault -> Terraform output naming the container it should land in
+QUARANTINE_CONTAINERS = {
+    "null_order_id": "quarantine_container_orders",
+    "empty_items": "quarantine_container_orders",
+    "null_user_id": "quarantine_container_clickstream",
+}
+# Base job (enable_marketplace=false): bad quantities are quarantined with the orders
+BASE_JOB_CONTAINERS = {**QUARANTINE_CONTAINERS, "bad_quantity": "quarantine_container_orders"}
+
+
+def count_quarantined(container_client, run_id, since, seen):
+    """Add the run's quarantined events of blobs modified after `since` to `seen`, per fault"""
+    counts = Counter()
+    for blob in container_client.list_blobs():
+        if blob.last_modified < since:
+            continue
+        # Blobs are appended to while ASA writes: re-read those that changed
+        if seen.get(blob.name, (None,))[0] == blob.etag:
+            counts.update(seen[blob.name][1])
+            continue
+        content = container_client.get_blob_client(blob.name).download_blob().readall().decode('utf-8')
+        blob_counts = Counter()
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if data.get('fault_run') == run_id:
+                blob_counts[data.get('fault')] += 1
+        seen[blob.name] = (blob.etag, blob_counts)
+        counts.update(blob_counts)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile injected faults with the quarantine containers")
+    parser.add_argument("stats", help="faults_<run>.json written by the producer at shutdown")
+    parser.add_argument("--max-wait", type=int, default=300, help="Seconds to wait for the quarantine to catch up")
+    parser.add_argument("--hours", type=float, default=6, help="Only read blobs modified in the last N hours")
+    args = parser.parse_args()
+
+    with open(args.stats) as f:
+        expected = json.load(f)
+    run_id, injected = expected["run_id"], expected["injected"]
+
+    print(f"\n{CYAN}{'='*60}{NC}")
+    print(f"{CYAN}Test: Quarantine Volume (run {run_id}){NC}")
+    print(f"{CYAN}{'='*60}{NC}\n")
+
+    storage_conn = get_storage_connection()
+    if not storage_conn:
+        print(f"{RED}✗ Quarantine not enabled{NC}")
+        print(f"{YELLOW}💡 Deploy with enable_quarantine=true{NC}")
+        sys.exit(1)
+
+    marketplace = get_terraform_output("enable_marketplace") == "true"
+    rules = QUARANTINE_CONTAINERS if marketplace else BASE_JOB_CONTAINERS
+    print(f"Job: {'marketplace' if marketplace else 'base'} (enable_marketplace={str(marketplace).lower()})\n")
+
+    blob_service = BlobServiceClient.from_connection_string(storage_conn)
+    containers = {}
+    for fault in injected:
+        if fault in rules:
+            name = get_terraform_output(rules[fault])
+            containers.setdefault(name, []).append(fault)
+
+    since = datetime.now(timezone.utc) - timedelta(hours=args.hours)
+    seen = {name: {} for name in containers}
+    start_time = time.time()
+    while True:
+        found = Counter()
+        for name in containers:
+            found.update(count_quarantined(blob_service.get_container_client(name), run_id, since, seen[name]))
+        missing = {fault: injected[fault] - found[fault]
+                   for faults in containers.values() for fault in faults if found[fault] < injected[fault]}
+        if not missing or time.time() - start_time >= args.max_wait:
+            break
+        print(f"  ⏳ {sum(missing.values()):,} quarantined events still missing...", flush=True)
+        time.sleep(15)
+    elapsed = int(time.time() - start_time)
+
+    failed = 0
+    for name, faults in containers.items():
+        print(f"{CYAN}--- {name} ---{NC}")
+        for fault in faults:
+            ok = found[fault] == injected[fault]
+            failed += not ok
+            color, mark = (GREEN, "✓") if ok else (RED, "✗")
+            print(f"{color}{mark} {fault}: injected {injected[fault]:,}, quarantined {found[fault]:,}{NC}")
+
+    for fault, n in injected.items():
+        if fault == "non_json":
+            print(f"{YELLOW}ℹ non_json: {n:,} injected, dropped by ASA as deserialization errors "
+                  f"(InputEventsSourcesDeserializationError metric), not quarantined{NC}")
+        elif fault == "bad_quantity" and marketplace and n:
+            failed += 1
+            print(f"{RED}✗ bad_quantity: {n:,} injected, but the marketplace job has no quantity rule: "
+                  f"written to fact_order with quantity <= 0{NC}")
+            print(f"{YELLOW}💡 Inject bad_quantity (FAULT_QUANTITY_QUARANTINE=1) only with the base job{NC}")
+
+    print(f"\n{CYAN}{'='*60}{NC}")
+    if failed:
+        print(f"{RED}✗ {failed} fault kind(s) not reconciled after {elapsed}s{NC}")
+        sys.exit(1)
+    print(f"{GREEN}✓ Quarantine caught up with every injected fault ({elapsed}s after the run){NC}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test SCD Type 2 Batch Merge for dim_product
+===========================================
+
+Inserts a mixed batch into stg_product in a single statement, so the trigger
+(sp_merge_product_scd2) processes it in one run, as the seed scripts do:
+1.  An existing product with a change -> old record closed + new record
+2.  A new product -> one current record (not taken for the previous product)
+3.  An existing product without change -> untouched
+4.  A new product changed twice in the batch -> chained versions, last one current
+
+Usage:
+    make test-scd2-product-batch
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pyodbc
+
+from test_scd2_product import CYAN, GREEN, NC, RED, YELLOW, OutputBuffer, get_db_connection
+
+INSERT_BATCH = """
+    INSERT INTO stg_product (product_id, name, category, vendor_id, event_timestamp)
+    SELECT product_id, name, category, vendor_id, event_timestamp
+    FROM (VALUES {}) AS batch (n, product_id, name, category, vendor_id, event_timestamp)
+    ORDER BY n
+"""
+
+def insert_batch(conn, rows):
+    """Insert `rows` in one statement, in this order of arrival (one trigger run)"""
+    values = ", ".join(["(?, ?, ?, ?, ?, ?)"] * len(rows))
+    params = [value for n, row in enumerate(rows) for value in (n, *row)]
+    cursor = conn.cursor()
+    cursor.execute(INSERT_BATCH.format(values), *params)
+    conn.commit()
+
+def get_product_history(conn, product_id):
+    """(name, valid_to, is_current) of every version, oldest first"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT name, valid_to, is_current
+        FROM dim_product
+        WHERE product_id = ?
+        ORDER BY valid_from, product_key
+    """, product_id)
+    return [(row.name, row.valid_to, row.is_current) for row in cursor.fetchall()]
+
+def test_mixed_batch(conn, prefix):
+    """Existing, new, unchanged and twice-changed products in the same batch"""
+    print(f"{CYAN}{'='*60}{NC}")
+    print(f"{CYAN}Test: Mixed Batch in One Trigger Run{NC}")
+    print(f"{CYAN}{'='*60}{NC}\n")
+
+    t0 = datetime.now().replace(microsecond=0) - timedelta(hours=1)
+    t1, t2 = t0 + timedelta(minutes=10), t0 + timedelta(minutes=20)
+    existing, new, unchanged, chained = (f"{prefix}{name}" for name in ("EXISTING", "NEW", "UNCHANGED", "CHAINED"))
+
+    print(f"{CYAN}📤 Loading 2 existing products...{NC}")
+    insert_batch(conn, [
+        (existing, "Existing v1", "Gadgets", "SHOPNOW", t0),
+        (unchanged, "Unchanged v1", "Gadgets", "SHOPNOW", t0),
+    ])
+
+    print(f"{CYAN}📤 Sending the mixed batch (5 rows, one statement)...{NC}")
+    insert_batch(conn, [
+        (existing, "Existing v2", "Gadgets", "SHOPNOW", t1),
+        (new, "New v1", "Gadgets", "SHOPNOW", t1),
+        (unchanged, "Unchanged v1", "Gadgets", "SHOPNOW", t1),
+        (chained, "Chained v1", "Gadgets", "SHOPNOW", t1),
+        (chained, "Chained v2", "Advanced Gadgets", "VENDOR_A", t2),
+    ])
+
+    expected = {
+        existing: [("Existing v1", t1, 0), ("Existing v2", None, 1)],
+        new: [("New v1", None, 1)],
+        unchanged: [("Unchanged v1", None, 1)],
+        chained: [("Chained v1", t2, 0), ("Chained v2", None, 1)],
+    }
+
+    print(f"\n{CYAN}✅ Verification:{NC}")
+    all_passed = True
+    for product_id, versions in expected.items():
+        history = get_product_history(conn, product_id)
+        passed = history == versions
+        status = f"{GREEN}✓{NC}" if passed else f"{RED}✗{NC}"
+        print(f"  {status} {product_id[len(prefix):].lower()}: {len(history)} record(s)")
+        if not passed:
+            print(f"      expected {versions}")
+            print(f"      got      {history}")
+            all_passed = False
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM stg_product WHERE product_id LIKE ? AND processed = 0", f"{prefix}%")
+    pending = cursor.fetchone()[0]
+    status = f"{GREEN}✓{NC}" if pending == 0 else f"{RED}✗{NC}"
+    print(f"  {status} staging rows processed ({pending} pending)")
+
+    return all_passed and pending == 0
+
+def cleanup_test_products(conn, prefix):
+    """Cleanup test product data"""
+    print(f"\n{CYAN}🧹 Cleaning up test data...{NC}")
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("DELETE FROM dim_product WHERE product_id LIKE ?", f"{prefix}%")
+        cursor.execute("DELETE FROM stg_product WHERE product_id LIKE ?", f"{prefix}%")
+        conn.commit()
+        print(f"{GREEN}✓ Cleanup complete{NC}")
+    except pyodbc.Error as ex:
+        sqlstate = ex.args[0]
+        print(f"{RED}✗ Cleanup failed: {sqlstate}{NC}")
+
+def main():
+    """Main test function"""
+    report_path = Path(__file__).parent / 'scd2_product_batch_report.txt'
+    output_buffer = OutputBuffer(str(report_path))
+    sys.stdout = output_buffer
+
+    print(f"{CYAN}{'='*60}{NC}")
+    print(f"{CYAN}SCD Type 2 Batch Merge for Products - Test Suite{NC}")
+    print(f"{CYAN}{'='*60}{NC}\n")
+
+    prefix = f"SCD2_BATCH_{int(time.time())}_"
+    conn = get_db_connection()
+    try:
+        success = test_mixed_batch(conn, prefix)
+        cleanup_test_products(conn, prefix)
+
+        if success:
+            print(f"\n{GREEN}{'='*60}{NC}")
+            print(f"{GREEN}✓ SCD Type 2 batch merge test passed!{NC}")
+            print(f"{GREEN}{'='*60}{NC}")
+            print(f"\n📄 Report saved: {report_path}\n")
+            return 0
+        else:
+            print(f"\n{RED}{'='*60}{NC}")
+            print(f"{RED}✗ Batch merge test failed{NC}")
+            print(f"{YELLOW}💡 Apply migration 005 (make update-schema){NC}")
+            print(f"{RED}{'='*60}{NC}\n")
+            return 1
+
+    finally:
+        conn.close()
+        output_buffer.save()
+        sys.stdout = output_buffer.original_stdout
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Test SCD Type 2 Batch Merge for dim_vendor
+==========================================
+
+Inserts a mixed batch into stg_vendor in a single statement, so the trigger
+(sp_merge_vendor_scd2) processes it in one run, as vendor_churn.py sql does:
+1.  An existing vendor with a change -> old record closed + new record
+2.  A new vendor -> one current record (not taken for the previous vendor)
+3.  An existing vendor without change -> untouched
+4.  A new vendor changed twice in the batch -> chained versions, last one current
+
+Usage:
+    make test-scd2-vendor-batch
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pyodbc
+
+from test_scd2_vendor import CYAN, GREEN, NC, RED, YELLOW, OutputBuffer, get_db_connection
+
+INSERT_BATCH = """
+    INSERT INTO stg_vendor (vendor_id, vendor_name, vendor_status, vendor_category,
+                            vendor_email, commission_rate, event_timestamp)
+    SELECT vendor_id, vendor_name, vendor_status, vendor_category, vendor_email, commission_rate, event_timestamp
+    FROM (VALUES {}) AS batch (n, vendor_id, vendor_name, vendor_status, vendor_category,
+                               vendor_email, commission_rate, event_timestamp)
+    ORDER BY n
+"""
+
+def insert_batch(conn, rows):
+    """Insert `rows` in one statement, in this order of arrival (one trigger run)"""
+    values = ", ".join(["(?, ?, ?, ?, ?, ?, ?, ?)"] * len(rows))
+    params = [value for n, row in enumerate(rows) for value in (n, *row)]
+    cursor = conn.cursor()
+    cursor.execute(INSERT_BATCH.format(values), *params)
+    conn.commit()
+
+def get_vendor_history(conn, vendor_id):
+    """(vendor_status, commission_rate, valid_to, is_current) of every version, oldest first"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT vendor_status, commission_rate, valid_to, is_current
+        FROM dim_vendor
+        WHERE vendor_id = ?
+        ORDER BY valid_from, vendor_key
+    """, vendor_id)
+    return [(row.vendor_status, float(row.commission_rate), row.valid_to, row.is_current)
+            for row in cursor.fetchall()]
+
+def test_mixed_batch(conn, prefix):
+    """Existing, new, unchanged and twice-changed vendors in the same batch"""
+    print(f"{CYAN}{'='*60}{NC}")
+    print(f"{CYAN}Test: Mixed Batch in One Trigger Run{NC}")
+    print(f"{CYAN}{'='*60}{NC}\n")
+
+    t0 = datetime.now().replace(microsecond=0) - timedelta(hours=1)
+    t1, t2 = t0 + timedelta(minutes=10), t0 + timedelta(minutes=20)
+    existing, new, unchanged, chained = (f"{prefix}{name}" for name in ("EXISTING", "NEW", "UNCHANGED", "CHAINED"))
+
+    def row(vendor_id, status, commission, timestamp):
+        return (vendor_id, "Batch Test Vendor", status, "electronics", "batch@example.com", commission, timestamp)
+
+    print(f"{CYAN}📤 Loading 2 existing vendors...{NC}")
+    insert_batch(conn, [
+        row(existing, "active", 15.00, t0),
+        row(unchanged, "active", 15.00, t0),
+    ])
+
+    print(f"{CYAN}📤 Sending the mixed batch (5 rows, one statement)...{NC}")
+    insert_batch(conn, [
+        row(existing, "suspended", 15.00, t1),
+        row(new, "pending", 12.50, t1),
+        row(unchanged, "active", 15.00, t1),
+        row(chained, "active", 10.00, t1),
+        row(chained, "active", 12.25, t2),
+    ])
+
+    expected = {
+        existing: [("active", 15.0, t1, 0), ("suspended", 15.0, None, 1)],
+        new: [("pending", 12.5, None, 1)],
+        unchanged: [("active", 15.0, None, 1)],
+        chained: [("active", 10.0, t2, 0), ("active", 12.25, None, 1)],
+    }
+
+    print(f"\n{CYAN}✅ Verification:{NC}")
+    all_passed = True
+    for vendor_id, versions in expected.items():
+        history = get_vendor_history(conn, vendor_id)
+        passed = history == versions
+        status = f"{GREEN}✓{NC}" if passed else f"{RED}✗{NC}"
+        print(f"  {status} {vendor_id[len(prefix):].lower()}: {len(history)} record(s)")
+        if not passed:
+            print(f"      expected {versions}")
+            print(f"      got      {history}")
+            all_passed = False
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM stg_vendor WHERE vendor_id LIKE ? AND processed = 0", f"{prefix}%")
+    pending = cursor.fetchone()[0]
+    status = f"{GREEN}✓{NC}" if pending == 0 else f"{RED}✗{NC}"
+    print(f"  {status} staging rows processed ({pending} pending)")
+
+    return all_passed and pending == 0
+
+def cleanup_test_vendors(conn, prefix):
+    """Cleanup test vendor data"""
+    print(f"\n{CYAN}🧹 Cleaning up test data...{NC}")
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("DELETE FROM dim_vendor WHERE vendor_id LIKE ?", f"{prefix}%")
+        cursor.execute("DELETE FROM stg_vendor WHERE vendor_id LIKE ?", f"{prefix}%")
+        conn.commit()
+        print(f"{GREEN}✓ Cleanup complete{NC}")
+    except pyodbc.Error as ex:
+        sqlstate = ex.args[0]
+        print(f"{RED}✗ Cleanup failed: {sqlstate}{NC}")
+
+def main():
+    """Main test function"""
+    report_path = Path(__file__).parent / 'scd2_vendor_batch_report.txt'
+    output_buffer = OutputBuffer(str(report_path))
+    sys.stdout = output_buffer
+
+    print(f"{CYAN}{'='*60}{NC}")
+    print(f"{CYAN}SCD Type 2 Batch Merge for Vendors - Test Suite{NC}")
+    print(f"{CYAN}{'='*60}{NC}\n")
+
+    prefix = f"SCD2_BATCH_{int(time.time())}_"
+    conn = get_db_connection()
+    try:
+        success = test_mixed_batch(conn, prefix)
+        cleanup_test_vendors(conn, prefix)
+
+        if success:
+            print(f"\n{GREEN}{'='*60}{NC}")
+            print(f"{GREEN}✓ SCD Type 2 batch merge test passed!{NC}")
+            print(f"{GREEN}{'='*60}{NC}")
+            print(f"\n📄 Report saved: {report_path}\n")
+            return 0
+        else:
+            print(f"\n{RED}{'='*60}{NC}")
+            print(f"{RED}✗ Batch merge test failed{NC}")
+            print(f"{YELLOW}💡 Apply migration 006 (make update-schema){NC}")
+            print(f"{RED}{'='*60}{NC}\n")
+            return 1
+
+    finally:
+        conn.close()
+        output_buffer.save()
+        sys.stdout = output_buffer.original_stdout
+
+if __name__ == "__main__":
+    sys.exit(main())
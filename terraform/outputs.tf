@@ -28,6 +28,11 @@ output "sql_database_name" {
   value       = module.sql_database.database_name
 }
 
+output "enable_marketplace" {
+  description = "Whether the marketplace Stream Analytics job runs instead of the base job"
+  value       = var.enable_marketplace
+}
+
 output "stream_analytics_job_name" {
   description = "Stream Analytics job name"
   value       = module.stream_analytics.job_name